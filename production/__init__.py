@@ -31,4 +31,42 @@ for verbalization. During verbalization, serialized tokens are converted to spok
 
 .. automodule:: en_us_normalization.production.verbalize
 
+Runtime
+-------
+
+Classification and verbalization are put together in a normalization pipeline,
+which can process utterances one by one or in batches:
+
+..
+
+    "12/04/15 at 3:30pm!"
+
+    "december fourth fifteen at three thirty PM!"
+
+.. automodule:: en_us_normalization.production.runtime
+
+Compiled grammars
+-----------------
+
+Compiling grammars from scratch takes a while, so compiled FSTs
+can be cached and reused as long as grammar rules and data files stay the same:
+
+.. automodule:: en_us_normalization.production.grammar_cache
+
+When only some of the data files change, grammars are rebuilt incrementally,
+recompiling only affected branches of classification and verbalization unions:
+
+.. automodule:: en_us_normalization.production.incremental_build
+
+For deployment, grammars are exported to archives of read-only const fsts, which are loaded once and shared by the workers:
+
+.. automodule:: en_us_normalization.production.grammar_export
+
+Benchmarks
+----------
+
+Cost of building and applying each of the grammars is tracked with benchmarks:
+
+.. automodule:: en_us_normalization.production.benchmarks
+
 """
@@ -0,0 +1,28 @@
+"""
+Benchmarks
+==========
+
+Benchmarks of production grammars. Results are stored as JSON,
+so that they can be compared between revisions of the grammars.
+
+Build time, size and latency of each grammar:
+
+.. automodule:: en_us_normalization.production.benchmarks.benchmark_grammars
+
+Contribution of each branch of ClassifyFst to its size and build time:
+
+.. automodule:: en_us_normalization.production.benchmarks.profile_classify
+
+Size and lookup latency of the whitelist, which is kept outside of ClassifyFst:
+
+.. automodule:: en_us_normalization.production.benchmarks.benchmark_whitelist
+
+Throughput of batched numeric verbalization compared to verbalization grammar:
+
+.. automodule:: en_us_normalization.production.benchmarks.benchmark_numeric
+
+Agreement and latency of classification with pruned lattice on ambiguous inputs:
+
+.. automodule:: en_us_normalization.production.benchmarks.benchmark_pruning
+
+"""
@@ -0,0 +1,371 @@
+"""
+Copyright 2022 Balacoon
+
+Benchmark of classification and verbalization grammars.
+Each grammar of a semiotic class is built individually, both classifier and verbalizer,
+as well as combined ClassifyFst and VerbalizeFst. For each grammar, benchmark records build time,
+number of states and arcs, size of serialized fst and percentiles of latency
+of applying grammar to representative inputs, taken from the tests.
+Results are stored as JSON and can be compared to results of another revision:
+
+..
+
+    python benchmark_grammars.py --out current.json --baseline previous.json
+"""
+
+import argparse
+import importlib
+import json
+import logging
+import math
+import platform
+import time
+from typing import Callable, Dict, List
+
+import pynini
+import pywrapfst
+from en_us_normalization.production.grammar_cache import get_grammars_hash
+from en_us_normalization.production.grammar_export import apply_fst, prepare_fst
+from en_us_normalization.production.verbalize.verbalize import VerbalizerBuilder
+
+# grammar name -> (module, class name, representative inputs)
+CLASSIFY_BENCHMARKS = {
+    "abbreviation": ("classify.abbreviation", "AbbreviationFst", ["F.B.I.", "FBI", "IEEE", "wwe's"]),
+    "address": (
+        "classify.address",
+        "AddressFst",
+        [
+            "1599 Curabitur Rd. Bandera South Dakota 45149",
+            "123 N Malanyuka St. SE, Apt #23 San-Francisco CA 45149-3214",
+        ],
+    ),
+    "attached": ("classify.multi_token.attached", "AttachedTokensFst", ["look33", "AT&T-wireless", "3-miles"]),
+    "cardinal": ("classify.cardinal", "CardinalFst", ["-23", "1231", "4,123,212", "No 1", "12 - 15"]),
+    "date": ("classify.date", "DateFst", ["jan. 5, 2012", "jan. 3rd, 2012", "5 january 2012", "Jan 5"]),
+    "decimal": ("classify.decimal", "DecimalFst", ["-23.45", ".5", "13.5k", "3 - 5"]),
+    "electronic": (
+        "classify.electronic",
+        "ElectronicFst",
+        ["balacoon@gmail.com", "www.google.com", "https://google.ua/translate&=1231"],
+    ),
+    "fraction": ("classify.fraction", "FractionFst", ["25 1/2", "3/4", "1/3 - 1/2"]),
+    "measure": ("classify.measure", "MeasureFst", ["-12kg", "300,000 km/s", "1.5kg", "1/2 kg"]),
+    "money": ("classify.money", "MoneyFst", ["$12.05", "£100,000", "1.5$", "$12 - $15"]),
+    "ordinal": ("classify.ordinal", "OrdinalFst", ["13th", "23rd"]),
+    "roman": ("classify.roman", "RomanFst", ["XXXII", "CHAPTER XI", "George II", "III - VIII"]),
+    "shortening": ("classify.shortening", "ShorteningFst", ["Mrs.", "Dluga St.", "ST Peter"]),
+    "telephone": ("classify.telephone", "TelephoneFst", ["+1 123-123-5678-1"]),
+    "time": ("classify.time", "TimeFst", ["12:30 a.m. est", "2.30 a.m.", "02:00"]),
+    "verbatim": ("classify.verbatim", "VerbatimFst", ["n33dful"]),
+    "word": ("classify.word", "WordFst", ["hello", "don't", "So-called"]),
+    "classify": (
+        "classify.classify",
+        "ClassifyFst",
+        [
+            "hello world!",
+            "1.30 PM",
+            "_hello_",
+            "radio/video",
+            "jan. 5, 2012",
+            "it costs $12.05 and weighs 1.5kg",
+            "we met at 123 N Malanyuka St. SE, Apt #23 San-Francisco CA 45149-3214 on jan. 5, 2012",
+        ],
+    ),
+}
+
+VERBALIZE_BENCHMARKS = {
+    "verbalize": (
+        "verbalize.verbalize",
+        "VerbalizeFst",
+        [
+            "cardinal|count:1231|",
+            "date|month:january|day:5|year:2012|",
+            "decimal|negative:1|integer_part:12|fractional_part:5006|",
+            "electronic|username:balacoon|domain:gmail.com|",
+            "measure|integer_part:12|fractional_part:5|units:kilograms|",
+            "money|integer_part:0|currency:$|fractional_part:5|currency:$|",
+            "time|hours:12|minutes:30|suffix:AM|zone:EST|",
+            "address|house:1599|street_name:Curabitur|street_type:road|town:Bandera|state:south dakota|zip:45149|",
+        ],
+    ),
+}
+
+# semiotic class -> representative serialized tokens of its verbalizer, see VERBALIZERS.
+# Results are reported under name prefixed with CLASS_VERBALIZE_PREFIX
+CLASS_VERBALIZE_BENCHMARKS = {
+    "cardinal": ["cardinal|negative:1|count:23|", "cardinal|prefix:number|count:21|", "cardinal|count:4123212|"],
+    "decimal": ["decimal|negative:1|integer_part:12|fractional_part:5006|", "decimal|fractional_part:05|"],
+    "ordinal": ["ordinal|order:13|", "ordinal|order:21|"],
+    "fraction": ["fraction|integer_part:23|numerator:4|denominator:5|", "fraction|numerator:3|denominator:2|"],
+    "roman": ["roman|prefix:chapter|count:26|", "roman|prefix:george|order:1|"],
+    "address": [
+        "address|house:1599|street_name:Curabitur|street_type:road|town:Bandera|state:south dakota|zip:45149|"
+    ],
+    "date": ["date|month:january|day:5|year:2012|", "date|year:2010|era:s|"],
+    "verbatim": ["verbatim|name:sa12|"],
+    "electronic": [
+        "electronic|username:balacoon|domain:gmail.com|",
+        "electronic|protocol:HTTPS|domain:google.UA|path:/translate&=1231|",
+    ],
+    "measure": ["measure|integer_part:12|fractional_part:5|units:kilograms|"],
+    "money": ["money|integer_part:0|currency:$|fractional_part:5|currency:$|", "money|fractional_part:01|currency:$|"],
+    "telephone": ["telephone|country_code:1|number_part:123 123 5678|extension:1|"],
+    "time": ["time|hours:12|minutes:30|suffix:AM|zone:EST|", "time|hours:3|minutes:15|seconds:25|milliseconds:1|"],
+}
+CLASS_VERBALIZE_PREFIX = "verbalize_"
+
+# metrics that are compared between revisions, lower is better
+COMPARED_METRICS = ("build_seconds", "states", "arcs", "serialized_bytes", "p50_ms", "p99_ms")
+
+
+def get_percentile(values: List[float], percentile: float) -> float:
+    """
+    computes percentile of the values with nearest-rank method
+
+    Parameters
+    ----------
+    values: List[float]
+        measurements
+    percentile: float
+        percentile to compute, from 0 to 100
+
+    Returns
+    -------
+    value: float
+        measurement at the given percentile
+    """
+    values = sorted(values)
+    rank = max(math.ceil(percentile / 100.0 * len(values)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def get_fst_stats(fst: pywrapfst.Fst) -> Dict[str, int]:
+    """
+    collects size of the fst
+
+    Parameters
+    ----------
+    fst: pywrapfst.Fst
+        compiled grammar
+
+    Returns
+    -------
+    stats: Dict[str, int]
+        number of states, number of arcs and size of serialized fst in bytes
+    """
+    # const fsts don't expose number of states, so states are counted
+    states = list(fst.states())
+    return {
+        "states": len(states),
+        "arcs": sum(fst.num_arcs(state) for state in states),
+        "serialized_bytes": len(fst.write_to_string()),
+    }
+
+
+def measure_latency(apply: Callable[[str], str], inputs: List[str], repeats: int) -> Dict[str, float]:
+    """
+    measures latency of applying grammar to the inputs
+
+    Parameters
+    ----------
+    apply: Callable[[str], str]
+        function that applies grammar to a single input
+    inputs: List[str]
+        representative inputs of the grammar
+    repeats: int
+        number of times to apply grammar to each of the inputs
+
+    Returns
+    -------
+    latency: Dict[str, float]
+        median and 99th percentile of latency in milliseconds, None if grammar fails on all the inputs.
+        Inputs that grammar fails to process are not part of percentiles, they are counted in `failed`.
+    """
+    latencies = []
+    failed = 0
+    for text in inputs:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            try:
+                apply(text)
+            except pywrapfst.FstOpError:
+                failed += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000.0)
+    return {
+        "p50_ms": get_percentile(latencies, 50) if latencies else None,
+        "p99_ms": get_percentile(latencies, 99) if latencies else None,
+        "failed": failed,
+    }
+
+
+def benchmark_grammar(module: str, class_name: str, inputs: List[str], repeats: int) -> Dict[str, float]:
+    """
+    builds grammar and measures its size and latency
+
+    Parameters
+    ----------
+    module: str
+        module with the grammar, relative to production package
+    class_name: str
+        name of the grammar class
+    inputs: List[str]
+        representative inputs of the grammar
+    repeats: int
+        number of times to apply grammar to each of the inputs
+
+    Returns
+    -------
+    result: Dict[str, float]
+        metrics of the grammar
+    """
+    grammar_cls = getattr(importlib.import_module("en_us_normalization.production." + module), class_name)
+    start = time.perf_counter()
+    grammar = grammar_cls()
+    result = {"build_seconds": time.perf_counter() - start}
+    fst = prepare_fst(grammar.fst)
+    result.update(get_fst_stats(fst))
+    result.update(measure_latency(lambda x: apply_fst(fst, x), inputs, repeats))
+    return result
+
+
+def benchmark_class_verbalizer(
+    name: str, inputs: List[str], repeats: int, builder: VerbalizerBuilder = None
+) -> Dict[str, float]:
+    """
+    builds verbalizer of a semiotic class and measures its size and latency
+
+    Parameters
+    ----------
+    name: str
+        name of the verbalizer, one of VERBALIZERS
+    inputs: List[str]
+        serialized tokens of the class
+    repeats: int
+        number of times to apply verbalizer to each of the inputs
+    builder: VerbalizerBuilder
+        builder that shares verbalizers between benchmarks. If not provided, new one is created.
+
+    Returns
+    -------
+    result: Dict[str, float]
+        metrics of the verbalizer. Build time excludes verbalizers it depends on.
+    """
+    if builder is None:
+        builder = VerbalizerBuilder()
+    fst = prepare_fst(builder.get(name).fst)
+    result = {"build_seconds": builder.build_seconds[name]}
+    result.update(get_fst_stats(fst))
+    result.update(measure_latency(lambda x: apply_fst(fst, x), inputs, repeats))
+    return result
+
+
+def run_benchmarks(names: List[str] = None, repeats: int = 20) -> Dict:
+    """
+    runs benchmarks of the grammars
+
+    Parameters
+    ----------
+    names: List[str]
+        names of grammars to benchmark, see CLASSIFY_BENCHMARKS, VERBALIZE_BENCHMARKS and
+        CLASS_VERBALIZE_BENCHMARKS (prefixed with CLASS_VERBALIZE_PREFIX).
+        If not provided, all grammars are benchmarked.
+    repeats: int
+        number of times to apply grammar to each of the inputs
+
+    Returns
+    -------
+    results: Dict
+        metrics of each grammar along with the information about environment
+    """
+    benchmarks = dict(CLASSIFY_BENCHMARKS, **VERBALIZE_BENCHMARKS)
+    class_benchmarks = {CLASS_VERBALIZE_PREFIX + k: v for k, v in CLASS_VERBALIZE_BENCHMARKS.items()}
+    if names is None:
+        names = list(benchmarks.keys()) + list(class_benchmarks.keys())
+    results = {
+        "grammars_hash": get_grammars_hash(),
+        "pynini_version": pynini.__version__,
+        "python_version": platform.python_version(),
+        "repeats": repeats,
+        "grammars": {},
+    }
+    builder = VerbalizerBuilder()
+    for name in names:
+        logging.info("Benchmarking {}".format(name))
+        if name in class_benchmarks:
+            verbalizer = name[len(CLASS_VERBALIZE_PREFIX) :]
+            results["grammars"][name] = benchmark_class_verbalizer(
+                verbalizer, class_benchmarks[name], repeats, builder
+            )
+        elif name in benchmarks:
+            module, class_name, inputs = benchmarks[name]
+            results["grammars"][name] = benchmark_grammar(module, class_name, inputs, repeats)
+        else:
+            expected = list(benchmarks.keys()) + list(class_benchmarks.keys())
+            raise ValueError("Unknown grammar [{}], expected one of {}".format(name, expected))
+    return results
+
+
+def compare_results(baseline: Dict, current: Dict) -> Dict[str, Dict[str, float]]:
+    """
+    compares benchmark results of two revisions
+
+    Parameters
+    ----------
+    baseline: Dict
+        results of the reference revision, as returned by `run_benchmarks`
+    current: Dict
+        results of the revision to check
+
+    Returns
+    -------
+    ratios: Dict[str, Dict[str, float]]
+        for each grammar present in both results - ratio of current to baseline value of each metric.
+        Ratio above 1 means regression. Metrics missing in either of the results (latency of grammar
+        that failed on all the inputs) are skipped.
+    """
+    ratios = {}
+    for name, metrics in current["grammars"].items():
+        if name not in baseline["grammars"]:
+            continue
+        base_metrics = baseline["grammars"][name]
+        ratios[name] = {
+            metric: _get_ratio(metrics[metric], base_metrics[metric])
+            for metric in COMPARED_METRICS
+            if metrics.get(metric) is not None and base_metrics.get(metric) is not None
+        }
+    return ratios
+
+
+def _get_ratio(value: float, base_value: float) -> float:
+    """
+    helper function that computes ratio of current to baseline value of a metric
+    """
+    return value / base_value if base_value else float("inf")
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Benchmarks build time, size and latency of production grammars")
+    ap.add_argument("--out", required=True, help="JSON file to store results to")
+    ap.add_argument("--grammars", nargs="+", help="Grammars to benchmark, all by default")
+    ap.add_argument("--repeats", type=int, default=20, help="Number of times to apply grammar to each input")
+    ap.add_argument("--baseline", help="Results of another revision to compare with")
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    results = run_benchmarks(args.grammars, args.repeats)
+    with open(args.out, "w", encoding="utf-8") as fp:
+        json.dump(results, fp, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fp:
+            baseline = json.load(fp)
+        for name, ratios in compare_results(baseline, results).items():
+            logging.info("{}: {}".format(name, ", ".join("{}={:.2f}".format(k, v) for k, v in ratios.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Copyright 2022 Balacoon
+
+Benchmark of batched numeric verbalization against verbalization grammar.
+Random cardinal, ordinal and decimal tokens are verbalized both with VerbalizeFst
+(one composition per token) and with NumericVerbalizer (whole batch at once).
+Benchmark records throughput of both and number of tokens, on which outputs differ:
+
+..
+
+    python benchmark_numeric.py --out numeric.json --batch-size 10000
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+from typing import Dict, List
+
+from en_us_normalization.production.grammar_export import apply_fst, prepare_fst
+from en_us_normalization.production.runtime.numeric import MAX_DIGITS, NumericVerbalizer
+from en_us_normalization.production.verbalize.verbalize import VerbalizeFst
+
+
+def get_numeric_tokens(batch_size: int, seed: int = 0) -> List[str]:
+    """
+    generates random serialized numeric tokens
+
+    Parameters
+    ----------
+    batch_size: int
+        number of tokens to generate
+    seed: int
+        seed of random generator, so that batches are the same between revisions
+
+    Returns
+    -------
+    tokens: List[str]
+        serialized cardinals, ordinals and decimals, for ex. `cardinal|count:23|`
+    """
+    rng = random.Random(seed)
+
+    def number() -> str:
+        return str(rng.randint(0, 10 ** rng.randint(1, MAX_DIGITS) - 1))
+
+    tokens = []
+    for _ in range(batch_size):
+        kind = rng.randint(0, 2)
+        if kind == 0:
+            sign = "negative:1|" if rng.random() < 0.2 else ""
+            tokens.append("cardinal|{}count:{}|".format(sign, number()))
+        elif kind == 1:
+            tokens.append("ordinal|order:{}|".format(number()))
+        else:
+            fractional = str(rng.randint(0, 9999))
+            tokens.append("decimal|integer_part:{}|fractional_part:{}|".format(number(), fractional))
+    return tokens
+
+
+def benchmark_numeric(batch_size: int = 10000, seed: int = 0) -> Dict:
+    """
+    verbalizes the same batch of numeric tokens with grammar and with NumericVerbalizer
+
+    Parameters
+    ----------
+    batch_size: int
+        number of tokens in the batch
+    seed: int
+        seed of random generator for tokens
+
+    Returns
+    -------
+    results: Dict
+        time each approach took, their throughput in tokens per second, speedup
+        of NumericVerbalizer and number of tokens verbalized differently
+    """
+    tokens = get_numeric_tokens(batch_size, seed)
+    fst = prepare_fst(VerbalizeFst().fst)
+    numeric = NumericVerbalizer()
+
+    start = time.perf_counter()
+    expected = [apply_fst(fst, x) for x in tokens]
+    grammar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    spoken = numeric.verbalize_batch(tokens)
+    numeric_seconds = time.perf_counter() - start
+
+    mismatches = [(x, y, z) for x, y, z in zip(tokens, spoken, expected) if y != z]
+    for token, numeric_spoken, grammar_spoken in mismatches[:10]:
+        logging.warning("[{}]: numeric [{}], grammar [{}]".format(token, numeric_spoken, grammar_spoken))
+    return {
+        "batch_size": batch_size,
+        "grammar_seconds": grammar_seconds,
+        "numeric_seconds": numeric_seconds,
+        "grammar_tokens_per_second": batch_size / grammar_seconds,
+        "numeric_tokens_per_second": batch_size / numeric_seconds,
+        "speedup": grammar_seconds / numeric_seconds,
+        "mismatches": len(mismatches),
+    }
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Benchmarks batched numeric verbalization against VerbalizeFst")
+    ap.add_argument("--out", required=True, help="JSON file to store results to")
+    ap.add_argument("--batch-size", type=int, default=10000, help="Number of numeric tokens to verbalize")
+    ap.add_argument("--seed", type=int, default=0, help="Seed of random generator for tokens")
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    results = benchmark_numeric(args.batch_size, args.seed)
+    with open(args.out, "w", encoding="utf-8") as fp:
+        json.dump(results, fp, indent=2)
+    logging.info(
+        "grammar: {:.0f} tokens/s, numeric: {:.0f} tokens/s, speedup {:.1f}x, {} mismatches".format(
+            results["grammar_tokens_per_second"],
+            results["numeric_tokens_per_second"],
+            results["speedup"],
+            results["mismatches"],
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Copyright 2022 Balacoon
+
+Benchmark of pruned classification. Ambiguous inputs (dates that are also fractions,
+ranges, long runs of digits and punctuation) are classified with ClassifyFst without pruning
+and with lattice pruned with each of the beams. For each beam, benchmark records how often
+pruned classification picks the same best path, latency and size of the lattice.
+Since lattice is composed completely before it is pruned, pruned classification is not expected
+to be faster, benchmark reports its latency relative to unpruned one (`p50_slowdown`):
+
+..
+
+    python benchmark_pruning.py --out pruning.json --beams 1 5 10 --max-states 10000
+"""
+
+import argparse
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import pynini
+import pywrapfst
+from en_us_normalization.production.benchmarks.benchmark_grammars import measure_latency
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.grammar_export import apply_fst, prepare_fst
+
+# inputs with many competing classifications
+AMBIGUOUS_INPUTS = [
+    "12/04/15 at 3:30pm",
+    "1/2 - 3/4 of 12-15 kg",
+    "call 123-123-5678 or 123 123 5678",
+    "3.14159265358979323846264338327950288419716939937510",
+    "--- ... !!! ??? 1.2.3.4.5.6.7.8.9 ---",
+    "scores were 3-1, 2-2, 1-0 and 4-3 on 12.03, 15.03 and 18.03",
+]
+
+
+def apply_fst_pruned(
+    fst: pywrapfst.Fst, text: str, beam: float, max_states: int = None
+) -> Tuple[str, int, Optional[int]]:
+    """
+    applies grammar to the text, pruning the lattice before the best path is picked.
+    Paths with weight above weight of the best path plus `beam` are removed and at most `max_states`
+    states are kept. Weight pruning never removes the best path, while state cap removes it if the best path
+    alone is longer than the cap. In that case, lattice is pruned by weight only, which is reported
+    by returning None as state cap.
+
+    pywrapfst composes eagerly, i.e. lattice is built completely before it is pruned, so pruning
+    doesn't save any composition work and only adds its own cost on top of `apply_fst`.
+    It is only used to measure how much of the lattice a beam keeps and whether it preserves the best path.
+
+    Parameters
+    ----------
+    fst: pywrapfst.Fst
+        grammar to apply
+    text: str
+        input text
+    beam: float
+        weight threshold relative to the best path
+    max_states: int
+        maximum number of states to keep. If not provided, only weight pruning is done
+
+    Returns
+    -------
+    result: Tuple[str, int, Optional[int]]
+        output of the best path, number of states in composed lattice and state cap that was applied
+    """
+    lattice = pywrapfst.compose(pynini.accep(pynini.escape(text)), fst)
+    num_states = lattice.num_states()
+    if max_states is not None and num_states > max_states:
+        best = pywrapfst.shortestpath(pywrapfst.prune(lattice, weight=beam, nstate=max_states))
+        if best.start() != pywrapfst.NO_STATE_ID:
+            return pynini.Fst.from_pywrapfst(best).string(), num_states, max_states
+    best = pywrapfst.shortestpath(pywrapfst.prune(lattice, weight=beam))
+    return pynini.Fst.from_pywrapfst(best).string(), num_states, None
+
+
+def benchmark_pruning(beams: List[float], max_states: int = None, repeats: int = 5) -> Dict:
+    """
+    classifies ambiguous inputs with and without pruning of the lattice
+
+    Parameters
+    ----------
+    beams: List[float]
+        weight thresholds relative to the best path to benchmark
+    max_states: int
+        maximum number of lattice states kept by pruning
+    repeats: int
+        number of times to classify each of the inputs
+
+    Returns
+    -------
+    results: Dict
+        latency without pruning and, for each beam, latency and its ratio to latency without pruning,
+        share of inputs with the same best path as without pruning and number of inputs where state cap was applied
+    """
+    fst = prepare_fst(ClassifyFst().fst)
+    expected = [apply_fst(fst, x) for x in AMBIGUOUS_INPUTS]
+    results = {
+        "max_states": max_states,
+        "unpruned": measure_latency(lambda x: apply_fst(fst, x), AMBIGUOUS_INPUTS, repeats),
+        "beams": {},
+    }
+    lattice_states = []
+    for beam in beams:
+        pruned = [apply_fst_pruned(fst, x, beam, max_states) for x in AMBIGUOUS_INPUTS]
+        lattice_states = [num_states for _, num_states, _ in pruned]
+        apply = lambda x, beam=beam: apply_fst_pruned(fst, x, beam, max_states)  # noqa: E731
+        result = measure_latency(apply, AMBIGUOUS_INPUTS, repeats)
+        result["agreement"] = sum(x[0] == y for x, y in zip(pruned, expected)) / len(expected)
+        result["capped"] = sum(cap is not None for _, _, cap in pruned)
+        result["p50_slowdown"] = result["p50_ms"] / results["unpruned"]["p50_ms"]
+        results["beams"][str(beam)] = result
+    results["lattice_states"] = dict(zip(AMBIGUOUS_INPUTS, lattice_states))
+    return results
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Benchmarks classification with pruned lattice on ambiguous inputs")
+    ap.add_argument("--out", required=True, help="JSON file to store results to")
+    ap.add_argument("--beams", type=float, nargs="+", default=[1.0, 5.0, 10.0], help="Beams to benchmark")
+    ap.add_argument("--max-states", type=int, help="Maximum number of lattice states to keep")
+    ap.add_argument("--repeats", type=int, default=5, help="Number of times to classify each input")
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    results = benchmark_pruning(args.beams, args.max_states, args.repeats)
+    with open(args.out, "w", encoding="utf-8") as fp:
+        json.dump(results, fp, indent=2)
+    logging.info("unpruned: p50 {:.2f}ms".format(results["unpruned"]["p50_ms"]))
+    for beam, result in results["beams"].items():
+        logging.info(
+            "beam {}: p50 {:.2f}ms ({:.2f}x of unpruned), agreement {:.3f}, capped {}".format(
+                beam, result["p50_ms"], result["p50_slowdown"], result["agreement"], result["capped"]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
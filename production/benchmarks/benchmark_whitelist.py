@@ -0,0 +1,170 @@
+"""
+Copyright 2022 Balacoon
+
+Benchmark of the whitelist stage. Whitelist is kept in a prefix trie outside of ClassifyFst,
+so benchmark records the size of the trie, memory it takes and latency of lookups along with
+the size of ClassifyFst, which stays the same whether whitelist is used or not.
+Optionally, whitelist is also compiled into the union of classifiers, to show how much
+classification grammar would grow otherwise:
+
+..
+
+    python benchmark_whitelist.py --out whitelist.json --compiled
+"""
+
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+from typing import Dict, List
+
+import pynini
+from pynini.lib import pynutil
+from en_us_normalization.production.benchmarks.benchmark_grammars import get_fst_stats, get_percentile
+from en_us_normalization.production.classify.classify import CLASSIFY_UNION, ClassifierBuilder, ClassifyFst
+from en_us_normalization.production.grammar_export import prepare_fst
+from en_us_normalization.production.runtime.whitelist import Whitelist, load_whitelist_entries
+
+# representative inputs: whitelisted tokens (single and multi-word) and regular words
+WHITELIST_INPUTS = [
+    "Ph.D.",
+    "Rev. Smith",
+    "A. B. G.",
+    "A. B. and",
+    "AAAS",
+    "hello",
+    "world!",
+    "1.30",
+]
+
+
+def measure_lookup(whitelist: Whitelist, inputs: List[str], repeats: int) -> Dict[str, float]:
+    """
+    measures latency of matching whitelisted token at the beginning of the inputs
+
+    Parameters
+    ----------
+    whitelist: Whitelist
+        whitelist to benchmark
+    inputs: List[str]
+        texts to match whitelisted tokens in
+    repeats: int
+        number of times to match each of the inputs
+
+    Returns
+    -------
+    latency: Dict[str, float]
+        median and 99th percentile of latency in nanoseconds
+    """
+    latencies = []
+    for text in inputs:
+        words = text.split()
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            whitelist.match(words)
+            latencies.append(time.perf_counter_ns() - start)
+    return {"lookup_p50_ns": get_percentile(latencies, 50), "lookup_p99_ns": get_percentile(latencies, 99)}
+
+
+def get_compiled_stats(entries: Dict[str, str]) -> Dict[str, int]:
+    """
+    compiles whitelist into the union of classifiers, as if it was one more branch
+    of ClassifyFst, and measures the resulting classification grammar
+
+    Parameters
+    ----------
+    entries: Dict[str, str]
+        whitelisted tokens and their spoken form
+
+    Returns
+    -------
+    stats: Dict[str, int]
+        size of classification grammar with whitelist compiled in
+    """
+    builder = ClassifierBuilder()
+    union = None
+    for name, _ in CLASSIFY_UNION:
+        branch = builder.get_branch(name)
+        union = branch if union is None else union | branch
+    whitelist = pynini.string_map((pynini.escape(k), pynini.escape(v)) for k, v in entries.items())
+    union |= pynutil.insert('name: "') + whitelist + pynutil.insert('"')
+    return get_fst_stats(ClassifyFst.get_sentence_fst(union).optimize())
+
+
+def benchmark_whitelist(repeats: int = 1000, compiled: bool = False) -> Dict:
+    """
+    runs benchmark of the whitelist stage
+
+    Parameters
+    ----------
+    repeats: int
+        number of times to match each of the inputs
+    compiled: bool
+        whether to also measure classification grammar with whitelist compiled in.
+        It takes a while.
+
+    Returns
+    -------
+    results: Dict
+        size, memory and lookup latency of the whitelist and size of ClassifyFst
+    """
+    entries = load_whitelist_entries()
+    tracemalloc.start()
+    start = time.perf_counter()
+    whitelist = Whitelist(entries)
+    build_seconds = time.perf_counter() - start
+    memory_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results = {
+        "entries": len(whitelist),
+        "multi_word_entries": sum(1 for key in entries if " " in key),
+        "trie_nodes": whitelist.num_nodes,
+        "build_seconds": build_seconds,
+        "memory_bytes": memory_bytes,
+    }
+    results.update(measure_lookup(whitelist, WHITELIST_INPUTS, repeats))
+    logging.info("Building ClassifyFst")
+    results["classify"] = get_fst_stats(prepare_fst(ClassifyFst().fst))
+    if compiled:
+        logging.info("Building ClassifyFst with compiled whitelist")
+        results["classify_with_compiled_whitelist"] = get_compiled_stats(entries)
+    return results
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Benchmarks whitelist stage and size of classification grammar")
+    ap.add_argument("--out", required=True, help="JSON file to store results to")
+    ap.add_argument("--repeats", type=int, default=1000, help="Number of times to match each input")
+    ap.add_argument("--compiled", action="store_true", help="Measure ClassifyFst with whitelist compiled in")
+    ap.add_argument("--baseline", help="Results of benchmark_grammars.py to check size of ClassifyFst against")
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    results = benchmark_whitelist(args.repeats, args.compiled)
+    with open(args.out, "w", encoding="utf-8") as fp:
+        json.dump(results, fp, indent=2)
+    logging.info(
+        "{} entries, {} nodes, {} bytes, lookup p50 {}ns, p99 {}ns".format(
+            results["entries"],
+            results["trie_nodes"],
+            results["memory_bytes"],
+            results["lookup_p50_ns"],
+            results["lookup_p99_ns"],
+        )
+    )
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fp:
+            baseline = json.load(fp)["grammars"]["classify"]
+        for metric in ("states", "arcs", "serialized_bytes"):
+            logging.info("ClassifyFst {}: {} (baseline {})".format(metric, results["classify"][metric], baseline[metric]))
+    if args.compiled:
+        logging.info("ClassifyFst with compiled whitelist: {}".format(results["classify_with_compiled_whitelist"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Copyright 2022 Balacoon
+
+Profiler of ClassifyFst, that attributes its size and build time to branches
+of the union of classifiers. Classifier is built incrementally: branches are added to the union
+one by one in the same order as in ClassifyFst, and after each addition sentence grammar
+is optimized and measured. Difference with the previous step is the marginal cost of a branch.
+Branches are ranked by their marginal number of arcs:
+
+..
+
+    python profile_classify.py --out classify_profile.json
+"""
+
+import argparse
+import json
+import logging
+import time
+from typing import Dict, List
+
+from en_us_normalization.production.benchmarks.benchmark_grammars import get_fst_stats
+from en_us_normalization.production.classify.classify import CLASSIFY_UNION, ClassifierBuilder, ClassifyFst
+
+# metrics of the optimized sentence grammar, marginal cost is computed for each of them
+PROFILED_METRICS = ("states", "arcs", "serialized_bytes", "optimize_seconds")
+
+
+def profile_classify(names: List[str] = None) -> List[Dict]:
+    """
+    builds ClassifyFst branch by branch and measures the cost of each branch
+
+    Parameters
+    ----------
+    names: List[str]
+        branches of the union to profile, in the order of CLASSIFY_UNION.
+        If not provided, all branches of ClassifyFst are profiled.
+
+    Returns
+    -------
+    report: List[Dict]
+        cost of each branch, ranked by marginal number of arcs, most expensive first.
+        Contains build time of the classifier (excluding classifiers it reuses),
+        size of the classifier on its own and marginal size and optimization time
+        that it adds to sentence grammar.
+    """
+    if names is None:
+        names = [name for name, _ in CLASSIFY_UNION]
+    builder = ClassifierBuilder()
+    report = []
+    union = None
+    previous = {metric: 0 for metric in PROFILED_METRICS}
+    for name, weight in CLASSIFY_UNION:
+        if name not in names:
+            continue
+        logging.info("Adding {} to the union".format(name))
+        branch = builder.get_branch(name)
+        union = branch if union is None else union | branch
+
+        start = time.perf_counter()
+        graph = ClassifyFst.get_sentence_fst(union).optimize()
+        current = {"optimize_seconds": time.perf_counter() - start}
+        current.update(get_fst_stats(graph))
+
+        entry = {
+            "name": name,
+            "weight": weight,
+            "build_seconds": builder.build_seconds[name],
+            "standalone": get_fst_stats(builder.get(name).fst),
+            "cumulative": current,
+        }
+        entry.update({"marginal_" + metric: current[metric] - previous[metric] for metric in PROFILED_METRICS})
+        report.append(entry)
+        previous = current
+
+    # classifiers that are built only as dependencies of branches, for ex. cardinal for ordinal
+    for name in builder.build_seconds:
+        if name not in names:
+            report.append({"name": name, "build_seconds": builder.build_seconds[name], "dependency_only": True})
+    return sorted(report, key=lambda x: x.get("marginal_arcs", -1), reverse=True)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Attributes size and build time of ClassifyFst to its branches")
+    ap.add_argument("--out", required=True, help="JSON file to store ranked report to")
+    ap.add_argument("--branches", nargs="+", help="Branches of the union to profile, all by default")
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    report = profile_classify(args.branches)
+    with open(args.out, "w", encoding="utf-8") as fp:
+        json.dump(report, fp, indent=2)
+    for entry in report:
+        if entry.get("dependency_only"):
+            logging.info("{:>14}: build {:.2f}s (dependency only)".format(entry["name"], entry["build_seconds"]))
+            continue
+        logging.info(
+            "{:>14}: +{} states, +{} arcs, +{} bytes, optimize +{:.2f}s, build {:.2f}s".format(
+                entry["name"],
+                entry["marginal_states"],
+                entry["marginal_arcs"],
+                entry["marginal_serialized_bytes"],
+                entry["marginal_optimize_seconds"],
+                entry["build_seconds"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ Combining everything together into single FST:
     :template: class.rst
 
     ClassifyFst
+    ClassifierBuilder
 
 Acceptor for words that doesn't require normalization:
 
@@ -25,6 +26,24 @@ Acceptor for words that doesn't require normalization:
 
     WordFst
 
+Lowercase words that are accepted by other classifiers, which is needed to tag plain words without ClassifyFst:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    PlainWordConflictsFst
+
+Tokens from vocabularies, which can be classified by lookup instead of ClassifyFst:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    VocabularyFst
+
 Rules for classification of different semiotic classes:
 
 .. autosummary::
@@ -59,7 +78,7 @@ multi-token FSTs:
 from en_us_normalization.production.classify.abbreviation import AbbreviationFst
 from en_us_normalization.production.classify.address import AddressFst
 from en_us_normalization.production.classify.cardinal import CardinalFst
-from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.classify.classify import ClassifierBuilder, ClassifyFst
 from en_us_normalization.production.classify.date import DateFst
 from en_us_normalization.production.classify.decimal import DecimalFst
 from en_us_normalization.production.classify.electronic import ElectronicFst
@@ -67,9 +86,11 @@ from en_us_normalization.production.classify.fraction import FractionFst
 from en_us_normalization.production.classify.measure import MeasureFst
 from en_us_normalization.production.classify.money import MoneyFst
 from en_us_normalization.production.classify.ordinal import OrdinalFst
+from en_us_normalization.production.classify.plain_word import PlainWordConflictsFst
 from en_us_normalization.production.classify.roman import RomanFst
 from en_us_normalization.production.classify.shortening import ShorteningFst
 from en_us_normalization.production.classify.telephone import TelephoneFst
 from en_us_normalization.production.classify.time import TimeFst
 from en_us_normalization.production.classify.verbatim import VerbatimFst
+from en_us_normalization.production.classify.vocabulary import VocabularyFst
 from en_us_normalization.production.classify.word import WordFst
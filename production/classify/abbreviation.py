@@ -144,7 +144,16 @@ class AbbreviationFst(BaseFst):
        "AT&T"
     """
 
-    def __init__(self):
+    def __init__(self, vocabulary: bool = True):
+        """
+        constructor of abbreviations transducer
+
+        Parameters
+        ----------
+        vocabulary: bool
+            whether to include abbreviations from the data files (rules 4-6). Those can be left out,
+            if vocabulary is resolved by lookup before the grammar is applied (see VocabularyFst).
+        """
         super().__init__(name="abbreviation")
         letters_sequence = LettersSequence()
 
@@ -164,6 +173,45 @@ class AbbreviationFst(BaseFst):
             letters_sequence.uppercase_vowels_fst, 2
         ) | pynini.closure(letters_sequence.lowercase_vowels_fst, 3)
 
+        # 4-6. acronyms, cased abbreviations and abbreviations from the lists
+        vocab_abbr = self.get_vocabulary()
+
+        # 7. unpronounceable sequences
+        unpron_abbr = UnpronouncableLettersSequence().fst
+
+        # 8. ampersand abbreviation
+        and_abbr = (
+            pynini.closure(UPPER, 1)
+            + pynini.cross("&", " and ")
+            + pynini.closure(UPPER, 1)
+        )
+
+        # abbreviation may have a suffix, for ex s, 's or 'S
+        optional_suffix = self.get_optional_suffix()
+
+        abbr = dot_abbr | consonant_abbr | vowel_abbr
+        if vocabulary:
+            abbr |= vocab_abbr
+        abbr |= unpron_abbr | and_abbr
+        graph = abbr + optional_suffix
+        graph = pynutil.insert('name: "') + graph + pynutil.insert('"')
+        self._single_fst = graph.optimize()
+        self.connect_to_self(connector_in="/", connector_out=None, connector_spaces="none")
+
+    @staticmethod
+    def get_optional_suffix() -> pynini.FstLike:
+        """
+        suffix that abbreviation may have, for ex s, 's or 'S
+        """
+        s = pynini.cross("s", "'S")
+        s |= pynini.accep("'") + pynini.union(pynini.accep("S"), pynini.cross("s", "S"))
+        return pynini.closure(s, 0, 1)
+
+    @staticmethod
+    def get_vocabulary() -> pynini.FstLike:
+        """
+        loads abbreviations from the data files: acronyms, cased abbreviations and abbreviations
+        """
         # 4. acronyms
         acronyms_lst = load_csv(get_data_file_path("abbreviations", "acronyms.tsv"))
         acronyms_vocab_abbr = pynini.union(
@@ -193,33 +241,4 @@ class AbbreviationFst(BaseFst):
                 seq_fst += element
             abbr_fsts_lst.append(seq_fst)
         vocab_abbr = pynini.union(*abbr_fsts_lst)
-
-        # 7. unpronounceable sequences
-        unpron_abbr = UnpronouncableLettersSequence().fst
-
-        # 8. ampersand abbreviation
-        and_abbr = (
-            pynini.closure(UPPER, 1)
-            + pynini.cross("&", " and ")
-            + pynini.closure(UPPER, 1)
-        )
-
-        # abbreviation may have a suffix, for ex s, 's or 'S
-        s = pynini.cross("s", "'S")
-        s |= pynini.accep("'") + pynini.union(pynini.accep("S"), pynini.cross("s", "S"))
-        optional_suffix = pynini.closure(s, 0, 1)
-
-        abbr = (
-            dot_abbr
-            | consonant_abbr
-            | vowel_abbr
-            | acronyms_vocab_abbr
-            | cased_vocab_abbr
-            | vocab_abbr
-            | unpron_abbr
-            | and_abbr
-        )
-        graph = abbr + optional_suffix
-        graph = pynutil.insert('name: "') + graph + pynutil.insert('"')
-        self._single_fst = graph.optimize()
-        self.connect_to_self(connector_in="/", connector_out=None, connector_spaces="none")
+        return acronyms_vocab_abbr | cased_vocab_abbr | vocab_abbr
@@ -6,6 +6,10 @@ Copyright 2015 and onwards Google, Inc.
 Entry point to tokenize and classify
 """
 
+import os
+import time
+from typing import Iterable, List
+
 import pynini
 from en_us_normalization.production.classify.abbreviation import AbbreviationFst
 from en_us_normalization.production.classify.address import AddressFst
@@ -25,7 +29,8 @@ from en_us_normalization.production.classify.telephone import TelephoneFst
 from en_us_normalization.production.classify.time import TimeFst
 from en_us_normalization.production.classify.verbatim import VerbatimFst
 from en_us_normalization.production.classify.word import WordFst
-from en_us_normalization.production.english_utils import get_data_file_path
+from en_us_normalization.production.english_utils import get_data_dir, get_data_file_path
+from en_us_normalization.production.text_proto import parse_text_proto
 from pynini.lib import pynutil
 
 from learn_to_normalize.grammar_utils.base_fst import BaseFst
@@ -33,55 +38,230 @@ from learn_to_normalize.grammar_utils.data_loader import load_union
 from learn_to_normalize.grammar_utils.shortcuts import delete_extra_space, insert_space, delete_space, wrap_token, TO_LOWER, LOWER, CHAR
 
 
+# name of classifier -> (grammar class, names of classifiers that are passed to its constructor)
+CLASSIFIERS = {
+    "abbreviation": (AbbreviationFst, ()),
+    "address": (AddressFst, ()),
+    "cardinal": (CardinalFst, ()),
+    "date": (DateFst, ()),
+    "word": (WordFst, ()),
+    "verbatim": (VerbatimFst, ()),
+    "time": (TimeFst, ()),
+    "telephone": (TelephoneFst, ()),
+    "electronic": (ElectronicFst, ()),
+    "shortening": (ShorteningFst, ()),
+    "ordinal": (OrdinalFst, ("cardinal",)),
+    "decimal": (DecimalFst, ("cardinal",)),
+    "fraction": (FractionFst, ("cardinal",)),
+    "money": (MoneyFst, ("decimal",)),
+    "roman": (RomanFst, ("cardinal",)),
+    "measure": (MeasureFst, ("decimal", "fraction")),
+    "attached": (AttachedTokensFst, ("cardinal", "abbreviation", "word")),
+}
+
+# branches of the union of classifiers and their weights, in the order of union
+CLASSIFY_UNION = (
+    ("shortening", 1.01),
+    ("abbreviation", 1.1),
+    ("address", 1.05),
+    ("time", 1.1),
+    ("date", 1.01),
+    ("decimal", 10.0),
+    ("measure", 1.1),
+    ("cardinal", 9.0),
+    ("ordinal", 9.0),
+    ("money", 1.1),
+    ("telephone", 1.1),
+    ("electronic", 1.1),
+    ("fraction", 10.0),
+    ("word", 10),
+    ("verbatim", 500),
+    ("roman", 1.09),
+    # multi-token taggers
+    ("attached", 11.0),
+)
+
+# branches that can't be disabled: they accept any input not covered by semiotic classes
+REQUIRED_CLASSES = ("word", "verbatim")
+
+# classifiers that include vocabularies from the data files, which can be left out
+# if vocabulary is resolved by lookup (see VocabularyFst)
+VOCABULARY_CLASSIFIERS = ("shortening", "abbreviation", "word")
+
+
+def get_profile_classes(profile: str, config_path: str = None) -> List[str]:
+    """
+    reads classes enabled in a profile of classification grammar.
+    Profile either lists enabled classes (`enabled_class`)
+    or classes that should be disabled (`disabled_class`).
+
+    Parameters
+    ----------
+    profile: str
+        name of the profile, for ex. "chat"
+    config_path: str
+        path to the config with profiles. If not provided, configs/classify_profiles.ascii_proto is used
+
+    Returns
+    -------
+    classes: List[str]
+        names of enabled branches of CLASSIFY_UNION
+    """
+    if config_path is None:
+        config_path = os.path.join(os.path.dirname(get_data_dir()), "configs", "classify_profiles.ascii_proto")
+    with open(config_path, "r", encoding="utf-8") as fp:
+        config = parse_text_proto(fp.read())
+    for key, profile_config in config:
+        if key != "profile" or dict(profile_config).get("name") != profile:
+            continue
+        enabled = [value for key, value in profile_config if key == "enabled_class"]
+        disabled = [value for key, value in profile_config if key == "disabled_class"]
+        if not enabled:
+            enabled = [name for name, _ in CLASSIFY_UNION]
+        return [name for name in enabled if name not in disabled]
+    raise ValueError("There is no profile [{}] in {}".format(profile, config_path))
+
+
+def get_enabled_classes(profile: str = None, classes: Iterable[str] = None) -> List[str]:
+    """
+    resolves which branches of CLASSIFY_UNION are enabled, checking that they are valid
+
+    Parameters
+    ----------
+    profile: str
+        name of profile in configs/classify_profiles.ascii_proto, that defines enabled classes
+    classes: Iterable[str]
+        names of enabled classes. Takes precedence over profile.
+        If neither profile nor classes are provided, all classes are enabled.
+
+    Returns
+    -------
+    enabled_classes: List[str]
+        names of enabled classes in the order of CLASSIFY_UNION
+    """
+    if classes is None:
+        classes = get_profile_classes(profile) if profile is not None else [name for name, _ in CLASSIFY_UNION]
+    classes = set(classes)
+    known = set(name for name, _ in CLASSIFY_UNION)
+    if not classes.issubset(known):
+        raise ValueError("Unknown classes {}, expected some of {}".format(sorted(classes - known), sorted(known)))
+    if not classes.issuperset(REQUIRED_CLASSES):
+        raise ValueError("Classes {} can't be disabled".format(REQUIRED_CLASSES))
+    return [name for name, _ in CLASSIFY_UNION if name in classes]
+
+
+class ClassifierBuilder:
+    """
+    Builds classifiers of semiotic classes on demand. Classifiers that are reused
+    by other classifiers (for ex. cardinal by ordinal) are built once and shared.
+    Time spent on building each classifier, excluding its dependencies, is recorded.
+    """
+
+    def __init__(self, vocabulary: bool = True):
+        """
+        constructor of classifiers builder
+
+        Parameters
+        ----------
+        vocabulary: bool
+            whether classifiers from VOCABULARY_CLASSIFIERS include vocabularies from data files
+        """
+        self._classifiers = {}
+        self._vocabulary = vocabulary
+        self.build_seconds = {}
+
+    def get(self, name: str) -> BaseFst:
+        """
+        getter for classifier, building it and its dependencies if needed
+
+        Parameters
+        ----------
+        name: str
+            name of classifier, one of CLASSIFIERS
+
+        Returns
+        -------
+        classifier: BaseFst
+            built classifier
+        """
+        if name not in self._classifiers:
+            if name not in CLASSIFIERS:
+                raise ValueError("Unknown classifier [{}], expected one of {}".format(name, list(CLASSIFIERS.keys())))
+            grammar_cls, dependencies = CLASSIFIERS[name]
+            kwargs = {x: self.get(x) for x in dependencies}
+            if not self._vocabulary and name in VOCABULARY_CLASSIFIERS:
+                kwargs["vocabulary"] = False
+            start = time.time()
+            self._classifiers[name] = grammar_cls(**kwargs)
+            self.build_seconds[name] = time.time() - start
+        return self._classifiers[name]
+
+    def get_branch(self, name: str) -> pynini.Fst:
+        """
+        getter for classifier, weighted as a branch of the union in ClassifyFst
+        """
+        weights = dict(CLASSIFY_UNION)
+        return pynutil.add_weight(self.get(name).fst, weights[name])
+
+
 class ClassifyFst(BaseFst):
     """
     Final class that composes all other classification grammars.
     This class can process an entire sentence including punctuation.
     For deployment, this grammar will be compiled and exported to OpenFst Finite State Archive (FAR) File.
+    Classifiers of semiotic classes are weighted and put in a union (see CLASSIFY_UNION),
+    which is then wrapped into a closure of tokens connected with whitespace or punctuation.
+
+    Deployments that never see some of the semiotic classes can enable only a subset of classes,
+    either listing them or picking a profile from configs/classify_profiles.ascii_proto.
+    Disabled classes are not built, unless other classes reuse them, and are not put in the union,
+    which makes grammar smaller and faster both to build and to apply.
+
+    Vocabularies of shortenings, abbreviations and words with apostrophe in front
+    can be left out of the grammar, if they are resolved by lookup before classification.
     """
 
-    def __init__(self):
+    def __init__(self, profile: str = None, classes: Iterable[str] = None, vocabulary: bool = True):
+        """
+        constructor of classification grammar
+
+        Parameters
+        ----------
+        profile: str
+            name of profile in configs/classify_profiles.ascii_proto, that defines enabled classes
+        classes: Iterable[str]
+            names of enabled classes, i.e. branches of CLASSIFY_UNION. Takes precedence over profile.
+            If neither profile nor classes are provided, all classes are enabled.
+        vocabulary: bool
+            whether to include vocabularies from the data files in classifiers.
+            If False, classifiers from VOCABULARY_CLASSIFIERS are built without vocabularies.
+        """
         super().__init__(name="tokenize_and_classify")
+        self.enabled_classes = get_enabled_classes(profile, classes)
 
-        address = AddressFst()
-        cardinal = CardinalFst()
-        date = DateFst()
-        word = WordFst()
-        verbatim = VerbatimFst()
-        time = TimeFst()
-        telephone = TelephoneFst()
-        electronic = ElectronicFst()
-        abbreviation = AbbreviationFst()
-        shortening = ShorteningFst()
-        ordinal = OrdinalFst(cardinal=cardinal)
-        decimal = DecimalFst(cardinal=cardinal)
-        fraction = FractionFst(cardinal=cardinal)
-        money = MoneyFst(decimal=decimal)
-        roman = RomanFst(cardinal=cardinal)
-        measure = MeasureFst(decimal=decimal, fraction=fraction)
-        left_punct, right_punct = get_punctuation_rules()
+        builder = ClassifierBuilder(vocabulary=vocabulary)
+        classify = builder.get_branch(self.enabled_classes[0])
+        for name in self.enabled_classes[1:]:
+            classify |= builder.get_branch(name)
+        self._single_fst = self.get_sentence_fst(classify).optimize()
 
-        classify = (
-            pynutil.add_weight(shortening.fst, 1.01)
-            | pynutil.add_weight(abbreviation.fst, 1.1)
-            | pynutil.add_weight(address.fst, 1.05)
-            | pynutil.add_weight(time.fst, 1.1)
-            | pynutil.add_weight(date.fst, 1.01)
-            | pynutil.add_weight(decimal.fst, 10.0)
-            | pynutil.add_weight(measure.fst, 1.1)
-            | pynutil.add_weight(cardinal.fst, 9.0)
-            | pynutil.add_weight(ordinal.fst, 9.0)
-            | pynutil.add_weight(money.fst, 1.1)
-            | pynutil.add_weight(telephone.fst, 1.1)
-            | pynutil.add_weight(electronic.fst, 1.1)
-            | pynutil.add_weight(fraction.fst, 10.0)
-            | pynutil.add_weight(word.fst, 10)
-            | pynutil.add_weight(verbatim.fst, 500)
-            | pynutil.add_weight(roman.fst, 1.09)
-        )
-        # also add multi-token taggers
-        attached = AttachedTokensFst(cardinal, abbreviation, word)
-        classify |= pynutil.add_weight(attached.fst, 11.0)
+    @staticmethod
+    def get_sentence_fst(classify: pynini.FstLike) -> pynini.Fst:
+        """
+        wraps union of classifiers into a grammar that processes entire sentence:
+        tokens with optional punctuation, connected with whitespace, punctuation or symbols.
+
+        Parameters
+        ----------
+        classify: pynini.FstLike
+            union of classifiers of semiotic classes
+
+        Returns
+        -------
+        graph: pynini.Fst
+            not optimized grammar of the sentence
+        """
+        left_punct, right_punct = get_punctuation_rules()
 
         # token with prefix and optional punctuation on the left
         token = (
@@ -105,7 +285,7 @@ class ClassifyFst(BaseFst):
         graph = delete_space + graph + delete_space
         # to enable detection of all-capitals lines - uncomment
         # graph = self._fix_all_capital_fst() @ graph
-        self._single_fst = graph.optimize()
+        return graph
 
     @staticmethod
     def _fix_all_capital_fst():
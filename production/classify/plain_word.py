@@ -0,0 +1,56 @@
+"""
+Copyright 2022 Balacoon
+
+lowercase words that classifiers other than WordFst accept
+"""
+
+import string
+from typing import Iterable
+
+import pynini
+from en_us_normalization.production.classify.classify import REQUIRED_CLASSES, ClassifierBuilder, get_enabled_classes
+
+from learn_to_normalize.grammar_utils.base_fst import BaseFst
+
+
+class PlainWordConflictsFst(BaseFst):
+    """
+    Acceptor of words made of lowercase ascii letters, that can be classified
+    by ClassifyFst as something else than a regular word. Those are words
+    accepted by any enabled classifier other than WordFst and VerbatimFst,
+    for ex. shortenings ("mrs") or abbreviations from the lists.
+    Any other lowercase word, taken on its own, is classified by ClassifyFst
+    as a regular word, so it doesn't need to go through the classification grammar.
+    Set of classifiers is defined the same way as in ClassifyFst, so
+    conflicts should be built with the same profile or classes as classification grammar.
+
+    Examples of accepted words:
+
+    - mrs
+    - etc
+    """
+
+    def __init__(self, profile: str = None, classes: Iterable[str] = None):
+        """
+        constructor of plain word conflicts acceptor
+
+        Parameters
+        ----------
+        profile: str
+            name of profile in configs/classify_profiles.ascii_proto, same as for ClassifyFst
+        classes: Iterable[str]
+            names of enabled classes, same as for ClassifyFst
+        """
+        super().__init__(name="plain_word_conflicts")
+        lowercase_word = pynini.closure(pynini.union(*string.ascii_lowercase), 1)
+        builder = ClassifierBuilder()
+        conflicts = None
+        for name in get_enabled_classes(profile, classes):
+            if name in REQUIRED_CLASSES:
+                continue
+            accepted = pynini.project(builder.get(name).fst, "input") @ lowercase_word
+            conflicts = accepted if conflicts is None else conflicts | accepted
+        if conflicts is None:
+            conflicts = pynini.Fst()
+        conflicts = pynini.arcmap(conflicts, map_type="rmweight")
+        self._single_fst = conflicts.optimize()
@@ -32,7 +32,16 @@ class ShorteningFst(BaseFst):
       name: "misses"
     """
 
-    def __init__(self):
+    def __init__(self, vocabulary: bool = True):
+        """
+        constructor of shortenings transducer
+
+        Parameters
+        ----------
+        vocabulary: bool
+            whether to include shortenings from the data files. Those can be left out,
+            if vocabulary is resolved by lookup before the grammar is applied (see VocabularyFst).
+        """
         super().__init__(name="shortening")
 
         # some custom shortenings that require context
@@ -44,13 +53,22 @@ class ShorteningFst(BaseFst):
         st_saint = pynini.cross(st, "saint")
         graph |= st_saint + pynini.accep(" ") + TO_LOWER + pynini.closure(LOWER, 1)
 
-        graph |= load_mapping(
+        if vocabulary:
+            graph |= self.get_vocabulary()
+        graph = pynutil.insert('name: "') + graph + pynutil.insert('"')
+        self._single_fst = graph.optimize()
+
+    @staticmethod
+    def get_vocabulary() -> pynini.FstLike:
+        """
+        loads shortenings from the data files, that are expanded regardless of the context
+        """
+        vocabulary = load_mapping(
             get_data_file_path("shortenings", "case_agnostic.tsv"),
             key_case_agnostic=True,
             key_with_dot=True,
         )
-        graph |= load_mapping(
+        vocabulary |= load_mapping(
             get_data_file_path("shortenings", "cased.tsv"), key_case_agnostic=False
         )
-        graph = pynutil.insert('name: "') + graph + pynutil.insert('"')
-        self._single_fst = graph.optimize()
+        return vocabulary
@@ -0,0 +1,38 @@
+"""
+Copyright 2022 Balacoon
+
+vocabulary of tokens that are resolved by lookup
+"""
+
+import pynini
+from en_us_normalization.production.classify.abbreviation import AbbreviationFst
+from en_us_normalization.production.classify.shortening import ShorteningFst
+from en_us_normalization.production.classify.word import WordFst
+
+from learn_to_normalize.grammar_utils.base_fst import BaseFst
+
+
+class VocabularyFst(BaseFst):
+    """
+    Acceptor of tokens that classifiers take from vocabularies in data files
+    rather than from rules: shortenings, acronyms and abbreviations (with suffix, if any)
+    and words with apostrophe in front. Vocabularies are loaded exactly as classifiers load them,
+    so acceptor lists all the spellings classifiers accept, for ex. with and without the dot
+    or in different cases.
+
+    Set of accepted tokens is finite, so tagging of those can be precomputed
+    and resolved by lookup (see runtime.VocabularyLookup).
+
+    Examples of accepted tokens:
+
+    - Mrs.
+    - NASA's
+    - 'em
+    """
+
+    def __init__(self):
+        super().__init__(name="vocabulary")
+        vocabulary = ShorteningFst.get_vocabulary()
+        vocabulary |= AbbreviationFst.get_vocabulary() + AbbreviationFst.get_optional_suffix()
+        vocabulary |= WordFst.get_vocabulary()
+        self._single_fst = pynini.arcmap(pynini.project(vocabulary, "input"), map_type="rmweight").optimize()
@@ -39,7 +39,16 @@ class WordFst(BaseFst):
     - Hello -> name: "hello"
     """
 
-    def __init__(self):
+    def __init__(self, vocabulary: bool = True):
+        """
+        constructor of regular words transducer
+
+        Parameters
+        ----------
+        vocabulary: bool
+            whether to include words with apostrophe in front from the data file. Those can be left out,
+            if vocabulary is resolved by lookup before the grammar is applied (see VocabularyFst).
+        """
         super().__init__(name="word")
         # just alpha characters that can go directly to pronunciation generation
         unicode_char = pynini.string_file(get_data_file_path("unicode_chars.tsv"))
@@ -63,7 +72,16 @@ class WordFst(BaseFst):
         word += pynini.closure(s_endigns, 0, 1)
 
         # allow apostrophe in front of the word if word is from the list
-        shortened_words = load_union(get_data_file_path("front_apostrophe.tsv"), case_agnostic=True)
-        word |= (apostrophe + shortened_words)
+        if vocabulary:
+            word |= self.get_vocabulary()
         word = pynutil.insert('name: "') + word + pynutil.insert('"')
         self._single_fst = word.optimize()
+
+    @staticmethod
+    def get_vocabulary() -> pynini.FstLike:
+        """
+        loads words that are allowed to have apostrophe in front, for ex. "'em"
+        """
+        apostrophe = pynini.accep("'") | pynini.cross("’", "'")
+        shortened_words = load_union(get_data_file_path("front_apostrophe.tsv"), case_agnostic=True)
+        return apostrophe + shortened_words
@@ -0,0 +1,221 @@
+"""
+Copyright 2022 Balacoon
+
+Content-addressed cache of compiled grammars.
+Building ClassifyFst and VerbalizeFst from scratch takes a while,
+so compiled FSTs are stored in a cache directory keyed on a hash of
+grammar sources and data files. If nothing changed since last build,
+grammar is loaded from the file instead of being recompiled.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Dict, List, Type
+
+import pynini
+from en_us_normalization.production.english_utils import get_data_dir
+
+from learn_to_normalize.grammar_utils import base_fst
+from learn_to_normalize.grammar_utils.base_fst import BaseFst
+
+# python modules, packages and configs that define grammars, relative to production dir
+GRAMMAR_SOURCES = (
+    "classify",
+    "verbalize",
+    "english_utils.py",
+    "text_proto.py",
+    os.path.join("configs", "classify_profiles.ascii_proto"),
+)
+
+
+class CachedFst(BaseFst):
+    """
+    Grammar restored from the compile cache. Holds the same
+    fst as the grammar which was originally compiled, so it can be used
+    in place of it, i.e. `apply` produces exactly the same output.
+    """
+
+    def __init__(self, name: str, fst: pynini.Fst):
+        """
+        constructor of grammar restored from the cache
+
+        Parameters
+        ----------
+        name: str
+            name of the grammar, i.e. name of the original grammar class
+        fst: pynini.Fst
+            compiled fst of the original grammar
+        """
+        super().__init__(name=name)
+        self._single_fst = fst
+
+
+def get_production_dir() -> str:
+    """
+    getter for absolute path to production grammars dir
+    """
+    return os.path.dirname(get_data_dir())
+
+
+def _list_files(path: str, extensions: List[str] = None) -> List[str]:
+    """
+    helper function that lists files under the path recursively
+    in a deterministic order, skipping python caches.
+    """
+    if os.path.isfile(path):
+        return [path]
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(x for x in dirs if x != "__pycache__")
+        for name in sorted(names):
+            if extensions is None or os.path.splitext(name)[1] in extensions:
+                files.append(os.path.join(root, name))
+    return files
+
+
+def get_grammar_files() -> List[str]:
+    """
+    lists all the files that define compiled grammars:
+    python modules with grammar rules, all the data files and
+    grammar utilities from learn_to_normalize.
+
+    Returns
+    -------
+    files: List[str]
+        absolute paths to files that affect compiled grammars
+    """
+    production_dir = get_production_dir()
+    files = []
+    for source in GRAMMAR_SOURCES:
+        files.extend(_list_files(os.path.join(production_dir, source), extensions=[".py"]))
+    files.extend(_list_files(get_data_dir()))
+    files.extend(_list_files(os.path.dirname(os.path.abspath(base_fst.__file__)), extensions=[".py"]))
+    return files
+
+
+def get_grammars_hash(files: List[str] = None) -> str:
+    """
+    computes hash of grammar sources. Hash changes whenever any python module with
+    grammar rules or any data file is modified, added or removed.
+
+    Parameters
+    ----------
+    files: List[str]
+        files to compute hash for. By default - all files returned by `get_grammar_files`
+
+    Returns
+    -------
+    hash: str
+        hex digest of grammar sources
+    """
+    if files is None:
+        files = get_grammar_files()
+    production_dir = get_production_dir()
+    hasher = hashlib.sha256()
+    hasher.update(pynini.__version__.encode("utf-8"))
+    for path in files:
+        # relative path, so the hash doesn't depend on installation location
+        rel_path = os.path.relpath(path, production_dir) if path.startswith(production_dir) else os.path.basename(path)
+        hasher.update(rel_path.encode("utf-8"))
+        with open(path, "rb") as fp:
+            hasher.update(hashlib.sha256(fp.read()).digest())
+    return hasher.hexdigest()
+
+
+def get_default_cache_dir() -> str:
+    """
+    getter for default directory to store compiled grammars.
+    Can be overridden with EN_US_NORMALIZATION_CACHE environment variable.
+    """
+    default_dir = os.path.join(os.path.expanduser("~"), ".cache", "en_us_normalization")
+    return os.environ.get("EN_US_NORMALIZATION_CACHE", default_dir)
+
+
+def get_cache_path(grammar_cls: Type[BaseFst], cache_dir: str, grammars_hash: str, **kwargs) -> str:
+    """
+    getter for the path of cached grammar. Path is defined by grammar class,
+    arguments that grammar is constructed with and hash of grammar sources.
+    """
+    key = "{}.{}({})".format(
+        grammar_cls.__module__,
+        grammar_cls.__name__,
+        ", ".join("{}={!r}".format(k, v) for k, v in sorted(kwargs.items())),
+    )
+    key_hash = hashlib.sha256((key + grammars_hash).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, "{}_{}.far".format(grammar_cls.__name__, key_hash[:32]))
+
+
+def save_fst(path: str, name: str, fst: pynini.Fst):
+    """
+    stores fst into FAR under the given name. File is written atomically,
+    so concurrent processes never observe partially written archive.
+    """
+    out_dir = os.path.dirname(path)
+    os.makedirs(out_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        with pynini.Far(tmp_path, mode="w") as far:
+            far[name] = fst
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_fst(path: str) -> Dict[str, pynini.Fst]:
+    """
+    loads all fsts stored in FAR
+
+    Returns
+    -------
+    fsts: Dict[str, pynini.Fst]
+        mapping from names to fsts stored in the archive
+    """
+    far = pynini.Far(path, mode="r")
+    fsts = {}
+    while not far.done():
+        fsts[far.get_key()] = far.get_fst()
+        far.next()
+    return fsts
+
+
+def load_or_build(grammar_cls: Type[BaseFst], cache_dir: str = None, **kwargs) -> BaseFst:
+    """
+    Loads compiled grammar from the cache. If there is no cached grammar
+    for current grammar sources (cache miss), grammar is built from scratch
+    and stored in the cache.
+
+    Parameters
+    ----------
+    grammar_cls: Type[BaseFst]
+        grammar to load or build, for ex. ClassifyFst or VerbalizeFst
+    cache_dir: str
+        directory to keep compiled grammars in. If not provided, `get_default_cache_dir` is used
+    kwargs:
+        arguments to construct the grammar with. Those are part of cache key.
+
+    Returns
+    -------
+    grammar: BaseFst
+        either freshly built grammar or `CachedFst` with exactly the same fst
+    """
+    if cache_dir is None:
+        cache_dir = get_default_cache_dir()
+    path = get_cache_path(grammar_cls, cache_dir, get_grammars_hash(), **kwargs)
+    if os.path.isfile(path):
+        try:
+            fsts = load_fst(path)
+        except pynini.FstIOError:
+            logging.warning("Failed to read cached grammar {}, rebuilding".format(path))
+        else:
+            name, fst = next(iter(fsts.items()))
+            logging.info("Loaded {} from {}".format(grammar_cls.__name__, path))
+            return CachedFst(name, fst)
+
+    logging.info("Compiling {}, no cached grammar in {}".format(grammar_cls.__name__, cache_dir))
+    grammar = grammar_cls(**kwargs)
+    save_fst(path, grammar_cls.__name__, grammar.fst)
+    return grammar
@@ -0,0 +1,356 @@
+"""
+Copyright 2022 Balacoon
+
+Export of production grammars for deployment.
+Grammars are written to OpenFst Finite State Archives (FAR) in `const` fst format,
+with arcs sorted by input label. Const fsts are stored as flat arrays of states and arcs
+and are loadable from python without conversion to mutable fsts.
+pywrapfst reads archives onto the heap, it doesn't memory-map them, so each load
+of a grammar costs its full size. Grammars are shared by loading them once: threads share
+loaded fsts directly, and worker processes forked after grammars are loaded inherit them.
+Const fsts are never written to, so inherited pages stay shared copy-on-write.
+Verbalization grammar can also be exported as one rule per semiotic class, so that
+serialized tokens are composed only with the verbalizer of their class.
+"""
+
+import os
+import threading
+import weakref
+from typing import Dict, List, Tuple
+
+import pynini
+import pywrapfst
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.verbalize.verbalize import VERBALIZE_UNION, VerbalizeFst, VerbalizerBuilder
+
+from learn_to_normalize.grammar_utils.base_fst import BaseFst
+
+# names of the rules in exported archives, as referred in configs/tokenizer.ascii_proto
+# and configs/verbalizer.ascii_proto
+TOKENIZE_AND_CLASSIFY_RULE = "TOKENIZE_AND_CLASSIFY"
+VERBALIZE_RULE = "ALL"
+
+TOKENIZE_AND_CLASSIFY_FAR = "tokenize_and_classify.far"
+VERBALIZE_FAR = "verbalize.far"
+# archive with a rule per semiotic class, named after the class
+CLASS_VERBALIZE_FAR = "verbalize_classes.far"
+
+
+def prepare_fst(fst: pywrapfst.Fst) -> pywrapfst.Fst:
+    """
+    converts compiled grammar into read-only fst suitable for deployment:
+    arcs are sorted by input label, so composition with input string
+    doesn't need to sort grammar each time and finds arcs matching the next
+    input character by binary search, and fst is converted to
+    `const` type, which is a flat read-only array of states and arcs.
+
+    Parameters
+    ----------
+    fst: pywrapfst.Fst
+        compiled grammar
+
+    Returns
+    -------
+    const_fst: pywrapfst.Fst
+        immutable input-label sorted fst
+    """
+    if fst.fst_type() == "const" and fst.properties(pywrapfst.I_LABEL_SORTED, True) == pywrapfst.I_LABEL_SORTED:
+        # already prepared, for ex. loaded from exported archive
+        return fst
+    fst = fst.copy().arcsort(sort_type="ilabel")
+    return pywrapfst.convert(fst, fst_type="const")
+
+
+def export_fst(path: str, rule: str, fst: pynini.Fst):
+    """
+    stores grammar as a single rule in a FAR
+
+    Parameters
+    ----------
+    path: str
+        path to the archive to write
+    rule: str
+        name of the rule in the archive
+    fst: pynini.Fst
+        compiled grammar
+    """
+    writer = pywrapfst.FarWriter.create(path, arc_type="standard", far_type="default")
+    writer[rule] = prepare_fst(fst)
+    # archive is flushed when writer is destroyed
+    del writer
+
+
+def export_grammars(far_dir: str, classify: BaseFst = None, verbalize: BaseFst = None) -> Tuple[str, str]:
+    """
+    exports classification and verbalization grammars to FARs.
+
+    Parameters
+    ----------
+    far_dir: str
+        directory to store archives in
+    classify: BaseFst
+        compiled classification grammar. If not provided, ClassifyFst is built.
+    verbalize: BaseFst
+        compiled verbalization grammar. If not provided, VerbalizeFst is built.
+
+    Returns
+    -------
+    paths: Tuple[str, str]
+        paths to exported classification and verbalization archives
+    """
+    if classify is None:
+        classify = ClassifyFst()
+    if verbalize is None:
+        verbalize = VerbalizeFst()
+    os.makedirs(far_dir, exist_ok=True)
+    classify_path = os.path.join(far_dir, TOKENIZE_AND_CLASSIFY_FAR)
+    export_fst(classify_path, TOKENIZE_AND_CLASSIFY_RULE, classify.fst)
+    verbalize_path = os.path.join(far_dir, VERBALIZE_FAR)
+    export_fst(verbalize_path, VERBALIZE_RULE, verbalize.fst)
+    return classify_path, verbalize_path
+
+
+def export_class_verbalizers(far_dir: str, builder: VerbalizerBuilder = None) -> str:
+    """
+    exports verbalizers of semiotic classes to a single FAR, one rule per class.
+    Each verbalizer accepts serialized tokens of its class only, for ex. `cardinal|count:23|`
+
+    Parameters
+    ----------
+    far_dir: str
+        directory to store archive in
+    builder: VerbalizerBuilder
+        builder of verbalizers. If not provided, verbalizers are built from scratch.
+
+    Returns
+    -------
+    path: str
+        path to exported archive
+    """
+    if builder is None:
+        builder = VerbalizerBuilder()
+    os.makedirs(far_dir, exist_ok=True)
+    path = os.path.join(far_dir, CLASS_VERBALIZE_FAR)
+    writer = pywrapfst.FarWriter.create(path, arc_type="standard", far_type="default")
+    # default archive is a sorted table, rules are added in order of their names
+    for name in sorted(VERBALIZE_UNION):
+        writer[name] = prepare_fst(builder.get(name).fst)
+    del writer
+    return path
+
+
+def apply_fst(fst: pywrapfst.Fst, text: str) -> str:
+    """
+    helper function that applies grammar to the text and returns
+    output of the best path. Works both for mutable pynini fsts and
+    for read-only fsts loaded from exported archives.
+    """
+    lattice = pywrapfst.compose(pynini.accep(pynini.escape(text)), fst)
+    return pynini.shortestpath(pynini.Fst.from_pywrapfst(lattice)).string()
+
+
+class PreparedGrammar:
+    """
+    Read-only grammar prepared for composition with `prepare_fst`. Fst is never modified,
+    so a single loaded grammar can be shared by normalization pipelines of all the threads
+    and of the processes forked after it was loaded.
+    Provides the same `apply` as the grammar it was prepared from.
+    """
+
+    def __init__(self, name: str, fst: pywrapfst.Fst):
+        """
+        constructor of prepared grammar
+
+        Parameters
+        ----------
+        name: str
+            name of the grammar
+        fst: pywrapfst.Fst
+            compiled grammar. Fsts that are already prepared, for ex. loaded from exported archive, are not copied.
+        """
+        self._fst = prepare_fst(fst)
+        self.name = name
+
+    @property
+    def fst(self) -> pywrapfst.Fst:
+        """
+        getter for read-only fst
+        """
+        return self._fst
+
+    def apply(self, text: str) -> str:
+        """
+        applies grammar to the text, returning the output of the best path
+        """
+        return apply_fst(self._fst, text)
+
+
+class ExportedGrammar(PreparedGrammar):
+    """
+    Read-only grammar loaded from an exported archive. Fst is kept
+    in its `const` representation, it is not copied into a mutable fst.
+    """
+
+    def __init__(self, far_path: str, rule: str):
+        """
+        constructor of exported grammar
+
+        Parameters
+        ----------
+        far_path: str
+            path to archive produced by `export_grammars`
+        rule: str
+            name of the rule to load from the archive
+        """
+        reader = pywrapfst.FarReader.open(far_path)
+        if not reader.find(rule):
+            raise RuntimeError("There is no rule {} in {}".format(rule, far_path))
+        super().__init__(rule, reader.get_fst())
+
+
+def load_exported_grammars(far_dir: str) -> Tuple[ExportedGrammar, ExportedGrammar]:
+    """
+    loads classification and verbalization grammars exported with `export_grammars`
+
+    Parameters
+    ----------
+    far_dir: str
+        directory with exported archives
+
+    Returns
+    -------
+    grammars: Tuple[ExportedGrammar, ExportedGrammar]
+        classification and verbalization grammars
+    """
+    classify = ExportedGrammar(os.path.join(far_dir, TOKENIZE_AND_CLASSIFY_FAR), TOKENIZE_AND_CLASSIFY_RULE)
+    verbalize = ExportedGrammar(os.path.join(far_dir, VERBALIZE_FAR), VERBALIZE_RULE)
+    return classify, verbalize
+
+
+class ClassVerbalizers:
+    """
+    Verbalizers of semiotic classes, dispatched by the class prefix of serialized token.
+    `VerbalizeFst` is a union of all the class verbalizers, while classification tags define
+    semiotic class without ambiguity, so each token is composed only with a single small grammar of its class.
+    Verbalizers are loaded from archive exported by `export_class_verbalizers` on first use,
+    so verbalizers of classes that never occur are never loaded. Without archive, verbalizers are compiled
+    on first use, which takes seconds and is meant for development only.
+    Processes forked after verbalizers are created share the verbalizers loaded so far, but not the archive
+    reader: its file offset is shared between processes, so each forked process reopens the archive
+    before loading verbalizers of other classes.
+    """
+
+    def __init__(self, far_path: str = None):
+        """
+        constructor of class verbalizers
+
+        Parameters
+        ----------
+        far_path: str
+            path to archive produced by `export_class_verbalizers`.
+            If not provided, verbalizers are built with `VerbalizerBuilder`.
+        """
+        self._reader = pywrapfst.FarReader.open(far_path) if far_path is not None else None
+        self._far_path = far_path
+        self._builder = VerbalizerBuilder() if far_path is None else None
+        self._fsts: Dict[str, pywrapfst.Fst] = {}
+        self._lock = threading.Lock()
+        _CLASS_VERBALIZERS.add(self)
+
+    def _after_fork(self):
+        """
+        drops state that can't be shared with the parent process: archive reader,
+        which is reopened on next load, and the lock, which could be held by a thread of the parent
+        """
+        self._lock = threading.Lock()
+        self._reader = None
+
+    @property
+    def loaded(self) -> List[str]:
+        """
+        getter for semiotic classes, which verbalizers are loaded
+        """
+        return sorted(self._fsts.keys())
+
+    def get(self, semiotic_class: str) -> pywrapfst.Fst:
+        """
+        getter for verbalizer of semiotic class, loading it if needed
+
+        Parameters
+        ----------
+        semiotic_class: str
+            name of semiotic class, one of VERBALIZE_UNION
+
+        Returns
+        -------
+        fst: pywrapfst.Fst
+            prepared verbalizer of the class
+        """
+        fst = self._fsts.get(semiotic_class)
+        if fst is not None:
+            return fst
+        if semiotic_class not in VERBALIZE_UNION:
+            raise ValueError("Unknown semiotic class [{}], expected one of {}".format(semiotic_class, VERBALIZE_UNION))
+        with self._lock:
+            if semiotic_class not in self._fsts:
+                if self._far_path is None:
+                    fst = prepare_fst(self._builder.get(semiotic_class).fst)
+                else:
+                    if self._reader is None:
+                        # archive is reopened by each forked process
+                        self._reader = pywrapfst.FarReader.open(self._far_path)
+                    if not self._reader.find(semiotic_class):
+                        raise RuntimeError("There is no rule {} in {}".format(semiotic_class, self._far_path))
+                    fst = self._reader.get_fst()
+                self._fsts[semiotic_class] = fst
+        return self._fsts[semiotic_class]
+
+    def apply(self, serialized: str) -> str:
+        """
+        verbalizes serialized token with verbalizer of its class
+
+        Parameters
+        ----------
+        serialized: str
+            serialized token, for ex. `cardinal|count:23|`
+
+        Returns
+        -------
+        spoken: str
+            verbalized token, for ex. `twenty three`
+        """
+        return apply_fst(self.get(serialized.split("|", 1)[0]), serialized)
+
+
+# class verbalizers, which are reset in forked processes
+_CLASS_VERBALIZERS = weakref.WeakSet()
+
+
+def _reset_class_verbalizers():
+    """
+    resets class verbalizers inherited by a forked process, see `ClassVerbalizers`
+    """
+    for verbalizers in list(_CLASS_VERBALIZERS):
+        verbalizers._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_class_verbalizers)
+
+
+def load_class_verbalizers(far_dir: str) -> ClassVerbalizers:
+    """
+    loads verbalizers of semiotic classes exported with `export_class_verbalizers`.
+    Verbalizers are read from the archive on first use.
+
+    Parameters
+    ----------
+    far_dir: str
+        directory with exported archive
+
+    Returns
+    -------
+    verbalizers: ClassVerbalizers
+        verbalizers of semiotic classes
+    """
+    return ClassVerbalizers(os.path.join(far_dir, CLASS_VERBALIZE_FAR))
@@ -0,0 +1,377 @@
+"""
+Copyright 2022 Balacoon
+
+Incremental build of classification and verbalization grammars.
+Each branch of ClassifyFst and VerbalizeFst union is compiled and cached separately.
+Cache key of a branch is a hash of everything it is built from: python modules
+it imports, data files those modules load and branches it reuses. So after a data file
+is edited, only branches that depend on it are recompiled, the rest are loaded from the cache,
+and only the final union is put together again:
+
+..
+
+    python -m en_us_normalization.production.incremental_build --changed data/measurements.tsv
+"""
+
+import argparse
+import ast
+import hashlib
+import inspect
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Set, Tuple
+
+import pynini
+from en_us_normalization.production.classify.classify import (
+    CLASSIFIERS,
+    CLASSIFY_UNION,
+    ClassifierBuilder,
+    ClassifyFst,
+    get_enabled_classes,
+)
+from en_us_normalization.production.english_utils import get_data_dir
+from en_us_normalization.production.grammar_cache import (
+    CachedFst,
+    _list_files,
+    get_cache_path,
+    get_default_cache_dir,
+    get_grammars_hash,
+    get_production_dir,
+    load_fst,
+    save_fst,
+)
+from en_us_normalization.production.verbalize.verbalize import (
+    VERBALIZE_UNION,
+    VERBALIZERS,
+    VerbalizeFst,
+    VerbalizerBuilder,
+)
+from pynini.lib import pynutil
+
+from learn_to_normalize.grammar_utils import base_fst
+
+_PACKAGE = "en_us_normalization.production."
+_DATA_GETTER = "get_data_file_path"
+
+
+def _resolve_module(module: str) -> str:
+    """
+    helper function that finds source file of a module from production package.
+    Returns None for modules outside of production package.
+    """
+    if not module.startswith(_PACKAGE):
+        return None
+    path = os.path.join(get_production_dir(), *module[len(_PACKAGE):].split("."))
+    if os.path.isfile(path + ".py"):
+        return path + ".py"
+    if os.path.isfile(os.path.join(path, "__init__.py")):
+        return os.path.join(path, "__init__.py")
+    return None
+
+
+def _get_data_paths(call: ast.Call) -> List[str]:
+    """
+    helper function that resolves data files, that call to `get_data_file_path` refers to.
+    Leading arguments, that are string literals, define the path. If some of the arguments
+    are not literals (for ex. file name in a loop), all the files under the literal prefix are used.
+    """
+    parts = []
+    for arg in call.args:
+        if not isinstance(arg, ast.Constant) or not isinstance(arg.value, str):
+            break
+        parts.append(arg.value)
+    path = os.path.join(get_data_dir(), *parts)
+    if len(parts) == len(call.args) and os.path.isfile(path):
+        return [path]
+    return _list_files(path) if os.path.exists(path) else []
+
+
+def get_module_dependencies(path: str) -> Tuple[List[str], List[str]]:
+    """
+    statically finds what python module depends on: modules of production package it imports
+    (recursively) and data files, that those modules load with `get_data_file_path`.
+
+    Parameters
+    ----------
+    path: str
+        source file of the module
+
+    Returns
+    -------
+    modules: List[str]
+        source files of the module itself and all the production modules it imports, sorted
+    data_files: List[str]
+        data files that the module and its imports load, sorted
+    """
+    modules: Set[str] = set()
+    data_files: Set[str] = set()
+    queue = [path]
+    while queue:
+        module_path = queue.pop()
+        if module_path in modules:
+            continue
+        modules.add(module_path)
+        with open(module_path, "r", encoding="utf-8") as fp:
+            tree = ast.parse(fp.read(), filename=module_path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module:
+                imported = _resolve_module(node.module)
+                if imported is not None:
+                    queue.append(imported)
+            elif isinstance(node, ast.Call):
+                func = node.func
+                name = func.id if isinstance(func, ast.Name) else getattr(func, "attr", None)
+                if name == _DATA_GETTER:
+                    data_files.update(_get_data_paths(node))
+    return sorted(modules), sorted(data_files)
+
+
+class BuildGraph:
+    """
+    Graph of grammar components, i.e. classifiers or verbalizers of semiotic classes.
+    For each component it records python modules and data files it is built from
+    and components it reuses, so that it is known which components are affected by a change in
+    a file. Hash of a component covers its own sources and hashes of components it reuses.
+    """
+
+    def __init__(self, components: Dict[str, Tuple[type, Tuple[str, ...]]]):
+        """
+        constructor of build graph
+
+        Parameters
+        ----------
+        components: Dict[str, Tuple[type, Tuple[str, ...]]]
+            name of component -> grammar class and names of components passed to its constructor,
+            for ex. CLASSIFIERS or VERBALIZERS
+        """
+        self._components = components
+        self._sources = {}
+        for name, (grammar_cls, _) in components.items():
+            modules, data_files = get_module_dependencies(inspect.getsourcefile(grammar_cls))
+            self._sources[name] = modules + data_files
+        # grammar utilities are used by every component
+        self._common_sources = _list_files(os.path.dirname(os.path.abspath(base_fst.__file__)), extensions=[".py"])
+        self._hashes = {}
+
+    def get_sources(self, name: str) -> List[str]:
+        """
+        getter for files the component is built from, excluding files of components it reuses
+        """
+        return self._sources[name]
+
+    def get_dependencies(self, name: str) -> Tuple[str, ...]:
+        """
+        getter for names of components that are passed to the component constructor
+        """
+        return self._components[name][1]
+
+    def get_dependents(self, name: str) -> List[str]:
+        """
+        getter for components that reuse the component directly or through other components
+        """
+        dependents = []
+        for other in self._components:
+            queue = list(self.get_dependencies(other))
+            while queue:
+                dependency = queue.pop()
+                if dependency == name:
+                    dependents.append(other)
+                    break
+                queue.extend(self.get_dependencies(dependency))
+        return dependents
+
+    def get_affected(self, changed_files: Iterable[str]) -> List[str]:
+        """
+        finds components that need to be rebuilt after the files are changed
+
+        Parameters
+        ----------
+        changed_files: Iterable[str]
+            modified files, either absolute or relative to production dir
+
+        Returns
+        -------
+        affected: List[str]
+            components built from the files and components that reuse them
+        """
+        changed = set(os.path.join(get_production_dir(), x) if not os.path.isabs(x) else x for x in changed_files)
+        changed = set(os.path.normpath(x) for x in changed)
+        if changed & set(self._common_sources):
+            return list(self._components.keys())
+        affected = set()
+        for name, sources in self._sources.items():
+            if changed & set(sources):
+                affected.add(name)
+                affected.update(self.get_dependents(name))
+        return [name for name in self._components if name in affected]
+
+    def get_hash(self, name: str, **kwargs) -> str:
+        """
+        computes hash of the component, which changes whenever any of its sources
+        or sources of the components it reuses are modified
+
+        Parameters
+        ----------
+        name: str
+            name of the component
+        kwargs:
+            extra arguments the component is built with, for ex. `vocabulary=False`
+
+        Returns
+        -------
+        hash: str
+            hex digest of the component
+        """
+        key = (name, tuple(sorted(kwargs.items())))
+        if key not in self._hashes:
+            hasher = hashlib.sha256(get_grammars_hash(self._common_sources + self._sources[name]).encode("utf-8"))
+            hasher.update(repr(key).encode("utf-8"))
+            for dependency in self.get_dependencies(name):
+                hasher.update(self.get_hash(dependency, **kwargs).encode("utf-8"))
+            self._hashes[key] = hasher.hexdigest()
+        return self._hashes[key]
+
+
+class IncrementalBuilder:
+    """
+    Builds ClassifyFst and VerbalizeFst branch by branch, caching compiled branches on disk.
+    Branches, which sources didn't change since they were cached, are loaded from the cache.
+    Other branches are built along with components they reuse. Union of branches is then put together
+    exactly as in ClassifyFst and VerbalizeFst, so the resulting grammars are identical to those
+    built from scratch.
+
+    Built grammars are also stored to the compile cache (see `load_or_build`), so that
+    processes, which load grammars from the cache, pick them up.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        """
+        constructor of incremental builder
+
+        Parameters
+        ----------
+        cache_dir: str
+            directory to keep compiled branches and grammars in.
+            If not provided, `get_default_cache_dir` is used
+        """
+        if cache_dir is None:
+            cache_dir = get_default_cache_dir()
+        self._cache_dir = cache_dir
+        self._graphs = {"classify": BuildGraph(CLASSIFIERS), "verbalize": BuildGraph(VERBALIZERS)}
+        # names of branches that were compiled (rather than loaded) in the last build
+        self.rebuilt: List[str] = []
+
+    def get_graph(self, name: str) -> BuildGraph:
+        """
+        getter for build graph, either "classify" or "verbalize"
+        """
+        return self._graphs[name]
+
+    def _get_branch(self, graph: str, name: str, builder, **kwargs) -> pynini.Fst:
+        """
+        helper function that loads compiled branch from the cache or builds it
+        """
+        branch_hash = self._graphs[graph].get_hash(name, **kwargs)
+        path = os.path.join(self._cache_dir, "components", "{}_{}_{}.far".format(graph, name, branch_hash[:32]))
+        if os.path.isfile(path):
+            try:
+                return next(iter(load_fst(path).values()))
+            except pynini.FstIOError:
+                logging.warning("Failed to read cached branch {}, rebuilding".format(path))
+        logging.info("Compiling {} branch {}".format(graph, name))
+        self.rebuilt.append("{}.{}".format(graph, name))
+        fst = builder.get(name).fst
+        save_fst(path, name, fst)
+        return fst
+
+    def build_classify(self, profile: str = None, classes: Iterable[str] = None, vocabulary: bool = True) -> CachedFst:
+        """
+        builds classification grammar, reusing cached branches
+
+        Parameters
+        ----------
+        profile: str
+            name of profile in configs/classify_profiles.ascii_proto, same as for ClassifyFst
+        classes: Iterable[str]
+            names of enabled classes, same as for ClassifyFst
+        vocabulary: bool
+            whether to include vocabularies in classifiers, same as for ClassifyFst
+
+        Returns
+        -------
+        grammar: CachedFst
+            grammar with the same fst as ClassifyFst
+        """
+        self.rebuilt = []
+        enabled_classes = get_enabled_classes(profile, classes)
+        builder = ClassifierBuilder(vocabulary=vocabulary)
+        weights = dict(CLASSIFY_UNION)
+        # vocabulary flag is a part of cache key, it changes classifiers that include vocabularies
+        # and classifiers that reuse them
+        kwargs = {} if vocabulary else {"vocabulary": False}
+        classify = None
+        for name in enabled_classes:
+            branch = pynutil.add_weight(self._get_branch("classify", name, builder, **kwargs), weights[name])
+            classify = branch if classify is None else classify | branch
+        fst = ClassifyFst.get_sentence_fst(classify).optimize()
+
+        kwargs = {}
+        if profile is not None:
+            kwargs["profile"] = profile
+        if classes is not None:
+            kwargs["classes"] = classes
+        if not vocabulary:
+            kwargs["vocabulary"] = vocabulary
+        save_fst(get_cache_path(ClassifyFst, self._cache_dir, get_grammars_hash(), **kwargs), ClassifyFst.__name__, fst)
+        return CachedFst("tokenize_and_classify", fst)
+
+    def build_verbalize(self) -> CachedFst:
+        """
+        builds verbalization grammar, reusing cached branches
+
+        Returns
+        -------
+        grammar: CachedFst
+            grammar with the same fst as VerbalizeFst
+        """
+        self.rebuilt = []
+        builder = VerbalizerBuilder()
+        fst = VerbalizeFst.get_union([self._get_branch("verbalize", name, builder) for name in VERBALIZE_UNION])
+        save_fst(get_cache_path(VerbalizeFst, self._cache_dir, get_grammars_hash()), VerbalizeFst.__name__, fst)
+        return CachedFst("verbalize", fst)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Builds grammars recompiling only branches which sources changed")
+    ap.add_argument("--cache-dir", help="Directory to keep compiled branches and grammars in")
+    ap.add_argument("--profile", help="Profile of classification grammar, all classes by default")
+    ap.add_argument("--changed", nargs="+", help="Only list branches affected by the files, without building")
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    builder = IncrementalBuilder(args.cache_dir)
+    if args.changed:
+        for graph in ("classify", "verbalize"):
+            affected = builder.get_graph(graph).get_affected(args.changed)
+            logging.info("{}: {}".format(graph, ", ".join(affected) if affected else "not affected"))
+        return
+    for graph in ("classify", "verbalize"):
+        start = time.time()
+        if graph == "classify":
+            builder.build_classify(profile=args.profile)
+        else:
+            builder.build_verbalize()
+        logging.info(
+            "Built {} in {:.1f}s, recompiled branches: {}".format(
+                graph, time.time() - start, ", ".join(builder.rebuilt) if builder.rebuilt else "none"
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Normalization runtime
+=====================
+
+Runtime that puts classification and verbalization grammars together:
+tagged output of classification is parsed into tokens, semiotic classes
+are serialized according to configs/verbalizer_serialization_spec.ascii_proto
+and passed for verbalization.
+
+Normalization pipeline:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    Normalizer
+    StreamingNormalizer
+
+Splitting of the input into chunks that are classified independently:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    Segmenter
+
+Tagging of plain words without classification grammar:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    PlainWordFastPath
+
+Tagging of vocabulary tokens (shortenings, abbreviations) by lookup:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    VocabularyLookup
+
+Tagging of whitelisted tokens (data/whitelist.tsv) before classification grammar:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    Whitelist
+
+Batched verbalization of cardinals, ordinals and decimals without verbalization grammar:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    NumericVerbalizer
+
+Hooks that receive latency of normalization stages, per semiotic class for verbalization:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    Instrumentation
+    LoggingInstrumentation
+
+Per-request budgets of classification with fallback to cheaper classification:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    ResourceGovernor
+
+Degraded tier on top of toy grammar, that normalizer switches to under overload
+and back, when load drops:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    TieredNormalizer
+    create_degraded_normalizer
+    create_tiered_normalizer
+    load_tiered_normalizer
+
+Parsing and serialization of tokens:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    Token
+    SerializationSpec
+
+Cache of verbalized tokens:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+    :template: class.rst
+
+    LRUCache
+
+Parallel normalization of large corpora, which can also be run as a script:
+`python -m en_us_normalization.production.runtime.corpus input.txt output.txt`
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    normalize_corpus
+    load_grammars
+    create_normalizer
+    load_normalizer
+    ShardStats
+
+Asyncio front end, that normalizes in a pool of worker threads or processes
+with bounded concurrency and queue:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    AsyncNormalizer
+    OverloadedError
+
+Local normalization server, that coalesces concurrent requests into micro-batches.
+Started with `python -m en_us_normalization.production.runtime.server`:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    MicroBatcher
+    ServerMetrics
+    create_server
+
+Long-running normalizer that swaps in new grammars without restart:
+
+.. autosummary::
+    :toctree: generated/
+    :nosignatures:
+
+    ReloadableNormalizer
+    get_exported_version
+
+"""
+
+from en_us_normalization.production.runtime.async_normalizer import AsyncNormalizer, OverloadedError
+from en_us_normalization.production.runtime.cache import LRUCache
+from en_us_normalization.production.runtime.corpus import (
+    ShardStats,
+    create_normalizer,
+    load_grammars,
+    load_normalizer,
+    normalize_corpus,
+)
+from en_us_normalization.production.runtime.degraded import (
+    TieredNormalizer,
+    create_degraded_normalizer,
+    create_tiered_normalizer,
+    load_tiered_normalizer,
+)
+from en_us_normalization.production.runtime.fast_path import PlainWordFastPath
+from en_us_normalization.production.runtime.governor import ResourceGovernor
+from en_us_normalization.production.runtime.instrumentation import Instrumentation, LoggingInstrumentation
+from en_us_normalization.production.runtime.lookup import VocabularyLookup
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.numeric import NumericVerbalizer
+from en_us_normalization.production.runtime.reload import ReloadableNormalizer, get_exported_version
+from en_us_normalization.production.runtime.segment import Segmenter
+from en_us_normalization.production.runtime.server import MicroBatcher, ServerMetrics, create_server
+from en_us_normalization.production.runtime.streaming import StreamingNormalizer
+from en_us_normalization.production.runtime.tokens import SerializationSpec, Token, parse_tokens
+from en_us_normalization.production.runtime.whitelist import Whitelist, load_whitelist_entries
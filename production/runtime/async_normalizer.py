@@ -0,0 +1,233 @@
+"""
+Copyright 2022 Balacoon
+
+Asyncio front end of normalization, that runs grammars in a pool of workers
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+from en_us_normalization.production.runtime.corpus import (
+    Grammars,
+    check_class_dispatch,
+    create_normalizer,
+    get_fork_context,
+    load_grammars,
+)
+
+# normalization pipeline of the worker, each worker thread or process creates its own
+_WORKER_STATE = threading.local()
+
+
+class OverloadedError(RuntimeError):
+    """
+    Raised when request is rejected, because too many requests are waiting for a worker
+    """
+
+
+def _init_worker(
+    grammars: Optional[Grammars], far_dir: str, cache_dir: str, segment: bool, cache_size: int, class_dispatch: bool
+):
+    """
+    initializer of the worker thread or process, creates normalization pipeline on top of shared grammars.
+    If grammars are not shared (processes started without fork), loads them once per worker.
+    """
+    if grammars is None:
+        grammars = load_grammars(far_dir, cache_dir, class_dispatch)
+    _WORKER_STATE.normalizer = create_normalizer(grammars, segment, cache_size)
+
+
+def _normalize_batch(texts: List[str]) -> List[str]:
+    """
+    normalizes batch of utterances in the worker
+    """
+    return _WORKER_STATE.normalizer.normalize_batch(texts)
+
+
+class AsyncNormalizer:
+    """
+    Asyncio-native normalization: `await normalizer.normalize(text)` dispatches the request to a pool of
+    worker threads or processes, so the event loop is never blocked by grammar application.
+    Grammars are loaded once and shared by the workers: threads share loaded fsts,
+    forked processes inherit them copy-on-write.
+
+    At most `max_concurrency` requests are processed at a time, the rest wait in a queue.
+    Queue is bounded by `max_queue`: when it is full, new requests are rejected right away with
+    `OverloadedError`, and requests that waited for longer than `queue_timeout` are rejected as well.
+    This way latency of accepted requests stays bounded during traffic bursts, instead of
+    every request waiting behind an ever-growing queue.
+
+    Requests can be cancelled. Request that waits in the queue is dropped without reaching a worker.
+    Request that is being processed can't be interrupted inside the grammar: worker finishes it
+    and the result is discarded, its slot is freed only once the worker is done,
+    so the concurrency limit holds for the workers too.
+    """
+
+    def __init__(
+        self,
+        far_dir: str = None,
+        cache_dir: str = None,
+        num_workers: int = None,
+        processes: bool = False,
+        max_concurrency: int = None,
+        max_queue: int = 100,
+        queue_timeout: float = None,
+        segment: bool = False,
+        cache_size: int = 100000,
+        class_dispatch: bool = False,
+    ):
+        """
+        constructor of asyncio normalizer. Grammars are loaded right away, workers are started
+        when the first request is dispatched to them.
+
+        Parameters
+        ----------
+        far_dir: str
+            directory with grammars exported by `grammar_export.export_grammars`.
+            If not provided, grammars are loaded from the compile cache, being built if needed.
+        cache_dir: str
+            directory of the compile cache, used if `far_dir` is not provided
+        num_workers: int
+            number of workers. If not provided, number of CPUs is used
+        processes: bool
+            whether workers are processes rather than threads. Grammar application holds
+            the interpreter lock for most of the time, so processes scale better with the number of workers,
+            while threads are cheaper to start and share memory with the event loop process.
+        max_concurrency: int
+            maximum number of requests processed at a time. By default equals number of workers,
+            so that accepted requests don't wait in the executor, where they can't be rejected.
+        max_queue: int
+            maximum number of requests waiting for processing. If it is reached, new requests
+            are rejected with `OverloadedError`.
+        queue_timeout: float
+            maximum number of seconds a request waits for processing before it is rejected
+            with `OverloadedError`. If not provided, requests wait until they are processed.
+        segment: bool
+            whether workers split input into chunks before classification, see `Segmenter`
+        cache_size: int
+            number of verbalized tokens to cache in each worker. 0 disables the cache
+        class_dispatch: bool
+            whether workers verbalize tokens only with verbalizers of their semiotic classes, see `load_grammars`
+        """
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        if max_concurrency is None:
+            max_concurrency = num_workers
+        if max_concurrency < 1:
+            raise ValueError("Concurrency limit should be at least 1, got {}".format(max_concurrency))
+        context = get_fork_context() if processes else None
+        grammars = None
+        check_class_dispatch(far_dir, class_dispatch)
+        if not processes or context is not None:
+            grammars = load_grammars(far_dir, cache_dir, class_dispatch)
+        initargs = (grammars, far_dir, cache_dir, segment, cache_size, class_dispatch)
+        if processes:
+            self._executor: Executor = ProcessPoolExecutor(
+                num_workers, mp_context=context, initializer=_init_worker, initargs=initargs
+            )
+        else:
+            self._executor = ThreadPoolExecutor(num_workers, initializer=_init_worker, initargs=initargs)
+        self._max_concurrency = max_concurrency
+        self._max_queue = max_queue
+        self._queue_timeout = queue_timeout
+        # semaphore is bound to the event loop, so it is created on the first request
+        self._semaphore: asyncio.Semaphore = None
+        self._queue_depth = 0
+        self._in_flight = 0
+        self.num_rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        getter for number of requests waiting for processing
+        """
+        return self._queue_depth
+
+    @property
+    def in_flight(self) -> int:
+        """
+        getter for number of requests being processed by workers
+        """
+        return self._in_flight
+
+    async def _acquire(self):
+        """
+        helper function that waits for a free slot or rejects request if queue is full
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        if self._semaphore.locked() and self._queue_depth >= self._max_queue:
+            self.num_rejected += 1
+            raise OverloadedError("{} requests are already waiting for processing".format(self._queue_depth))
+        self._queue_depth += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self._queue_timeout)
+        except asyncio.TimeoutError:
+            self.num_rejected += 1
+            raise OverloadedError("Request waited for more than {} seconds".format(self._queue_timeout))
+        finally:
+            self._queue_depth -= 1
+
+    def _release(self, _):
+        """
+        helper function that frees the slot once worker is done with the request
+        """
+        self._in_flight -= 1
+        self._semaphore.release()
+
+    async def normalize_batch(self, texts: List[str]) -> List[str]:
+        """
+        normalizes batch of utterances in one of the workers
+
+        Parameters
+        ----------
+        texts: List[str]
+            utterances to normalize
+
+        Returns
+        -------
+        normalized: List[str]
+            normalized utterances
+        """
+        await self._acquire()
+        loop = asyncio.get_running_loop()
+        self._in_flight += 1
+        try:
+            future = self._executor.submit(_normalize_batch, texts)
+        except BaseException:
+            self._release(None)
+            raise
+        # slot is released when the worker is done, even if the request is cancelled
+        future.add_done_callback(lambda x: loop.call_soon_threadsafe(self._release, x))
+        return await asyncio.wrap_future(future)
+
+    async def normalize(self, text: str) -> str:
+        """
+        normalizes single utterance in one of the workers
+
+        Parameters
+        ----------
+        text: str
+            utterance to normalize
+
+        Returns
+        -------
+        normalized: str
+            normalized utterance
+        """
+        return (await self.normalize_batch([text]))[0]
+
+    def close(self):
+        """
+        waits for requests that are being processed and stops the workers
+        """
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self) -> "AsyncNormalizer":
+        return self
+
+    async def __aexit__(self, *args):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
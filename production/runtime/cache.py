@@ -0,0 +1,130 @@
+"""
+Copyright 2022 Balacoon
+
+Bounded cache for verbalization results
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class LRUCache:
+    """
+    Least-recently-used cache that maps serialized tokens to their spoken form.
+    Real text repeats the same semiotic tokens a lot (years, prices, time),
+    so repeated tokens can skip composition with verbalization grammar.
+    Cache is bounded both in number of entries and in total size of keys and values
+    (in utf-8 bytes). When any of the limits is exceeded, least recently used entries are evicted.
+    Hits, misses and evictions are counted, so cache size can be tuned.
+
+    Cache is thread-safe.
+    """
+
+    def __init__(self, max_entries: int = 100000, max_bytes: int = None):
+        """
+        constructor of LRU cache
+
+        Parameters
+        ----------
+        max_entries: int
+            maximum number of entries to keep
+        max_bytes: int
+            maximum total size of keys and values in bytes. If not provided, size is not limited.
+        """
+        if max_entries <= 0:
+            raise ValueError("Cache should allow at least one entry, got {}".format(max_entries))
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _entry_size(key: str, value: str) -> int:
+        """
+        helper function that computes size of the entry in bytes
+        """
+        return len(key.encode("utf-8")) + len(value.encode("utf-8"))
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        looks up the key, marking it as recently used
+
+        Parameters
+        ----------
+        key: str
+            serialized token
+
+        Returns
+        -------
+        value: Optional[str]
+            cached spoken form or None if key is not in the cache
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: str):
+        """
+        adds entry to the cache, evicting least recently used entries if needed.
+        Entries that don't fit into the cache on their own are not stored.
+
+        Parameters
+        ----------
+        key: str
+            serialized token
+        value: str
+            spoken form of the token
+        """
+        size = self._entry_size(key, value)
+        if self._max_bytes is not None and size > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entry_size(key, self._entries.pop(key))
+            self._entries[key] = value
+            self._bytes += size
+            while len(self._entries) > self._max_entries or (
+                self._max_bytes is not None and self._bytes > self._max_bytes
+            ):
+                old_key, old_value = self._entries.popitem(last=False)
+                self._bytes -= self._entry_size(old_key, old_value)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        removes all the entries from the cache. Counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        getter for cache counters
+
+        Returns
+        -------
+        stats: Dict[str, int]
+            number of hits, misses, evictions, current number of entries and size in bytes
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,427 @@
+"""
+Copyright 2022 Balacoon
+
+Parallel normalization of large text corpora.
+Input file is split into shards of consecutive lines, shards are normalized
+by a pool of worker processes and written to the output file in the original order.
+Grammars are loaded once, before the workers are forked, so workers share them copy-on-write.
+On platforms without fork, each worker loads compiled grammars once, when it is started.
+Normalization can be resumed: lines already present in the output file are skipped.
+"""
+
+import argparse
+import collections
+import logging
+import multiprocessing
+import os
+import time
+from typing import IO, Iterator, List, Optional, Tuple
+
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.grammar_cache import load_or_build
+from en_us_normalization.production.grammar_export import (
+    CLASS_VERBALIZE_FAR,
+    TOKENIZE_AND_CLASSIFY_FAR,
+    TOKENIZE_AND_CLASSIFY_RULE,
+    VERBALIZE_RULE,
+    ClassVerbalizers,
+    ExportedGrammar,
+    PreparedGrammar,
+    load_class_verbalizers,
+    load_exported_grammars,
+)
+from en_us_normalization.production.runtime.cache import LRUCache
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.segment import Segmenter
+from en_us_normalization.production.verbalize.verbalize import VerbalizeFst
+
+# normalizer of the worker process, created by pool initializer
+_WORKER_NORMALIZER = None
+
+# grammars shared by normalization pipelines: classification grammar, and either verbalization grammar
+# or verbalizers of semiotic classes
+Grammars = Tuple[PreparedGrammar, Optional[PreparedGrammar], Optional[ClassVerbalizers]]
+
+
+class ShardStats:
+    """
+    Statistics of a single normalized shard
+    """
+
+    def __init__(self, index: int, first_line: int, num_lines: int, num_chars: int, seconds: float):
+        """
+        constructor of shard statistics
+
+        Parameters
+        ----------
+        index: int
+            index of the shard, counting from the line normalization started at
+        first_line: int
+            index of the first line of the shard in the input file
+        num_lines: int
+            number of lines in the shard
+        num_chars: int
+            number of characters in the input lines of the shard
+        seconds: float
+            time spent by the worker on normalization of the shard
+        """
+        self.index = index
+        self.first_line = first_line
+        self.num_lines = num_lines
+        self.num_chars = num_chars
+        self.seconds = seconds
+
+    @property
+    def lines_per_second(self) -> float:
+        """
+        throughput of the worker on the shard
+        """
+        return self.num_lines / self.seconds if self.seconds > 0 else float("inf")
+
+    @property
+    def chars_per_second(self) -> float:
+        """
+        throughput of the worker on the shard in input characters
+        """
+        return self.num_chars / self.seconds if self.seconds > 0 else float("inf")
+
+    def __repr__(self):
+        return "ShardStats(index={}, first_line={}, lines={}, seconds={:.3f}, lines/s={:.1f})".format(
+            self.index, self.first_line, self.num_lines, self.seconds, self.lines_per_second
+        )
+
+
+def load_grammars(far_dir: str = None, cache_dir: str = None, class_dispatch: bool = False) -> Grammars:
+    """
+    loads grammars prepared for composition. Loaded grammars are read-only, so they are loaded once
+    and shared by normalization pipelines of all the workers, see `create_normalizer`.
+
+    Parameters
+    ----------
+    far_dir: str
+        directory with grammars exported by `grammar_export.export_grammars`.
+        If not provided, grammars are loaded from the compile cache, being built if needed.
+    cache_dir: str
+        directory of the compile cache, used if `far_dir` is not provided
+    class_dispatch: bool
+        whether to verbalize tokens only with verbalizers of their semiotic classes, see `ClassVerbalizers`.
+        Verbalizers are loaded from `far_dir`, where they should be exported with
+        `grammar_export.export_class_verbalizers`, so `far_dir` is required.
+
+    Returns
+    -------
+    grammars: Grammars
+        classification grammar, verbalization grammar and verbalizers of semiotic classes.
+        Only one of the latter two is loaded, the other one is None.
+    """
+    check_class_dispatch(far_dir, class_dispatch)
+    verbalize, class_verbalizers = None, None
+    if class_dispatch:
+        classify = ExportedGrammar(os.path.join(far_dir, TOKENIZE_AND_CLASSIFY_FAR), TOKENIZE_AND_CLASSIFY_RULE)
+        class_verbalizers = load_class_verbalizers(far_dir)
+    elif far_dir is not None:
+        classify, verbalize = load_exported_grammars(far_dir)
+    else:
+        classify = PreparedGrammar(TOKENIZE_AND_CLASSIFY_RULE, load_or_build(ClassifyFst, cache_dir=cache_dir).fst)
+        verbalize = PreparedGrammar(VERBALIZE_RULE, load_or_build(VerbalizeFst, cache_dir=cache_dir).fst)
+    return classify, verbalize, class_verbalizers
+
+
+def check_class_dispatch(far_dir: Optional[str], class_dispatch: bool):
+    """
+    checks that verbalizers of semiotic classes can be loaded, raises ValueError otherwise. Compile cache doesn't
+    store them, and building them on first use would compile grammars while serving requests.
+    """
+    if class_dispatch and far_dir is None:
+        raise ValueError(
+            "Class dispatch requires directory with verbalizers of semiotic classes exported to {}".format(
+                CLASS_VERBALIZE_FAR
+            )
+        )
+
+
+def create_normalizer(grammars: Grammars, segment: bool = False, cache_size: int = 100000) -> Normalizer:
+    """
+    creates normalization pipeline on top of loaded grammars. Pipeline holds state of its own
+    (verbalization cache), so each worker creates a pipeline, while grammars are shared.
+
+    Parameters
+    ----------
+    grammars: Grammars
+        grammars loaded with `load_grammars`
+    segment: bool
+        whether to split input into chunks before classification, see `Segmenter`
+    cache_size: int
+        number of verbalized tokens to cache. 0 disables the cache
+
+    Returns
+    -------
+    normalizer: Normalizer
+        normalization pipeline
+    """
+    classify, verbalize, class_verbalizers = grammars
+    return Normalizer(
+        classify,
+        verbalize,
+        verbalize_cache=LRUCache(cache_size) if cache_size > 0 else None,
+        segmenter=Segmenter() if segment else None,
+        class_verbalizers=class_verbalizers,
+    )
+
+
+def load_normalizer(
+    far_dir: str = None,
+    cache_dir: str = None,
+    segment: bool = False,
+    cache_size: int = 100000,
+    class_dispatch: bool = False,
+) -> Normalizer:
+    """
+    loads grammars and creates normalization pipeline, see `load_grammars` and `create_normalizer`
+
+    Parameters
+    ----------
+    far_dir: str
+        directory with grammars exported by `grammar_export.export_grammars`.
+        If not provided, grammars are loaded from the compile cache, being built if needed.
+    cache_dir: str
+        directory of the compile cache, used if `far_dir` is not provided
+    segment: bool
+        whether to split input into chunks before classification, see `Segmenter`
+    cache_size: int
+        number of verbalized tokens to cache. 0 disables the cache
+    class_dispatch: bool
+        whether to verbalize tokens only with verbalizers of their semiotic classes, see `load_grammars`
+
+    Returns
+    -------
+    normalizer: Normalizer
+        normalization pipeline
+    """
+    return create_normalizer(load_grammars(far_dir, cache_dir, class_dispatch), segment, cache_size)
+
+
+def get_fork_context() -> Optional[multiprocessing.context.BaseContext]:
+    """
+    getter for multiprocessing context that starts workers with fork, if platform supports it.
+    Forked workers inherit grammars loaded in the parent process, along with arguments
+    of their initializers, which are not pickled.
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context("fork")
+
+
+def _init_worker(
+    grammars: Optional[Grammars], far_dir: str, cache_dir: str, segment: bool, cache_size: int, class_dispatch: bool
+):
+    """
+    initializer of the worker process, creates normalization pipeline on top of grammars inherited
+    from the parent process. If grammars are not inherited, loads them once per worker.
+    """
+    global _WORKER_NORMALIZER
+    if grammars is None:
+        grammars = load_grammars(far_dir, cache_dir, class_dispatch)
+    _WORKER_NORMALIZER = create_normalizer(grammars, segment, cache_size)
+
+
+def _normalize_shard(shard: Tuple[int, int, List[str]]) -> Tuple[List[str], ShardStats]:
+    """
+    normalizes shard of lines in the worker process
+    """
+    index, first_line, lines = shard
+    start = time.perf_counter()
+    normalized = _WORKER_NORMALIZER.normalize_batch(lines)
+    seconds = time.perf_counter() - start
+    stats = ShardStats(index, first_line, len(lines), sum(len(x) for x in lines), seconds)
+    return normalized, stats
+
+
+def _read_shards(fp: IO, start_line: int, shard_size: int) -> Iterator[Tuple[int, int, List[str]]]:
+    """
+    helper function that lazily reads input file in shards of consecutive lines,
+    skipping first `start_line` lines
+    """
+    index = 0
+    lines = []
+    first_line = start_line
+    for line_idx, line in enumerate(fp):
+        if line_idx < start_line:
+            continue
+        lines.append(line.rstrip("\r\n"))
+        if len(lines) == shard_size:
+            yield index, first_line, lines
+            index += 1
+            first_line += len(lines)
+            lines = []
+    if lines:
+        yield index, first_line, lines
+
+
+def get_resume_offset(output_path: str) -> int:
+    """
+    counts complete lines in the output of previous, interrupted normalization.
+    Incomplete last line, if any, is truncated from the output file.
+
+    Parameters
+    ----------
+    output_path: str
+        path to the output file
+
+    Returns
+    -------
+    offset: int
+        number of lines that are already normalized
+    """
+    if not os.path.isfile(output_path):
+        return 0
+    num_lines = 0
+    complete_size = 0
+    with open(output_path, "rb") as fp:
+        for line in fp:
+            if not line.endswith(b"\n"):
+                break
+            num_lines += 1
+            complete_size += len(line)
+    if complete_size != os.path.getsize(output_path):
+        with open(output_path, "r+b") as fp:
+            fp.truncate(complete_size)
+    return num_lines
+
+
+def normalize_corpus(
+    input_path: str,
+    output_path: str,
+    far_dir: str = None,
+    cache_dir: str = None,
+    num_workers: int = None,
+    shard_size: int = 1000,
+    start_line: int = None,
+    segment: bool = False,
+    cache_size: int = 100000,
+    class_dispatch: bool = False,
+) -> List[ShardStats]:
+    """
+    normalizes text file line by line with a pool of worker processes.
+    Normalized lines are written in the same order as in input file.
+    At most two shards per worker are in flight at a time, so memory usage
+    doesn't depend on size of the corpus.
+
+    Parameters
+    ----------
+    input_path: str
+        path to the text file to normalize, one utterance per line
+    output_path: str
+        path to store normalized text to
+    far_dir: str
+        directory with grammars exported by `grammar_export.export_grammars`.
+        If not provided, grammars are loaded from the compile cache, being built if needed.
+    cache_dir: str
+        directory of the compile cache, used if `far_dir` is not provided
+    num_workers: int
+        number of worker processes. If not provided, number of CPUs is used
+    shard_size: int
+        number of lines in a shard, i.e. a single task for a worker
+    start_line: int
+        number of input lines to skip. If it is positive, output file is appended to,
+        otherwise output file is overwritten. If not provided, offset is taken from the output file,
+        i.e. normalization is resumed after the last complete line of the output.
+    segment: bool
+        whether workers split input into chunks before classification, see `Segmenter`
+    cache_size: int
+        number of verbalized tokens to cache in each worker. 0 disables the cache
+    class_dispatch: bool
+        whether workers verbalize tokens only with verbalizers of their semiotic classes, see `load_grammars`
+
+    Returns
+    -------
+    stats: List[ShardStats]
+        statistics of normalized shards
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if start_line is None:
+        start_line = get_resume_offset(output_path)
+    if start_line > 0:
+        logging.info("Resuming normalization of {} from line {}".format(input_path, start_line))
+    check_class_dispatch(far_dir, class_dispatch)
+    context = get_fork_context()
+    grammars = None
+    if context is not None:
+        # forked workers share grammars loaded once in the parent
+        grammars = load_grammars(far_dir, cache_dir, class_dispatch)
+    elif far_dir is None:
+        # make sure grammars are in the cache, so workers don't build them concurrently
+        load_or_build(ClassifyFst, cache_dir=cache_dir)
+        load_or_build(VerbalizeFst, cache_dir=cache_dir)
+
+    stats = []
+    out_mode = "a" if start_line > 0 else "w"
+    initargs = (grammars, far_dir, cache_dir, segment, cache_size, class_dispatch)
+    with (context or multiprocessing).Pool(
+        num_workers, initializer=_init_worker, initargs=initargs
+    ) as pool, open(input_path, "r", encoding="utf-8") as in_fp, open(
+        output_path, out_mode, encoding="utf-8"
+    ) as out_fp:
+        in_flight = collections.deque()
+        for shard in _read_shards(in_fp, start_line, shard_size):
+            in_flight.append(pool.apply_async(_normalize_shard, (shard,)))
+            if len(in_flight) >= 2 * num_workers:
+                stats.append(_write_shard(in_flight.popleft().get(), out_fp))
+        while in_flight:
+            stats.append(_write_shard(in_flight.popleft().get(), out_fp))
+    return stats
+
+
+def _write_shard(result: Tuple[List[str], ShardStats], out_fp: IO) -> ShardStats:
+    """
+    helper function that writes normalized shard to the output and reports its throughput
+    """
+    normalized, stats = result
+    out_fp.write("".join(x + "\n" for x in normalized))
+    out_fp.flush()
+    logging.info(str(stats))
+    return stats
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Normalizes text corpus line by line with a pool of workers")
+    ap.add_argument("input", help="Text file to normalize, one utterance per line")
+    ap.add_argument("output", help="File to store normalized text to. Existing output is resumed")
+    ap.add_argument("--far-dir", help="Directory with exported grammars. If not set, compile cache is used")
+    ap.add_argument("--cache-dir", help="Directory of compile cache")
+    ap.add_argument("--workers", type=int, help="Number of worker processes, number of CPUs by default")
+    ap.add_argument("--shard-size", type=int, default=1000, help="Number of lines in a single task of a worker")
+    ap.add_argument("--start-line", type=int, help="Number of input lines to skip, instead of resuming from output")
+    ap.add_argument("--segment", action="store_true", help="Split input into chunks before classification")
+    ap.add_argument(
+        "--class-dispatch",
+        action="store_true",
+        help="Verbalize tokens only with verbalizers of their classes, exported to --far-dir",
+    )
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    start = time.perf_counter()
+    stats = normalize_corpus(
+        args.input,
+        args.output,
+        far_dir=args.far_dir,
+        cache_dir=args.cache_dir,
+        num_workers=args.workers,
+        shard_size=args.shard_size,
+        start_line=args.start_line,
+        segment=args.segment,
+        class_dispatch=args.class_dispatch,
+    )
+    seconds = time.perf_counter() - start
+    num_lines = sum(x.num_lines for x in stats)
+    logging.info("Normalized {} lines in {:.1f} seconds ({:.1f} lines/s)".format(num_lines, seconds, num_lines / seconds))
+
+
+if __name__ == "__main__":
+    main()
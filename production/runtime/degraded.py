@@ -0,0 +1,326 @@
+"""
+Copyright 2022 Balacoon
+
+Degraded tier of normalization on top of toy grammar, used under overload
+"""
+
+import logging
+import threading
+import time
+from typing import List, Optional
+
+from en_us_normalization.production.runtime.corpus import Grammars, create_normalizer, load_grammars
+from en_us_normalization.production.runtime.instrumentation import Instrumentation
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.verbalize.verbalize import VerbalizeFst
+from en_us_normalization.toy.classify.classify import ClassifyFst as ToyClassifyFst
+
+from learn_to_normalize.grammar_utils.base_fst import BaseFst
+
+TIER_FULL = "full"
+TIER_DEGRADED = "degraded"
+
+
+def create_degraded_normalizer(verbalize: BaseFst = None, **kwargs) -> Normalizer:
+    """
+    creates normalization pipeline of degraded tier: toy classification grammar, that only tags
+    words, digits and abbreviations, followed by production verbalization. Toy grammar produces tokens
+    in the same format as production ClassifyFst, so output of degraded tier differs only
+    in quality of classification.
+
+    Parameters
+    ----------
+    verbalize: BaseFst
+        production verbalization grammar. If not provided, VerbalizeFst is built.
+    kwargs
+        other arguments of `Normalizer`, for ex. verbalization cache
+
+    Returns
+    -------
+    normalizer: Normalizer
+        normalization pipeline of degraded tier
+    """
+    return Normalizer(ToyClassifyFst(), verbalize if verbalize is not None else VerbalizeFst(), **kwargs)
+
+
+class Hysteresis:
+    """
+    Overload trigger with hysteresis: it turns on when signal reaches `high`
+    and turns off only when signal drops to `low`, so that signal fluctuating
+    around a single threshold doesn't flip the trigger back and forth.
+    """
+
+    def __init__(self, high: float, low: float):
+        """
+        constructor of the trigger
+
+        Parameters
+        ----------
+        high: float
+            value of signal that turns trigger on
+        low: float
+            value of signal that turns trigger off, should not exceed `high`
+        """
+        if low > high:
+            raise ValueError("Low threshold {} is above high threshold {}".format(low, high))
+        self.high = high
+        self.low = low
+        self.active = False
+
+    def update(self, value: float) -> bool:
+        """
+        updates trigger with new value of the signal
+
+        Parameters
+        ----------
+        value: float
+            current value of the signal
+
+        Returns
+        -------
+        active: bool
+            whether trigger is on
+        """
+        if not self.active and value >= self.high:
+            self.active = True
+        elif self.active and value <= self.low:
+            self.active = False
+        return self.active
+
+
+class TieredNormalizer:
+    """
+    Normalizer that switches to degraded tier under overload: it is better to return slightly worse
+    normalization than to time out. Tier is switched globally, based on two signals:
+
+    - latency: exponentially smoothed wall time per utterance of recent requests served by full tier.
+      Requests served by degraded tier are not measured, otherwise fast degraded tier would switch
+      normalizer back to full tier right away. While degraded tier is active, a request is sent
+      to full tier once per `min_degraded_seconds` as a probe, so that latency of full tier can recover.
+    - queue depth: number of requests waiting for normalization, reported by the caller
+      with `observe_queue_depth`
+
+    Each signal has its own trigger with hysteresis. Normalizer switches to degraded tier when any
+    trigger turns on and switches back when all of them are off and degraded tier was active
+    for at least `min_degraded_seconds`. Tier can also be chosen per request.
+
+    Switches are logged, counted in `num_switches` and reported to instrumentation of the full tier.
+    """
+
+    def __init__(
+        self,
+        normalizer: Normalizer,
+        degraded: Normalizer = None,
+        high_latency: float = None,
+        low_latency: float = None,
+        high_queue_depth: int = None,
+        low_queue_depth: int = None,
+        min_degraded_seconds: float = 5.0,
+        smoothing: float = 0.2,
+    ):
+        """
+        constructor of tiered normalizer
+
+        Parameters
+        ----------
+        normalizer: Normalizer
+            normalization pipeline of full tier
+        degraded: Normalizer
+            normalization pipeline of degraded tier. If not provided, `create_degraded_normalizer`
+            is called with verbalization grammar built from scratch.
+        high_latency: float
+            seconds per utterance that switch normalizer to degraded tier. If not provided,
+            latency doesn't switch tiers.
+        low_latency: float
+            seconds per utterance that allow to switch back to full tier. Half of `high_latency` by default.
+        high_queue_depth: int
+            number of waiting requests that switches normalizer to degraded tier. If not provided,
+            queue depth doesn't switch tiers.
+        low_queue_depth: int
+            number of waiting requests that allows to switch back to full tier. Half of `high_queue_depth` by default.
+        min_degraded_seconds: float
+            minimum time normalizer stays in degraded tier, also interval between probes of full tier latency
+        smoothing: float
+            weight of the latest request in smoothed latency
+        """
+        self._full = normalizer
+        self._degraded = degraded if degraded is not None else create_degraded_normalizer()
+        self._triggers = {}
+        if high_latency is not None:
+            low_latency = low_latency if low_latency is not None else high_latency / 2
+            self._triggers["latency"] = Hysteresis(high_latency, low_latency)
+        if high_queue_depth is not None:
+            low_queue_depth = low_queue_depth if low_queue_depth is not None else high_queue_depth // 2
+            self._triggers["queue_depth"] = Hysteresis(high_queue_depth, low_queue_depth)
+        self._min_degraded_seconds = min_degraded_seconds
+        self._smoothing = smoothing
+        self._lock = threading.Lock()
+        self._degraded_since: Optional[float] = None
+        self._last_probe = 0.0
+        self.latency = 0.0
+        self.num_switches = 0
+
+    @property
+    def tier(self) -> str:
+        """
+        getter for tier that serves requests which don't choose tier explicitly
+        """
+        return TIER_DEGRADED if self._degraded_since is not None else TIER_FULL
+
+    @property
+    def instrumentation(self) -> Optional[Instrumentation]:
+        """
+        getter for instrumentation of the full tier
+        """
+        return self._full.instrumentation
+
+    @instrumentation.setter
+    def instrumentation(self, instrumentation: Optional[Instrumentation]):
+        self._full.instrumentation = instrumentation
+        self._degraded.instrumentation = instrumentation
+
+    def _update(self, name: str, value: float):
+        """
+        helper function that updates trigger with a new value of the signal and switches tier if needed
+        """
+        if name not in self._triggers:
+            return
+        with self._lock:
+            self._triggers[name].update(value)
+            overloaded = any(x.active for x in self._triggers.values())
+            now = time.perf_counter()
+            if overloaded and self._degraded_since is None:
+                self._degraded_since = now
+                self._last_probe = now
+            elif not overloaded and self._degraded_since is not None:
+                if now - self._degraded_since < self._min_degraded_seconds:
+                    return
+                self._degraded_since = None
+            else:
+                return
+            self.num_switches += 1
+            tier = self.tier
+        logging.info("Switched normalization to {} tier, {} {}".format(tier, name, value))
+        if self.instrumentation is not None:
+            self.instrumentation.on_tier_switch(tier)
+
+    def _pick_tier(self) -> str:
+        """
+        helper function that picks tier for request that doesn't choose it explicitly:
+        current tier, or full tier if it is time to probe its latency
+        """
+        with self._lock:
+            if self._degraded_since is None:
+                return TIER_FULL
+            now = time.perf_counter()
+            if "latency" in self._triggers and now - self._last_probe >= self._min_degraded_seconds:
+                self._last_probe = now
+                return TIER_FULL
+            return TIER_DEGRADED
+
+    def observe_queue_depth(self, queue_depth: int):
+        """
+        reports number of requests waiting for normalization
+        """
+        self._update("queue_depth", queue_depth)
+
+    def normalize_batch(self, texts: List[str], tier: str = None) -> List[str]:
+        """
+        normalizes batch of utterances with full or degraded tier
+
+        Parameters
+        ----------
+        texts: List[str]
+            input utterances
+        tier: str
+            tier to normalize with: full or degraded. If not provided, current tier is used,
+            or full tier if it is time to probe its latency.
+
+        Returns
+        -------
+        normalized: List[str]
+            utterances in spoken form
+        """
+        if tier is None:
+            tier = self._pick_tier()
+        if tier not in (TIER_FULL, TIER_DEGRADED):
+            raise ValueError("Unknown tier [{}], expected {} or {}".format(tier, TIER_FULL, TIER_DEGRADED))
+        normalizer = self._full if tier == TIER_FULL else self._degraded
+        start = time.perf_counter()
+        normalized = normalizer.normalize_batch(texts)
+        if texts and tier == TIER_FULL:
+            seconds = (time.perf_counter() - start) / len(texts)
+            self.latency = self._smoothing * seconds + (1 - self._smoothing) * self.latency
+            self._update("latency", self.latency)
+        return normalized
+
+    def normalize(self, text: str, tier: str = None) -> str:
+        """
+        normalizes single utterance with full or degraded tier
+        """
+        return self.normalize_batch([text], tier)[0]
+
+
+def create_tiered_normalizer(
+    grammars: Grammars, segment: bool = False, cache_size: int = 100000, toy_classify: BaseFst = None, **kwargs
+) -> TieredNormalizer:
+    """
+    creates tiered normalizer on top of loaded grammars, similar to `create_normalizer`.
+    Verbalization grammar is shared by both tiers.
+
+    Parameters
+    ----------
+    grammars: Grammars
+        grammars loaded with `load_grammars`
+    segment: bool
+        whether to split input into chunks before classification in full tier, see `Segmenter`
+    cache_size: int
+        number of verbalized tokens to cache. 0 disables the cache
+    toy_classify: BaseFst
+        toy classification grammar. If not provided, toy ClassifyFst is built.
+    kwargs
+        thresholds of `TieredNormalizer`
+
+    Returns
+    -------
+    normalizer: TieredNormalizer
+        normalizer with full and degraded tiers
+    """
+    _, verbalize, class_verbalizers = grammars
+    full = create_normalizer(grammars, segment, cache_size)
+    # both tiers verbalize the same tokens the same way, so they share the cache
+    degraded = Normalizer(
+        toy_classify if toy_classify is not None else ToyClassifyFst(),
+        verbalize,
+        verbalize_cache=full.verbalize_cache,
+        class_verbalizers=class_verbalizers,
+    )
+    return TieredNormalizer(full, degraded, **kwargs)
+
+
+def load_tiered_normalizer(
+    far_dir: str = None, cache_dir: str = None, segment: bool = False, cache_size: int = 100000, **kwargs
+) -> TieredNormalizer:
+    """
+    loads grammars and creates tiered normalizer, see `load_grammars` and `create_tiered_normalizer`
+
+    Parameters
+    ----------
+    far_dir: str
+        directory with grammars exported by `grammar_export.export_grammars`.
+        If not provided, grammars are loaded from the compile cache, being built if needed.
+    cache_dir: str
+        directory of the compile cache, used if `far_dir` is not provided
+    segment: bool
+        whether to split input into chunks before classification in full tier, see `Segmenter`
+    cache_size: int
+        number of verbalized tokens to cache. 0 disables the cache
+    kwargs
+        thresholds of `TieredNormalizer`
+
+    Returns
+    -------
+    normalizer: TieredNormalizer
+        normalizer with full and degraded tiers
+    """
+    return create_tiered_normalizer(load_grammars(far_dir, cache_dir), segment, cache_size, **kwargs)
@@ -0,0 +1,156 @@
+"""
+Copyright 2022 Balacoon
+
+Classification of plain lowercase words without classification grammar
+"""
+
+import argparse
+import logging
+import re
+from typing import Iterable, List, Optional, Tuple
+
+import pynini
+import pywrapfst
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.classify.plain_word import PlainWordConflictsFst
+from en_us_normalization.production.grammar_cache import load_or_build
+from en_us_normalization.production.grammar_export import apply_fst, prepare_fst
+
+from learn_to_normalize.grammar_utils.base_fst import BaseFst
+
+_PLAIN_WORD_RE = re.compile(r"[a-z]+")
+
+
+class PlainWordFastPath:
+    """
+    Tags plain words directly, skipping composition with classification grammar.
+    Most of the tokens in a text are regular lowercase words, which ClassifyFst
+    tags as `name: "..."`. A chunk of text, made only of lowercase ascii letters,
+    is tagged directly, unless it is one of the words that other classifiers accept
+    (see PlainWordConflictsFst). Set of conflicting words is typically finite, so
+    it is kept in a hash set. If it is not, conflicts are checked with the acceptor.
+
+    Fast path is applied to chunks that are classified independently, i.e. it works
+    together with `Segmenter`, which guarantees that words are not a part of multi-word tokens.
+
+    Examples of fast path:
+
+    - hello -> tokens { name: "hello" }
+    - mrs -> None, i.e. goes to classification grammar
+    - Hello -> None
+    """
+
+    def __init__(self, conflicts: BaseFst = None):
+        """
+        constructor of plain words fast path
+
+        Parameters
+        ----------
+        conflicts: BaseFst
+            acceptor of lowercase words that are classified as something else than a regular word.
+            Should match classification grammar. If not provided, PlainWordConflictsFst is built
+            for all classes.
+        """
+        if conflicts is None:
+            conflicts = PlainWordConflictsFst()
+        fst = conflicts.fst
+        if not isinstance(fst, pynini.Fst):
+            fst = pynini.Fst.from_pywrapfst(fst)
+        self._conflicts = None
+        self._conflicts_fst = None
+        if fst.num_states() == 0:
+            self._conflicts = frozenset()
+        elif fst.properties(pywrapfst.ACYCLIC, True) == pywrapfst.ACYCLIC:
+            self._conflicts = frozenset(fst.paths().ostrings())
+        else:
+            self._conflicts_fst = prepare_fst(fst)
+
+    def is_conflict(self, word: str) -> bool:
+        """
+        checks if the word can be classified as something else than a regular word
+        """
+        if self._conflicts is not None:
+            return word in self._conflicts
+        lattice = pywrapfst.compose(pynini.accep(word), self._conflicts_fst)
+        return lattice.num_states() > 0
+
+    def classify(self, chunk: str) -> Optional[str]:
+        """
+        tags chunk of text if it is a plain word
+
+        Parameters
+        ----------
+        chunk: str
+            chunk of text that is classified independently
+
+        Returns
+        -------
+        tagged: Optional[str]
+            tagged regular word, same as ClassifyFst would produce, or None
+            if chunk should go through classification grammar
+        """
+        if not _PLAIN_WORD_RE.fullmatch(chunk) or self.is_conflict(chunk):
+            return None
+        return 'tokens {{ name: "{}" }}'.format(chunk)
+
+
+def verify_fast_path(fast_path: PlainWordFastPath, classify: BaseFst, texts: Iterable[str]) -> List[Tuple[str, str, str]]:
+    """
+    runs both fast path and classification grammar on words of the corpus,
+    reporting words that are tagged differently
+
+    Parameters
+    ----------
+    fast_path: PlainWordFastPath
+        fast path to verify
+    classify: BaseFst
+        classification grammar, fast path was built for
+    texts: Iterable[str]
+        corpus to take words from
+
+    Returns
+    -------
+    divergences: List[Tuple[str, str, str]]
+        words that fast path tagged differently from the grammar:
+        word, output of fast path, output of grammar
+    """
+    fst = prepare_fst(classify.fst)
+    checked = set()
+    divergences = []
+    for text in texts:
+        for word in text.split():
+            if word in checked:
+                continue
+            checked.add(word)
+            fast_tagged = fast_path.classify(word)
+            if fast_tagged is None:
+                continue
+            tagged = apply_fst(fst, word)
+            if tagged != fast_tagged:
+                divergences.append((word, fast_tagged, tagged))
+    return divergences
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Checks that plain words fast path tags words same as ClassifyFst")
+    ap.add_argument("corpus", help="Text file to take words from")
+    ap.add_argument("--profile", help="Profile of classification grammar, all classes by default")
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    kwargs = {} if args.profile is None else {"profile": args.profile}
+    classify = load_or_build(ClassifyFst, **kwargs)
+    fast_path = PlainWordFastPath(load_or_build(PlainWordConflictsFst, **kwargs))
+    with open(args.corpus, "r", encoding="utf-8") as fp:
+        divergences = verify_fast_path(fast_path, classify, fp)
+    for word, fast_tagged, tagged in divergences:
+        logging.warning("[{}]: fast path [{}], grammar [{}]".format(word, fast_tagged, tagged))
+    logging.info("Found {} divergences".format(len(divergences)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Copyright 2022 Balacoon
+
+Per-request resource budgets of classification with graceful fallback
+"""
+
+import collections
+import time
+from typing import Dict, List, Optional, Sequence
+
+import pynini
+import pywrapfst
+from en_us_normalization.production.grammar_export import prepare_fst
+from en_us_normalization.production.text_proto import escape_string
+from en_us_normalization.toy.classify.classify import ClassifyFst as ToyClassifyFst
+
+from learn_to_normalize.grammar_utils.base_fst import BaseFst
+
+# fallbacks in order of increasing degradation
+FALLBACK_CHUNKS = "chunks"
+FALLBACK_TOY = "toy"
+FALLBACK_VERBATIM = "verbatim"
+FALLBACKS = (FALLBACK_CHUNKS, FALLBACK_TOY, FALLBACK_VERBATIM)
+
+
+class RequestBudget:
+    """
+    Budget of a single request: wall time left until the deadline
+    and fallbacks that fired while processing the request
+    """
+
+    def __init__(self, max_seconds: Optional[float]):
+        self.deadline = time.perf_counter() + max_seconds if max_seconds is not None else None
+        self.fallbacks: List[str] = []
+
+    def expired(self) -> bool:
+        """
+        checks if request ran out of time
+        """
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+
+class ResourceGovernor:
+    """
+    Keeps classification of a single pathological input (a long token without whitespace,
+    a URL with a huge path, a line of consonants) from taking seconds and gigabytes.
+    Each input is checked against budgets before it is composed with classification grammar:
+
+    - `max_chars`: inputs longer than that are not composed with classification grammar at all
+    - `max_seconds`: once request is past its deadline, remaining inputs are not composed
+      with classification grammar
+
+    pywrapfst composes eagerly and composition can't be interrupted, so budgets can only be checked
+    before a composition starts. `max_chars` is the only budget that bounds time and memory
+    of a single composition. `max_seconds` is checked between compositions, so a request overruns
+    its deadline by up to the time of one composition.
+    When a budget is exceeded, input falls back to cheaper strategies, in order:
+
+    1. chunks - input is split by whitespace and each chunk is classified with the grammar separately
+    2. toy - input is classified with toy grammar, that only tags words, digits and abbreviations
+    3. verbatim - input is kept as is
+
+    Each fallback that fires is recorded in the budget of the request and counted in `fallback_counts`.
+    """
+
+    def __init__(
+        self,
+        max_seconds: float = None,
+        max_chars: int = None,
+        toy_classify: BaseFst = None,
+        fallbacks: Sequence[str] = FALLBACKS,
+    ):
+        """
+        constructor of resource governor
+
+        Parameters
+        ----------
+        max_seconds: float
+            wall time budget of a request, checked before each composition
+        max_chars: int
+            maximum length of input composed with classification grammar
+        toy_classify: BaseFst
+            toy classification grammar for toy fallback. If not provided, toy ClassifyFst is built,
+            if toy fallback is enabled.
+        fallbacks: Sequence[str]
+            enabled fallbacks, some of FALLBACKS. Verbatim fallback is used when all others fail
+            regardless, since input has to be tagged somehow.
+        """
+        unknown = set(fallbacks) - set(FALLBACKS)
+        if unknown:
+            raise ValueError("Unknown fallbacks {}, expected some of {}".format(sorted(unknown), FALLBACKS))
+        self.max_seconds = max_seconds
+        self.max_chars = max_chars
+        self._fallbacks = set(fallbacks)
+        self._toy_fst = None
+        if FALLBACK_TOY in self._fallbacks:
+            if toy_classify is None:
+                toy_classify = ToyClassifyFst()
+            self._toy_fst = prepare_fst(toy_classify.fst)
+        self.fallback_counts: Dict[str, int] = collections.Counter()
+
+    def start(self) -> RequestBudget:
+        """
+        starts the clock of a request
+        """
+        return RequestBudget(self.max_seconds)
+
+    def _compose(self, fst: pywrapfst.Fst, text: str, budget: RequestBudget) -> Optional[str]:
+        """
+        helper function that applies grammar to the text if it fits into the budgets,
+        returns None otherwise
+        """
+        if self.max_chars is not None and len(text) > self.max_chars:
+            return None
+        if budget.expired():
+            return None
+        return self._apply(fst, text)
+
+    def _apply(self, fst: pywrapfst.Fst, text: str) -> Optional[str]:
+        """
+        helper function that applies grammar to the text, returns None if grammar can't process the text
+        """
+        lattice = pywrapfst.compose(pynini.accep(pynini.escape(text)), fst)
+        try:
+            return pynini.shortestpath(pynini.Fst.from_pywrapfst(lattice)).string()
+        except pywrapfst.FstOpError:
+            return None
+
+    def _fire(self, fallback: str, budget: RequestBudget):
+        """
+        helper function that records fallback
+        """
+        self.fallback_counts[fallback] += 1
+        budget.fallbacks.append(fallback)
+
+    @staticmethod
+    def tag_verbatim(text: str) -> str:
+        """
+        tags each whitespace-separated chunk of the text as a word that is kept as is
+
+        Parameters
+        ----------
+        text: str
+            input text
+
+        Returns
+        -------
+        tagged_text: str
+            tagged tokens, for ex. `tokens { name: "n33dful" }`
+        """
+        return " ".join('tokens {{ name: "{}" }}'.format(escape_string(chunk)) for chunk in text.split())
+
+    def _classify_degraded(self, text: str, budget: RequestBudget) -> str:
+        """
+        helper function that classifies text with toy grammar or keeps it verbatim
+        """
+        if self._toy_fst is not None:
+            # toy grammar is cheap, so it is applied regardless of budgets
+            tagged = self._apply(self._toy_fst, text)
+            if tagged is not None:
+                self._fire(FALLBACK_TOY, budget)
+                return tagged
+        self._fire(FALLBACK_VERBATIM, budget)
+        return self.tag_verbatim(text)
+
+    def classify(self, fst: pywrapfst.Fst, text: str, budget: RequestBudget) -> str:
+        """
+        classifies text with classification grammar within the budgets, falling back
+        to cheaper strategies if budgets are exceeded
+
+        Parameters
+        ----------
+        fst: pywrapfst.Fst
+            prepared classification grammar
+        text: str
+            input text
+        budget: RequestBudget
+            budget of the request the text belongs to, as returned by `start`
+
+        Returns
+        -------
+        tagged_text: str
+            tagged tokens
+        """
+        tagged = self._compose(fst, text, budget)
+        if tagged is not None:
+            return tagged
+        chunks = text.split()
+        if FALLBACK_CHUNKS not in self._fallbacks or len(chunks) < 2:
+            return self._classify_degraded(text, budget)
+        self._fire(FALLBACK_CHUNKS, budget)
+        tagged = []
+        for chunk in chunks:
+            chunk_tagged = self._compose(fst, chunk, budget)
+            tagged.append(chunk_tagged if chunk_tagged is not None else self._classify_degraded(chunk, budget))
+        return " ".join(tagged)
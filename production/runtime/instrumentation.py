@@ -0,0 +1,119 @@
+"""
+Copyright 2022 Balacoon
+
+Hooks that report latency of normalization stages
+"""
+
+import logging
+from typing import Optional
+
+# stages of normalization pipeline, as reported to instrumentation
+CLASSIFY = "classify"
+PARSE = "parse"
+SERIALIZE = "serialize"
+VERBALIZE = "verbalize"
+NUMERIC = "numeric"
+
+
+class Instrumentation:
+    """
+    Receives wall time of normalization stages from `Normalizer`. Base class doesn't
+    record anything, subclass it to report to a sink of choice (Prometheus, log, OpenTelemetry).
+    Instrumentation is off unless it is passed to `Normalizer`, in which case
+    pipeline doesn't even measure time.
+
+    Reported stages:
+
+    - classify: classification of a distinct utterance (including segmentation, whitelist, lookup and fast path)
+    - parse: parsing of tagged text of an utterance into tokens
+    - serialize: serialization of semiotic tokens of an utterance
+    - verbalize: verbalization of a distinct serialized token, reported along with its semiotic class
+    - numeric: batched verbalization of numeric tokens, see `NumericVerbalizer`
+
+    Hooks are called from the thread that runs normalization.
+    """
+
+    def on_stage(self, stage: str, seconds: float, semiotic_class: Optional[str] = None):
+        """
+        called when a stage is done
+
+        Parameters
+        ----------
+        stage: str
+            name of the stage: classify, parse, serialize, verbalize or numeric
+        seconds: float
+            wall time of the stage
+        semiotic_class: Optional[str]
+            semiotic class of verbalized token, None for other stages
+        """
+
+    def on_fallback(self, fallback: str):
+        """
+        called when resource governor falls back to cheaper classification, see `ResourceGovernor`
+
+        Parameters
+        ----------
+        fallback: str
+            name of the fallback: chunks, toy or verbatim
+        """
+
+    def on_tier_switch(self, tier: str):
+        """
+        called when tiered normalizer switches between full and degraded tier, see `TieredNormalizer`
+
+        Parameters
+        ----------
+        tier: str
+            name of the tier switched to: full or degraded
+        """
+
+    def on_request(self, num_texts: int, num_chars: int, num_tokens: int, seconds: float):
+        """
+        called when `normalize_batch` (or `normalize`) is done
+
+        Parameters
+        ----------
+        num_texts: int
+            number of utterances in the batch
+        num_chars: int
+            total length of utterances in the batch
+        num_tokens: int
+            total number of tokens utterances are split into
+        seconds: float
+            wall time of the whole request
+        """
+
+
+class LoggingInstrumentation(Instrumentation):
+    """
+    Instrumentation that logs latency of each stage and request
+    """
+
+    def __init__(self, level: int = logging.DEBUG):
+        """
+        constructor of logging instrumentation
+
+        Parameters
+        ----------
+        level: int
+            logging level of the reports
+        """
+        self._level = level
+
+    def on_stage(self, stage: str, seconds: float, semiotic_class: Optional[str] = None):
+        if semiotic_class is None:
+            logging.log(self._level, "{}: {:.6f}s".format(stage, seconds))
+        else:
+            logging.log(self._level, "{} [{}]: {:.6f}s".format(stage, semiotic_class, seconds))
+
+    def on_fallback(self, fallback: str):
+        logging.log(self._level, "fallback to {}".format(fallback))
+
+    def on_tier_switch(self, tier: str):
+        logging.log(self._level, "switched to {} tier".format(tier))
+
+    def on_request(self, num_texts: int, num_chars: int, num_tokens: int, seconds: float):
+        logging.log(
+            self._level,
+            "normalized {} texts, {} chars, {} tokens in {:.6f}s".format(num_texts, num_chars, num_tokens, seconds),
+        )
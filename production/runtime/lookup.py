@@ -0,0 +1,195 @@
+"""
+Copyright 2022 Balacoon
+
+Classification of vocabulary tokens by lookup
+"""
+
+import argparse
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pynini
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.classify.vocabulary import VocabularyFst
+from en_us_normalization.production.grammar_cache import load_or_build
+from en_us_normalization.production.grammar_export import apply_fst, prepare_fst
+from en_us_normalization.production.text_proto import escape_string
+
+from learn_to_normalize.grammar_utils.base_fst import BaseFst
+from learn_to_normalize.grammar_utils.shortcuts import PUNCT
+
+
+class VocabularyLookup:
+    """
+    Tags tokens from vocabularies (shortenings, abbreviations, words with apostrophe in front)
+    with a hash table lookup instead of composition with classification grammar.
+    Table is built once from the full classification grammar: each vocabulary token
+    is classified with the grammar and its tagged output is stored. So lookup output
+    is identical to the one of the grammar by construction.
+
+    Since vocabulary tokens are resolved by lookup, classification grammar itself can be built
+    without vocabularies (`ClassifyFst(vocabulary=False)`), which makes it smaller. In that case,
+    lookup is applied to the whole chunks produced by `Segmenter`, and vocabulary tokens
+    that are glued to other tokens within a chunk are no longer recognized by the grammar.
+    Use `verify_lookup` to check such divergences on a corpus.
+    Punctuation marks attached to the chunk are stripped and put back into tagged token
+    as `left_punct` and `right_punct`, same as classification grammar does. Vocabulary tokens
+    may start or end with a punctuation mark themselves ("'em", "etc."), so the longest vocabulary token
+    is looked up first.
+
+    Examples of lookup:
+
+    - Mrs. -> tokens { name: "mistress" }
+    - (FBI, -> tokens { left_punct: "(" name: "FBI" right_punct: "," }
+    - hello -> None, i.e. goes to classification grammar
+    """
+
+    def __init__(self, classify: BaseFst = None, vocabulary: BaseFst = None):
+        """
+        constructor of vocabulary lookup
+
+        Parameters
+        ----------
+        classify: BaseFst
+            full classification grammar (built with vocabularies) to precompute tagging with.
+            Should be built for the same classes as the grammar used at runtime.
+            If not provided, ClassifyFst is built.
+        vocabulary: BaseFst
+            acceptor of vocabulary tokens. If not provided, VocabularyFst is built.
+        """
+        if classify is None:
+            classify = ClassifyFst()
+        if vocabulary is None:
+            vocabulary = VocabularyFst()
+        fst = vocabulary.fst
+        if not isinstance(fst, pynini.Fst):
+            fst = pynini.Fst.from_pywrapfst(fst)
+        classify_fst = prepare_fst(classify.fst)
+        self._punct = frozenset(PUNCT.paths().ostrings()) | {'"'}
+        self._table: Dict[str, str] = {}
+        for token in fst.paths().ostrings():
+            try:
+                self._table[token] = apply_fst(classify_fst, token)
+            except pynini.FstOpError:
+                logging.warning("Failed to classify vocabulary token [{}]".format(token))
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+    def __contains__(self, token: str) -> bool:
+        return token in self._table
+
+    def classify(self, chunk: str) -> Optional[str]:
+        """
+        tags chunk of text if it is a vocabulary token
+
+        Parameters
+        ----------
+        chunk: str
+            chunk of text that is classified independently
+
+        Returns
+        -------
+        tagged: Optional[str]
+            tagged token, same as ClassifyFst would produce, or None
+            if chunk should go through classification grammar
+        """
+        tagged = self._table.get(chunk)
+        if tagged is not None:
+            return tagged
+        left = 0
+        while left < len(chunk) and chunk[left] in self._punct:
+            left += 1
+        right = len(chunk)
+        while right > left and chunk[right - 1] in self._punct:
+            right -= 1
+        # strip punctuation mark by mark, so that the longest vocabulary token is found, for ex. "etc." or "'em"
+        for start in range(left + 1):
+            for end in range(len(chunk), max(right, start + 1) - 1, -1):
+                if start == 0 and end == len(chunk):
+                    continue
+                tagged = self._table.get(chunk[start:end])
+                if tagged is not None:
+                    return self._attach_punct(tagged, chunk[:start], chunk[end:])
+        return None
+
+    @staticmethod
+    def _attach_punct(tagged: str, left: str, right: str) -> Optional[str]:
+        """
+        helper function that puts punctuation into the first and the last of tagged tokens,
+        same as classification grammar does. If tokens already have punctuation, chunk is left to the grammar.
+        """
+        if left:
+            if not tagged.startswith("tokens { ") or tagged.startswith("tokens { left_punct:"):
+                return None
+            tagged = 'tokens {{ left_punct: "{}" {}'.format(escape_string(left), tagged[len("tokens { "):])
+        if right:
+            last = tagged.rfind("tokens { ")
+            if not tagged.endswith(" }") or "right_punct:" in tagged[last:]:
+                return None
+            tagged = '{} right_punct: "{}" }}'.format(tagged[: -len(" }")], escape_string(right))
+        return tagged
+
+
+def verify_lookup(normalizer, classify: BaseFst, texts: Iterable[str]) -> List[Tuple[str, str, str]]:
+    """
+    runs both normalizer classification (with lookup and possibly reduced grammar)
+    and full classification grammar on the corpus, reporting utterances that are tagged differently
+
+    Parameters
+    ----------
+    normalizer: Normalizer
+        normalization pipeline with vocabulary lookup to verify
+    classify: BaseFst
+        full classification grammar, built with vocabularies
+    texts: Iterable[str]
+        corpus to verify on
+
+    Returns
+    -------
+    divergences: List[Tuple[str, str, str]]
+        utterances that are tagged differently: utterance, output of normalizer, output of full grammar
+    """
+    fst = prepare_fst(classify.fst)
+    divergences = []
+    for text in texts:
+        text = text.strip()
+        if not text:
+            continue
+        tagged = normalizer.classify(text)
+        expected = apply_fst(fst, text)
+        if tagged != expected:
+            divergences.append((text, tagged, expected))
+    return divergences
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(
+        description="Checks that vocabulary lookup with reduced ClassifyFst tags text same as full ClassifyFst"
+    )
+    ap.add_argument("corpus", help="Text file to verify on")
+    ap.add_argument("--profile", help="Profile of classification grammar, all classes by default")
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    from en_us_normalization.production.runtime.normalizer import Normalizer
+    from en_us_normalization.production.runtime.segment import Segmenter
+
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    kwargs = {} if args.profile is None else {"profile": args.profile}
+    classify = load_or_build(ClassifyFst, **kwargs)
+    reduced = load_or_build(ClassifyFst, vocabulary=False, **kwargs)
+    lookup = VocabularyLookup(classify)
+    normalizer = Normalizer(classify=reduced, segmenter=Segmenter(), vocabulary_lookup=lookup)
+    with open(args.corpus, "r", encoding="utf-8") as fp:
+        divergences = verify_lookup(normalizer, classify, fp)
+    for text, tagged, expected in divergences:
+        logging.warning("[{}]: lookup [{}], grammar [{}]".format(text, tagged, expected))
+    logging.info("Found {} divergences".format(len(divergences)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Copyright 2022 Balacoon
+
+Normalization pipeline on top of classification and verbalization grammars
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import pynini
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.grammar_export import ClassVerbalizers, apply_fst, prepare_fst
+from en_us_normalization.production.runtime.cache import LRUCache
+from en_us_normalization.production.runtime.fast_path import PlainWordFastPath
+from en_us_normalization.production.runtime.governor import RequestBudget, ResourceGovernor
+from en_us_normalization.production.runtime.instrumentation import (
+    CLASSIFY,
+    NUMERIC,
+    PARSE,
+    SERIALIZE,
+    VERBALIZE,
+    Instrumentation,
+)
+from en_us_normalization.production.runtime.lookup import VocabularyLookup
+from en_us_normalization.production.runtime.numeric import NumericVerbalizer
+from en_us_normalization.production.runtime.segment import Segmenter
+from en_us_normalization.production.runtime.tokens import SerializationSpec, Token, parse_tokens
+from en_us_normalization.production.runtime.whitelist import Whitelist
+from en_us_normalization.production.verbalize.verbalize import VerbalizeFst
+
+from learn_to_normalize.grammar_utils.base_fst import BaseFst
+
+ParsedTokens = List[Tuple[Token, Optional[str]]]
+
+
+class Normalizer:
+    """
+    Text normalization pipeline that runs all the steps that
+    convert written text into spoken form:
+
+    1. classification - input text is split into tokens that are classified into semiotic classes
+    2. parsing - tagged output of classification is parsed into tokens
+    3. serialization - semiotic classes are serialized according to configs/verbalizer_serialization_spec.ascii_proto
+    4. verbalization - serialized semiotic classes are converted to spoken form
+
+    Grammars are prepared for composition (arc-sorted, converted to const fsts) once,
+    when normalizer is created. Batch normalization shares work within the batch:
+    identical inputs are classified once and identical serialized tokens are verbalized once.
+    Optionally, verbalization results are memorized across calls in LRU cache.
+    Optionally, input is split into chunks by segmenter, so that classification grammar
+    is composed with short chunks instead of whole utterances. Chunks that are plain
+    lowercase words can be tagged by a fast path, skipping classification grammar altogether.
+    Similarly, chunks that are vocabulary tokens (shortenings, abbreviations) can be tagged by lookup.
+    Optionally, whitelisted tokens with fixed spoken form are tagged before classification grammar.
+    Optionally, numeric tokens (cardinals, ordinals, decimals) of the batch are verbalized all at once,
+    without verbalization grammar.
+    Optionally, latency of each stage is reported to instrumentation hooks.
+    Optionally, classification of each utterance is kept within time and lattice size budgets
+    by resource governor, falling back to cheaper classification when budget is exceeded.
+    Optionally, serialized tokens are verbalized only with the verbalizer of their semiotic class,
+    instead of the union of all verbalizers.
+
+    Examples of normalization:
+
+    - hello world! -> hello world!
+    - 1.30 PM -> one thirty PM
+    """
+
+    def __init__(
+        self,
+        classify: BaseFst = None,
+        verbalize: BaseFst = None,
+        spec: SerializationSpec = None,
+        verbalize_cache: LRUCache = None,
+        segmenter: Segmenter = None,
+        fast_path: PlainWordFastPath = None,
+        vocabulary_lookup: VocabularyLookup = None,
+        whitelist: Whitelist = None,
+        numeric_verbalizer: NumericVerbalizer = None,
+        instrumentation: Instrumentation = None,
+        governor: ResourceGovernor = None,
+        class_verbalizers: ClassVerbalizers = None,
+    ):
+        """
+        constructor of normalization pipeline
+
+        Parameters
+        ----------
+        classify: BaseFst
+            classification grammar. Either compiled ClassifyFst, one loaded from
+            the compile cache or exported archive. If not provided, ClassifyFst is built.
+        verbalize: BaseFst
+            verbalization grammar. If not provided, VerbalizeFst is built.
+        spec: SerializationSpec
+            serialization of semiotic classes. If not provided, production spec is used.
+        verbalize_cache: LRUCache
+            cache of verbalized tokens. Repeated tokens skip verbalization grammar.
+            If not provided, every token is verbalized with the grammar.
+        segmenter: Segmenter
+            splits input text into chunks that are classified independently.
+            If not provided, whole input is classified at once.
+        fast_path: PlainWordFastPath
+            tags chunks that are plain words without classification grammar. Should be built
+            for the same classes as classification grammar. If not provided, all chunks are classified
+            with the grammar.
+        vocabulary_lookup: VocabularyLookup
+            tags chunks that are vocabulary tokens by lookup. Allows to use classification grammar
+            built without vocabularies. Requires `segmenter`, since only whole chunks are looked up.
+            If not provided, vocabulary tokens are classified with the grammar.
+        whitelist: Whitelist
+            tokens with fixed spoken form, that take priority over classification grammar.
+            If not provided, whitelist is not applied.
+        numeric_verbalizer: NumericVerbalizer
+            verbalizes numeric tokens of the batch at once. Tokens it doesn't support
+            go to verbalization grammar. If not provided, all tokens are verbalized with the grammar.
+        instrumentation: Instrumentation
+            receives latency of normalization stages. If not provided, nothing is measured.
+        governor: ResourceGovernor
+            budgets of classification of each utterance.
+            Fallbacks that fire are reported to instrumentation.
+            If not provided, classification grammar is applied to any input.
+        class_verbalizers: ClassVerbalizers
+            verbalizers of semiotic classes, serialized token is composed only with the verbalizer
+            of its class. Takes place of `verbalize`, which is not built if not provided.
+            If not provided, tokens are composed with the union of verbalizers.
+        """
+        if vocabulary_lookup is not None and segmenter is None:
+            raise ValueError("Vocabulary lookup is applied to chunks of text, it requires a segmenter")
+        if classify is None:
+            classify = ClassifyFst()
+        if verbalize is None and class_verbalizers is None:
+            verbalize = VerbalizeFst()
+        self._classify_fst = prepare_fst(classify.fst)
+        self._verbalize_fst = prepare_fst(verbalize.fst) if class_verbalizers is None else None
+        self.class_verbalizers = class_verbalizers
+        self._spec = spec if spec is not None else SerializationSpec()
+        self.verbalize_cache = verbalize_cache
+        self.segmenter = segmenter
+        self.fast_path = fast_path
+        self.vocabulary_lookup = vocabulary_lookup
+        self.whitelist = whitelist
+        self.numeric_verbalizer = numeric_verbalizer
+        self.instrumentation = instrumentation
+        self.governor = governor
+
+    def classify(self, text: str) -> str:
+        """
+        splits text into tokens and classifies them
+
+        Parameters
+        ----------
+        text: str
+            input text
+
+        Returns
+        -------
+        tagged_text: str
+            tagged tokens, for ex. `tokens { name: "hello" } tokens { name: "world" right_punct: "!" }`
+        """
+        return self._classify(text, {})
+
+    def _split(self, text: str) -> List[Tuple[str, Optional[str]]]:
+        """
+        helper function that splits text into chunks that are classified independently.
+        Whitelist is applied to the whole text before segmentation, since segmenter would split
+        multi-word whitelisted tokens, and only the text between whitelisted tokens is segmented.
+        Whitelisted chunks are paired with their tagged text, the rest of chunks are paired with None.
+        """
+        pieces = [(text, None)] if self.whitelist is None else self.whitelist.tag(text)
+        chunks = []
+        for piece, whitelisted in pieces:
+            if whitelisted is not None:
+                chunks.append((piece, whitelisted))
+            elif self.segmenter is None:
+                chunks.append((piece, None))
+            else:
+                chunks.extend((x, None) for x in self.segmenter.split(piece))
+        return chunks
+
+    def _classify(self, text: str, classified: Dict[str, str]) -> str:
+        """
+        helper function that classifies text chunk by chunk, see `_split`.
+        Tagged chunks are memorized in `classified`, so that repeated chunks are classified once.
+        """
+        if not text.strip():
+            return ""
+        budget = self.governor.start() if self.governor is not None else None
+        tagged = []
+        for chunk, whitelisted in self._split(text):
+            if whitelisted is not None:
+                tagged.append(whitelisted)
+                continue
+            if chunk not in classified:
+                classified[chunk] = self._classify_chunk(chunk, budget)
+            tagged.append(classified[chunk])
+        if budget is not None and self.instrumentation is not None:
+            for fallback in budget.fallbacks:
+                self.instrumentation.on_fallback(fallback)
+        return " ".join(tagged)
+
+    def _classify_chunk(self, chunk: str, budget: RequestBudget = None) -> str:
+        """
+        helper function that classifies chunk of text with lookup, fast path or classification grammar
+        """
+        tagged = None
+        if self.vocabulary_lookup is not None:
+            tagged = self.vocabulary_lookup.classify(chunk)
+        if tagged is None and self.fast_path is not None:
+            tagged = self.fast_path.classify(chunk)
+        if tagged is None and budget is not None:
+            tagged = self.governor.classify(self._classify_fst, chunk, budget)
+        elif tagged is None:
+            tagged = apply_fst(self._classify_fst, chunk)
+        return tagged
+
+    def verbalize(self, serialized: str) -> str:
+        """
+        converts serialized semiotic class into spoken form
+
+        Parameters
+        ----------
+        serialized: str
+            serialized token, for ex. `cardinal|count:23|`
+
+        Returns
+        -------
+        spoken: str
+            verbalized token, for ex. `twenty three`
+        """
+        if self.verbalize_cache is None:
+            return self._apply_verbalize(serialized)
+        spoken = self.verbalize_cache.get(serialized)
+        if spoken is None:
+            spoken = self._apply_verbalize(serialized)
+            self.verbalize_cache.put(serialized, spoken)
+        return spoken
+
+    def _apply_verbalize(self, serialized: str) -> str:
+        """
+        helper function that verbalizes serialized token with verbalizer of its class if available,
+        with union of verbalizers otherwise
+        """
+        if self.class_verbalizers is not None:
+            return self.class_verbalizers.apply(serialized)
+        return apply_fst(self._verbalize_fst, serialized)
+
+    def _parse(self, tagged_text: str) -> ParsedTokens:
+        """
+        helper function that parses tagged text and serializes semiotic classes.
+        regular words are paired with None instead of serialized token.
+        """
+        parsed = []
+        for token in parse_tokens(tagged_text):
+            serialized = self._spec.serialize(token) if token.is_semiotic() else None
+            parsed.append((token, serialized))
+        return parsed
+
+    def _parse_each_chunk(self, text: str, classified: Dict[str, str]) -> ParsedTokens:
+        """
+        helper function that parses already classified text chunk by chunk, keeping chunks
+        whose classification can't be parsed or serialized as is. Used when parsing of the whole text fails.
+        """
+        parsed = []
+        for chunk, whitelisted in self._split(text):
+            tagged = whitelisted if whitelisted is not None else classified[chunk]
+            try:
+                parsed.extend(self._parse(tagged))
+            except ValueError:
+                logging.warning("Failed to parse classification of [{}], keeping it as is".format(chunk))
+                parsed.extend(self._parse(ResourceGovernor.tag_verbatim(chunk)))
+        return parsed
+
+    def _parse_instrumented(self, text: str, classified: Dict[str, str]) -> ParsedTokens:
+        """
+        helper function that classifies, parses and serializes text, same as `_parse`,
+        reporting latency of each stage to instrumentation
+        """
+        start = time.perf_counter()
+        tagged_text = self._classify(text, classified)
+        classified_time = time.perf_counter()
+        self.instrumentation.on_stage(CLASSIFY, classified_time - start)
+        tokens = parse_tokens(tagged_text)
+        parsed_time = time.perf_counter()
+        self.instrumentation.on_stage(PARSE, parsed_time - classified_time)
+        parsed = [(x, self._spec.serialize(x) if x.is_semiotic() else None) for x in tokens]
+        self.instrumentation.on_stage(SERIALIZE, time.perf_counter() - parsed_time)
+        return parsed
+
+    def _verbalize_token(self, token: Token, serialized: str) -> str:
+        """
+        helper function that verbalizes serialized token. If verbalization fails,
+        field values of the token are returned as is, so that single broken token
+        doesn't break the whole utterance.
+        """
+        if self.instrumentation is not None:
+            start = time.perf_counter()
+        try:
+            return self.verbalize(serialized)
+        except (pynini.FstOpError, ValueError):
+            logging.warning("Failed to verbalize [{}]".format(serialized))
+            return " ".join(value for _, value in token.fields)
+        finally:
+            if self.instrumentation is not None:
+                self.instrumentation.on_stage(VERBALIZE, time.perf_counter() - start, token.semiotic_class)
+
+    @staticmethod
+    def _join(parsed: ParsedTokens, verbalized: Dict[str, str]) -> str:
+        """
+        helper function that puts normalized tokens back together with their punctuation
+        """
+        words = []
+        for token, serialized in parsed:
+            spoken = verbalized[serialized] if serialized is not None else (token.name or "")
+            word = token.left_punct + spoken + token.right_punct
+            if word:
+                words.append(word)
+        return " ".join(words)
+
+    def normalize(self, text: str) -> str:
+        """
+        normalizes single utterance
+
+        Parameters
+        ----------
+        text: str
+            input text
+
+        Returns
+        -------
+        normalized: str
+            text in spoken form
+        """
+        return self.normalize_batch([text])[0]
+
+    def normalize_batch(self, texts: List[str]) -> List[str]:
+        """
+        normalizes batch of utterances. Identical utterances are classified only once
+        and identical semiotic tokens across the batch are verbalized only once.
+
+        Parameters
+        ----------
+        texts: List[str]
+            input utterances
+
+        Returns
+        -------
+        normalized: List[str]
+            utterances in spoken form, in the same order as input
+        """
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            start = time.perf_counter()
+        # classify and parse each distinct utterance (or chunk of utterance) once
+        parsed = {}
+        classified = {}
+        for text in texts:
+            if text in parsed:
+                continue
+            try:
+                if instrumentation is None:
+                    parsed[text] = self._parse(self._classify(text, classified))
+                else:
+                    parsed[text] = self._parse_instrumented(text, classified)
+            except pynini.FstOpError:
+                logging.warning("Failed to classify [{}], keeping it as is".format(text))
+                parsed[text] = [(Token(name=text), None)]
+            except ValueError:
+                # tagged text that can't be parsed or serialized, only failed chunks are kept as is
+                parsed[text] = self._parse_each_chunk(text, classified)
+
+        # verbalize each distinct serialized token once
+        verbalized = {}
+        if self.numeric_verbalizer is not None:
+            if instrumentation is not None:
+                numeric_start = time.perf_counter()
+            serialized = list({x for tokens in parsed.values() for _, x in tokens if x is not None})
+            for key, spoken in zip(serialized, self.numeric_verbalizer.verbalize_batch(serialized)):
+                if spoken is not None:
+                    verbalized[key] = spoken
+            if instrumentation is not None:
+                instrumentation.on_stage(NUMERIC, time.perf_counter() - numeric_start)
+        for tokens in parsed.values():
+            for token, serialized in tokens:
+                if serialized is not None and serialized not in verbalized:
+                    verbalized[serialized] = self._verbalize_token(token, serialized)
+
+        normalized = {text: self._join(tokens, verbalized) for text, tokens in parsed.items()}
+        if instrumentation is not None:
+            instrumentation.on_request(
+                len(texts),
+                sum(len(x) for x in texts),
+                sum(len(parsed[x]) for x in texts),
+                time.perf_counter() - start,
+            )
+        return [normalized[text] for text in texts]
@@ -0,0 +1,282 @@
+"""
+Copyright 2022 Balacoon
+
+Batched verbalization of numeric tokens without verbalization grammar
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from en_us_normalization.production.english_utils import get_data_file_path
+
+# maximum number of digits that cardinal_number_verbalizer.far expands (up to hundreds of trillions)
+MAX_DIGITS = 15
+
+_LOWER_RE = re.compile(r"[a-z]+")
+
+
+def _read_column_pairs(path: str) -> List[Tuple[str, str]]:
+    """
+    helper function that reads pairs of columns from tab-separated file
+    """
+    pairs = []
+    with open(path, "r", encoding="utf-8") as fp:
+        for line in fp:
+            if not line.strip():
+                continue
+            first, second = line.rstrip("\n").split("\t")
+            pairs.append((first, second))
+    return pairs
+
+
+def _read_lines(path: str) -> List[str]:
+    """
+    helper function that reads non-empty lines of the file
+    """
+    with open(path, "r", encoding="utf-8") as fp:
+        return [line.strip() for line in fp if line.strip()]
+
+
+class NumericVerbalizer:
+    """
+    Verbalizes cardinals, ordinals and decimals in batches, bypassing composition with
+    verbalization grammar. Number-heavy texts (financial reports, sports tables) contain
+    thousands of numeric tokens, each one composed with cardinal_number_verbalizer.far separately.
+    Instead, numbers of the whole batch are padded to MAX_DIGITS digits, split into
+    groups of three digits as a numpy array and each group is mapped to words through precomputed
+    tables. There is a table per group position, that contains words for each group value along
+    with the scale (thousand, million, ...), so expansion of the batch is a few array lookups and
+    concatenations. Tables are built from numbers/digit.tsv, teen.tsv, ties.tsv, hundred.tsv and thousands.tsv,
+    ordinal endings are taken from ordinals/digit.tsv and teen.tsv, same as in OrdinalFst.
+
+    Output matches CardinalFst, OrdinalFst and DecimalFst of verbalization grammar. Tokens that
+    have other fields or numbers that grammar doesn't expand (leading zeros, too many digits)
+    are not verbalized, they should go through verbalization grammar.
+
+    Examples of verbalization:
+
+    - cardinal|negative:1|count:23| -> minus twenty three
+    - ordinal|order:21| -> twenty first
+    - decimal|integer_part:12|fractional_part:5006| -> twelve point five o o six
+    """
+
+    def __init__(self):
+        digits = {int(value): word for word, value in _read_column_pairs(get_data_file_path("numbers", "digit.tsv"))}
+        teens = {int(value): word for word, value in _read_column_pairs(get_data_file_path("numbers", "teen.tsv"))}
+        ties = {int(value): word for word, value in _read_column_pairs(get_data_file_path("numbers", "ties.tsv"))}
+        hundred = _read_lines(get_data_file_path("numbers", "hundred.tsv"))[0]
+        scales = _read_lines(get_data_file_path("numbers", "thousands.tsv"))
+        num_groups = MAX_DIGITS // 3
+
+        below_thousand = []
+        for value in range(1000):
+            hundreds, rest = divmod(value, 100)
+            words = [digits[hundreds], hundred] if hundreds else []
+            if 0 < rest < 10:
+                words.append(digits[rest])
+            elif 10 <= rest < 20:
+                words.append(teens[rest])
+            elif rest >= 20:
+                words.append(ties[rest // 10])
+                if rest % 10:
+                    words.append(digits[rest % 10])
+            below_thousand.append(" ".join(words))
+
+        # table per group of digits: words of the group value followed by the scale and a space
+        self._group_tables = []
+        for idx in range(num_groups):
+            scale = num_groups - idx - 2
+            suffix = " " + scales[scale] + " " if scale >= 0 else " "
+            table = np.array([x + suffix if x else "" for x in below_thousand], dtype=object)
+            self._group_tables.append(table)
+        self._group_weights = np.array([100, 10, 1])
+
+        self._digit_by_digit = {str(value): word for value, word in digits.items()}
+        self._digit_by_digit["0"] = "o"
+
+        # ordinal suffixes that replace the ending of the last word, for ex. one -> first, twelve -> twelfth
+        self._ordinal_endings = {}
+        for name in ("digit.tsv", "teen.tsv"):
+            for ordinal, cardinal in _read_column_pairs(get_data_file_path("ordinals", name)):
+                self._ordinal_endings[cardinal] = ordinal
+
+    def verbalize_cardinals(self, numbers: Sequence[str]) -> List[Optional[str]]:
+        """
+        expands numbers into words
+
+        Parameters
+        ----------
+        numbers: Sequence[str]
+            digit strings, for ex. ["23", "1000"]
+
+        Returns
+        -------
+        expanded: List[Optional[str]]
+            numbers in words, same as cardinal_number_verbalizer.far produces,
+            or None for strings that grammar doesn't expand
+        """
+        if len(numbers) == 0:
+            return []
+        numbers = np.asarray(numbers, dtype=str)
+        lengths = np.char.str_len(numbers)
+        valid = np.char.isdigit(numbers) & (lengths <= MAX_DIGITS)
+        valid &= (lengths == 1) | ~np.char.startswith(numbers, "0")
+        padded = np.char.zfill(np.where(valid, numbers, "0").astype("<U{}".format(MAX_DIGITS)), MAX_DIGITS)
+        # unicode strings are stored as 4-byte code points, which gives array of digits
+        digits = padded.view(np.uint32).reshape(len(numbers), MAX_DIGITS) - ord("0")
+        groups = digits.reshape(len(numbers), -1, 3) @ self._group_weights
+        expanded = np.full(len(numbers), "", dtype=object)
+        for idx, table in enumerate(self._group_tables):
+            expanded = expanded + table[groups[:, idx]]
+        return [(x[:-1] if x else "zero") if ok else None for x, ok in zip(expanded, valid)]
+
+    def to_ordinal(self, cardinal: str) -> str:
+        """
+        converts expanded cardinal number into ordinal, rewriting the ending of the last word
+
+        Parameters
+        ----------
+        cardinal: str
+            number in words, for ex. "twenty one"
+
+        Returns
+        -------
+        ordinal: str
+            ordinal number in words, for ex. "twenty first"
+        """
+        for ending, ordinal in self._ordinal_endings.items():
+            if cardinal.endswith(ending):
+                return cardinal[: len(cardinal) - len(ending)] + ordinal
+        if cardinal.endswith("ty"):
+            return cardinal[:-2] + "tieth"
+        return cardinal + "th"
+
+    def verbalize_fractional(self, digits: str) -> Optional[str]:
+        """
+        expands fractional part of decimal digit by digit
+
+        Parameters
+        ----------
+        digits: str
+            digits of fractional part, for ex. "5006"
+
+        Returns
+        -------
+        expanded: Optional[str]
+            digits in words, for ex. "five o o six", or None if input is not a digit string
+        """
+        if digits == "0":
+            return "zero"
+        words = [self._digit_by_digit.get(x) for x in digits]
+        if not words or None in words:
+            return None
+        return " ".join(words)
+
+    @staticmethod
+    def _parse(serialized: str) -> Tuple[str, List[Tuple[str, str]]]:
+        """
+        helper function that splits serialized token into name of semiotic class and fields
+        """
+        parts = serialized.split("|")
+        if len(parts) < 2 or parts[-1] != "":
+            return "", []
+        fields = []
+        for part in parts[1:-1]:
+            name, sep, value = part.partition(":")
+            if not sep:
+                return "", []
+            fields.append((name, value))
+        return parts[0], fields
+
+    def verbalize_batch(self, serialized: Sequence[str]) -> List[Optional[str]]:
+        """
+        verbalizes batch of serialized tokens. Numbers of all the tokens are expanded at once.
+
+        Parameters
+        ----------
+        serialized: Sequence[str]
+            serialized tokens, for ex. `cardinal|count:23|`
+
+        Returns
+        -------
+        spoken: List[Optional[str]]
+            verbalized tokens, same as VerbalizeFst produces, or None for tokens
+            that should go through verbalization grammar
+        """
+        # layout of each token: list of words or (index of number to expand, is ordinal)
+        layouts: List[Optional[list]] = []
+        numbers: List[str] = []
+        for token in serialized:
+            layout = self._get_layout(*self._parse(token), numbers)
+            layouts.append(layout)
+        expanded = self.verbalize_cardinals(numbers)
+
+        spoken = []
+        for layout in layouts:
+            words = []
+            for item in layout or []:
+                if isinstance(item, str):
+                    words.append(item)
+                    continue
+                idx, is_ordinal = item
+                if expanded[idx] is None:
+                    words = None
+                    break
+                words.append(self.to_ordinal(expanded[idx]) if is_ordinal else expanded[idx])
+            spoken.append(" ".join(words) if layout is not None and words is not None else None)
+        return spoken
+
+    def _get_layout(self, semiotic_class: str, fields: List[Tuple[str, str]], numbers: List[str]) -> Optional[list]:
+        """
+        helper function that turns fields of numeric token into sequence of words and numbers to expand,
+        following the order in which CardinalFst, OrdinalFst and DecimalFst verbalize fields.
+        Numbers are appended to `numbers`. Returns None if token is not supported.
+        """
+        names = [name for name, _ in fields]
+        values: Dict[str, str] = dict(fields)
+        layout = []
+
+        def add_number(value: str, is_ordinal: bool = False):
+            layout.append((len(numbers), is_ordinal))
+            numbers.append(value)
+
+        if semiotic_class == "ordinal" and names == ["order"]:
+            add_number(values["order"], is_ordinal=True)
+            return layout
+
+        if names and names[0] == "prefix" and semiotic_class == "cardinal":
+            if values["prefix"] != "number":
+                return None
+            layout.append("number")
+            names = names[1:]
+        if names and names[0] == "negative":
+            if values["negative"] != "1":
+                return None
+            layout.append("minus")
+            names = names[1:]
+
+        if semiotic_class == "cardinal" and names == ["count"]:
+            add_number(values["count"])
+            return layout
+        if semiotic_class != "decimal" or not names:
+            return None
+        if names[-1] == "quantity":
+            quantity = values["quantity"]
+            if not _LOWER_RE.fullmatch(quantity):
+                return None
+            names = names[:-1]
+        else:
+            quantity = None
+        if names not in (["integer_part"], ["fractional_part"], ["integer_part", "fractional_part"]):
+            return None
+        if "integer_part" in names:
+            add_number(values["integer_part"])
+        if "fractional_part" in names:
+            fractional = self.verbalize_fractional(values["fractional_part"])
+            if fractional is None:
+                return None
+            layout.extend(["point", fractional])
+        if quantity is not None:
+            layout.append(quantity)
+        return layout
@@ -0,0 +1,177 @@
+"""
+Copyright 2022 Balacoon
+
+Normalization service that swaps grammars without restart
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.grammar_cache import get_grammars_hash, load_or_build
+from en_us_normalization.production.grammar_export import TOKENIZE_AND_CLASSIFY_FAR, VERBALIZE_FAR, load_exported_grammars
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.verbalize.verbalize import VerbalizeFst
+
+from learn_to_normalize.grammar_utils.base_fst import BaseFst
+
+# inputs that are normalized with freshly loaded grammars before they start serving
+WARMUP_TEXTS = ["hello world!", "1.30 PM", "jan. 5, 2012", "it costs $12.05 and weighs 1.5kg"]
+
+
+def get_exported_version(far_dir: str) -> str:
+    """
+    computes version of grammars exported with `export_grammars`
+
+    Parameters
+    ----------
+    far_dir: str
+        directory with exported archives
+
+    Returns
+    -------
+    version: str
+        hex digest of exported archives
+    """
+    hasher = hashlib.sha256()
+    for name in (TOKENIZE_AND_CLASSIFY_FAR, VERBALIZE_FAR):
+        with open(os.path.join(far_dir, name), "rb") as fp:
+            hasher.update(hashlib.sha256(fp.read()).digest())
+    return hasher.hexdigest()
+
+
+class ReloadableNormalizer:
+    """
+    Long-running normalizer, which can swap in new version of classification and verbalization
+    grammars while it keeps serving. New grammars are loaded (and compiled, if needed) in a background thread,
+    normalization pipeline is created and warmed up, and only then it replaces the active one.
+    Active pipeline and its version are kept in a single reference, which is replaced at once.
+    Each request takes the reference when it starts, so in-flight requests finish with the version
+    they started with and the following requests use the new version. Nothing is shared between
+    versions, old version is released once the last request that uses it is done.
+
+    Grammars are loaded either from the archives exported with `export_grammars` (version is the hash
+    of the archives) or from the compile cache, building them if needed (version is the hash of grammar sources).
+    """
+
+    def __init__(
+        self,
+        far_dir: str = None,
+        cache_dir: str = None,
+        create_normalizer: Callable[[BaseFst, BaseFst], Normalizer] = None,
+        warmup_texts: List[str] = None,
+    ):
+        """
+        constructor of reloadable normalizer. Initial grammars are loaded synchronously.
+
+        Parameters
+        ----------
+        far_dir: str
+            directory with exported grammars. If not provided, grammars are loaded from the compile cache.
+        cache_dir: str
+            directory of compile cache, used if grammars are not loaded from exported archives
+        create_normalizer: Callable[[BaseFst, BaseFst], Normalizer]
+            creates normalization pipeline from classification and verbalization grammars. Called for
+            each version, so that pipeline state (for ex. verbalization cache) is not shared between versions.
+            If not provided, default Normalizer is created.
+        warmup_texts: List[str]
+            inputs to normalize with new version before it starts serving. By default `WARMUP_TEXTS`.
+        """
+        self._far_dir = far_dir
+        self._cache_dir = cache_dir
+        self._create_normalizer = create_normalizer if create_normalizer is not None else Normalizer
+        self._warmup_texts = warmup_texts if warmup_texts is not None else WARMUP_TEXTS
+        # reloads are done one by one in the background thread
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._lock = threading.Lock()
+        self._active = self._load(far_dir)
+
+    @property
+    def version(self) -> str:
+        """
+        getter for version of the grammars that serve new requests
+        """
+        return self._active[0]
+
+    @property
+    def normalizer(self) -> Normalizer:
+        """
+        getter for active normalization pipeline. Keep the reference for the duration
+        of a request to process it entirely with the same version.
+        """
+        return self._active[1]
+
+    def _load(self, far_dir: str) -> Tuple[str, Normalizer]:
+        """
+        helper function that loads grammars, creates normalization pipeline and warms it up
+        """
+        if far_dir is not None:
+            version = get_exported_version(far_dir)
+            classify, verbalize = load_exported_grammars(far_dir)
+        else:
+            version = get_grammars_hash()
+            classify = load_or_build(ClassifyFst, cache_dir=self._cache_dir)
+            verbalize = load_or_build(VerbalizeFst, cache_dir=self._cache_dir)
+        normalizer = self._create_normalizer(classify, verbalize)
+        normalizer.normalize_batch(self._warmup_texts)
+        return version, normalizer
+
+    def _reload(self, far_dir: str) -> str:
+        """
+        helper function that loads new version and makes it active
+        """
+        with self._lock:
+            if far_dir is not None:
+                self._far_dir = far_dir
+            far_dir = self._far_dir
+        active_version = self.version
+        if far_dir is not None and get_exported_version(far_dir) == active_version:
+            logging.info("Grammars version {} is already active".format(active_version))
+            return active_version
+        loaded = self._load(far_dir)
+        if loaded[0] != active_version:
+            # single reference assignment, requests see either the old or the new version
+            self._active = loaded
+            logging.info("Switched grammars from version {} to {}".format(active_version, loaded[0]))
+        return loaded[0]
+
+    def reload(self, far_dir: str = None) -> Future:
+        """
+        starts loading new version of grammars in the background. Normalizer keeps serving
+        with active version until the new one is loaded and warmed up.
+
+        Parameters
+        ----------
+        far_dir: str
+            directory with newly exported grammars. If not provided, grammars are reloaded
+            from the same location as before: same directory or the compile cache.
+
+        Returns
+        -------
+        future: Future
+            resolves to the version that is active once reload is done.
+            If loading fails, future holds the exception and the old version stays active.
+        """
+        return self._executor.submit(self._reload, far_dir)
+
+    def normalize(self, text: str) -> str:
+        """
+        normalizes single utterance with active version of grammars
+        """
+        return self.normalizer.normalize(text)
+
+    def normalize_batch(self, texts: List[str]) -> List[str]:
+        """
+        normalizes batch of utterances, the whole batch is processed with the same version of grammars
+        """
+        return self.normalizer.normalize_batch(texts)
+
+    def close(self):
+        """
+        waits for pending reloads to finish and stops the background thread
+        """
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,146 @@
+"""
+Copyright 2022 Balacoon
+
+Splitting of input text into chunks that can be classified independently
+"""
+
+import re
+from typing import List, Optional, Set
+
+from en_us_normalization.production.english_utils import get_data_file_path
+
+from learn_to_normalize.grammar_utils.data_loader import load_csv
+
+# plain word: letters with optional inner apostrophes, hyphens or dots,
+# optionally wrapped into punctuation marks. Plain words are never a part of
+# multi-word semiotic classes on their own.
+_PLAIN_WORD_RE = re.compile(r"""^[("'“‘\[]*[^\W\d_]+(?:[-'’.][^\W\d_]+)*\.?[)"'”’\],.!?;:]*$""")
+_WORD_RE = re.compile(r"\S+")
+
+# words that are classified together with their neighbours by ShorteningFst (st -> street / saint)
+_SHORTENING_RE = re.compile(r"^(?:st|ST|St)\.?$")
+
+
+class Segmenter:
+    """
+    Splits input text at whitespace into chunks, so that each chunk can be
+    classified separately. Cost of composition with ClassifyFst and of the shortest path
+    grows with the length of the input, while most of the tokens in a sentence
+    are regular words that don't interact with each other.
+
+    Text is split only at "safe" boundaries, that no multi-word grammar can span.
+    Multi-word grammars (address, date, time, measure, money, connected tokens such as ranges)
+    always include a word which is not plain, i.e. contains digits, symbols or is a standalone
+    punctuation mark. Such words are anchors: boundaries within `lookbehind` words before an anchor
+    and within `lookahead` words after an anchor are not safe. Windows cover the longest
+    multi-word classes in the grammars: for ex. "jan. 5, 2012" or "P O Box A 123"
+    before an anchor and street, suite, town and state of an address after a house number.
+    Additionally, grammars that are triggered by letters only are treated separately:
+
+    - "st" shortening, which is expanded depending on the neighbouring words (street / saint)
+    - prefixes of roman numbers, such as "chapter" or "george"
+
+    Examples of segmentation:
+
+    - hello world, how are you? -> hello | world, | how | are | you?
+    - it costs $5 and more -> it costs $5 and more
+    """
+
+    def __init__(self, lookbehind: int = 4, lookahead: int = 20):
+        """
+        constructor of segmenter
+
+        Parameters
+        ----------
+        lookbehind: int
+            number of words before an anchor, that can be part of the same token
+        lookahead: int
+            number of words after an anchor, that can be part of the same token
+        """
+        self._lookbehind = lookbehind
+        self._lookahead = lookahead
+        self._roman_prefixes = self._load_roman_prefixes()
+
+    @property
+    def lookbehind(self) -> int:
+        """
+        getter for number of words before an anchor, that can be part of the same token
+        """
+        return self._lookbehind
+
+    @property
+    def lookahead(self) -> int:
+        """
+        getter for number of words after an anchor, that can be part of the same token
+        """
+        return self._lookahead
+
+    @staticmethod
+    def _load_roman_prefixes() -> Set[str]:
+        """
+        helper function that loads prefixes of roman numbers, i.e. words
+        that are classified together with the following word
+        """
+        prefixes = set()
+        for name in ["cardinal_prefixes.tsv", "ordinal_prefixes.tsv"]:
+            prefixes.update(x.lower() for x in load_csv(get_data_file_path("roman", name)))
+        return prefixes
+
+    def get_safe_boundaries(self, words: List[str], plain: Optional[Set[int]] = None) -> List[bool]:
+        """
+        finds boundaries between words at which text can be split
+
+        Parameters
+        ----------
+        words: List[str]
+            whitespace-separated words of the input text
+        plain: Optional[Set[int]]
+            indices of words that are not anchors, even if they contain digits or symbols,
+            for ex. whitelisted tokens, which are never part of multi-word semiotic classes
+
+        Returns
+        -------
+        safe: List[bool]
+            for each pair of consecutive words (i, i + 1) - whether the text can be split between them
+        """
+        safe = [True] * max(len(words) - 1, 0)
+        for idx, word in enumerate(words):
+            if _SHORTENING_RE.match(word):
+                start, end = idx - 1, idx + 1
+            elif word.lower() in self._roman_prefixes:
+                start, end = idx, idx + 1
+            elif not _PLAIN_WORD_RE.match(word) and (plain is None or idx not in plain):
+                start, end = idx - self._lookbehind, idx + self._lookahead
+            else:
+                continue
+            for boundary in range(max(start, 0), min(end, len(safe))):
+                safe[boundary] = False
+        return safe
+
+    def split(self, text: str) -> List[str]:
+        """
+        splits text into chunks at safe boundaries. Whitespace inside of chunks
+        is kept as is, whitespace between chunks is dropped.
+
+        Parameters
+        ----------
+        text: str
+            input text
+
+        Returns
+        -------
+        chunks: List[str]
+            chunks of the text, which can be classified independently
+        """
+        matches = list(_WORD_RE.finditer(text))
+        if not matches:
+            return []
+        safe = self.get_safe_boundaries([x.group() for x in matches])
+        chunks = []
+        start = matches[0].start()
+        for idx, is_safe in enumerate(safe):
+            if is_safe:
+                chunks.append(text[start:matches[idx].end()])
+                start = matches[idx + 1].start()
+        chunks.append(text[start:matches[-1].end()])
+        return chunks
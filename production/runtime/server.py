@@ -0,0 +1,576 @@
+"""
+Copyright 2022 Balacoon
+
+Local normalization server, that shares loaded grammars between services.
+Concurrent requests are coalesced into micro-batches. Server listens on TCP port
+or Unix socket:
+
+..
+
+    python -m en_us_normalization.production.runtime.server --far-dir grammars --port 8080
+    curl -d '{"texts": ["1.30 PM"]}' localhost:8080/normalize
+    curl localhost:8080/metrics
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from en_us_normalization.production.grammar_export import PreparedGrammar
+from en_us_normalization.production.runtime.corpus import create_normalizer, load_grammars
+from en_us_normalization.production.runtime.degraded import TIER_DEGRADED, TieredNormalizer, create_tiered_normalizer
+from en_us_normalization.production.runtime.instrumentation import Instrumentation
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.reload import WARMUP_TEXTS
+from en_us_normalization.toy.classify.classify import ClassifyFst as ToyClassifyFst
+
+# upper bounds of latency buckets in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+# upper bounds of batch size buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values, as exposed by Prometheus
+    """
+
+    def __init__(self, buckets: Sequence[float]):
+        """
+        constructor of histogram
+
+        Parameters
+        ----------
+        buckets: Sequence[float]
+            sorted upper bounds of the buckets. Values above the last bound go to `+Inf` bucket.
+        """
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        """
+        adds observed value to the histogram
+        """
+        idx = 0
+        while idx < len(self.buckets) and value > self.buckets[idx]:
+            idx += 1
+        self.counts[idx] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_prometheus(self, name: str, labels: str = "") -> List[str]:
+        """
+        formats histogram in Prometheus text exposition format
+
+        Parameters
+        ----------
+        name: str
+            name of the metric
+        labels: str
+            extra labels of the metric, for ex. `stage="classify"`
+
+        Returns
+        -------
+        lines: List[str]
+            bucket, sum and count samples
+        """
+        prefix = labels + "," if labels else ""
+        suffix = "{" + labels + "}" if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ["+Inf"], self.counts):
+            cumulative += count
+            lines.append('{}_bucket{{{}le="{}"}} {}'.format(name, prefix, bound, cumulative))
+        lines.append("{}_sum{} {}".format(name, suffix, self.sum))
+        lines.append("{}_count{} {}".format(name, suffix, self.count))
+        return lines
+
+
+class ServerMetrics(Instrumentation):
+    """
+    Metrics of the normalization server: time requests spend in the queue, size of micro-batches,
+    latency of processing stages, number of requests and texts that were deduplicated,
+    fallbacks of resource governor, switches between full and degraded tier.
+    Metrics are also instrumentation of the normalization pipelines, that records
+    latency of pipeline stages, per semiotic class for verbalization.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queue_seconds = Histogram(LATENCY_BUCKETS)
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.stage_seconds: Dict[Tuple[str, Optional[str]], Histogram] = {}
+        self.num_texts = 0
+        self.num_deduplicated = 0
+        self.fallbacks: Dict[str, int] = {}
+        self.degraded = False
+        self.tier_switches: Dict[str, int] = {}
+
+    def on_stage(self, stage: str, seconds: float, semiotic_class: Optional[str] = None):
+        """
+        records latency of the processing stage
+        """
+        key = (stage, semiotic_class)
+        with self._lock:
+            if key not in self.stage_seconds:
+                self.stage_seconds[key] = Histogram(LATENCY_BUCKETS)
+            self.stage_seconds[key].observe(seconds)
+
+    def on_fallback(self, fallback: str):
+        """
+        counts fallback of resource governor
+        """
+        with self._lock:
+            self.fallbacks[fallback] = self.fallbacks.get(fallback, 0) + 1
+
+    def on_tier_switch(self, tier: str):
+        """
+        records switch between full and degraded tier
+        """
+        with self._lock:
+            self.degraded = tier == TIER_DEGRADED
+            self.tier_switches[tier] = self.tier_switches.get(tier, 0) + 1
+
+    def observe_batch(self, queue_seconds: List[float]):
+        """
+        records micro-batch: its size and how long each text waited in the queue
+        """
+        with self._lock:
+            self.batch_size.observe(len(queue_seconds))
+            for seconds in queue_seconds:
+                self.queue_seconds.observe(seconds)
+
+    def observe_text(self, deduplicated: bool):
+        """
+        records submitted text, which is either queued or attached to identical pending text
+        """
+        with self._lock:
+            self.num_texts += 1
+            self.num_deduplicated += int(deduplicated)
+
+    def to_prometheus(self) -> str:
+        """
+        formats all the metrics in Prometheus text exposition format
+        """
+        with self._lock:
+            lines = ["# TYPE normalization_texts_total counter", "normalization_texts_total {}".format(self.num_texts)]
+            lines += [
+                "# TYPE normalization_deduplicated_total counter",
+                "normalization_deduplicated_total {}".format(self.num_deduplicated),
+            ]
+            lines.append("# TYPE normalization_fallbacks_total counter")
+            for fallback, count in sorted(self.fallbacks.items()):
+                lines.append('normalization_fallbacks_total{{fallback="{}"}} {}'.format(fallback, count))
+            lines += ["# TYPE normalization_degraded gauge", "normalization_degraded {}".format(int(self.degraded))]
+            lines.append("# TYPE normalization_tier_switches_total counter")
+            for tier, count in sorted(self.tier_switches.items()):
+                lines.append('normalization_tier_switches_total{{tier="{}"}} {}'.format(tier, count))
+            lines.append("# TYPE normalization_queue_seconds histogram")
+            lines += self.queue_seconds.to_prometheus("normalization_queue_seconds")
+            lines.append("# TYPE normalization_batch_size histogram")
+            lines += self.batch_size.to_prometheus("normalization_batch_size")
+            lines.append("# TYPE normalization_stage_seconds histogram")
+            for (stage, semiotic_class), histogram in sorted(self.stage_seconds.items(), key=lambda x: str(x[0])):
+                labels = 'stage="{}"'.format(stage)
+                if semiotic_class is not None:
+                    labels += ',semiotic_class="{}"'.format(semiotic_class)
+                lines += histogram.to_prometheus("normalization_stage_seconds", labels)
+        return "\n".join(lines) + "\n"
+
+
+class MicroBatcher:
+    """
+    Coalesces texts submitted concurrently by different callers into micro-batches.
+    Each worker thread creates its own normalization pipeline once and warms it up on `WARMUP_TEXTS`.
+    Pipelines should be created on top of grammars loaded once, see `corpus.load_grammars`,
+    so that memory doesn't grow with the number of workers.
+    Worker takes the first text from the queue and waits for more texts until either batch is full
+    (`max_batch_size`) or `max_wait` seconds passed since, then normalizes the batch at once. Identical texts are deduplicated:
+    if a text is already waiting or being normalized, caller gets result of that pending normalization.
+    If normalization of a batch fails, its texts are normalized one by one, so that only the texts
+    that fail themselves get an error.
+    If a worker fails to create its pipeline, the error is kept in `error` and batcher reports itself
+    unhealthy. Once all workers failed, pending and newly submitted texts fail with that error instead of waiting.
+    Latency of pipeline stages is recorded in metrics, unless pipeline already has its own instrumentation.
+    If pipeline is `TieredNormalizer`, it is told the queue depth before each batch,
+    so it can switch to degraded tier when queue grows.
+    """
+
+    def __init__(
+        self,
+        create_normalizer: Callable[[], Union[Normalizer, TieredNormalizer]],
+        num_workers: int = 1,
+        max_batch_size: int = 32,
+        max_wait: float = 0.005,
+        metrics: ServerMetrics = None,
+    ):
+        """
+        constructor of micro-batcher, starts worker threads
+
+        Parameters
+        ----------
+        create_normalizer: Callable[[], Union[Normalizer, TieredNormalizer]]
+            creates normalization pipeline, called once in each worker
+        num_workers: int
+            number of worker threads
+        max_batch_size: int
+            maximum number of texts normalized at once
+        max_wait: float
+            how many seconds to wait for more texts, before normalizing incomplete batch
+        metrics: ServerMetrics
+            where to record queue time, batch sizes and latency. If not provided, new one is created.
+        """
+        self._create_normalizer = create_normalizer
+        self._max_batch_size = max_batch_size
+        self._max_wait = max_wait
+        self.metrics = metrics if metrics is not None else ServerMetrics()
+        self._queue: "queue.Queue[Tuple[str, float]]" = queue.Queue()
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.error: Optional[Exception] = None
+        self._num_alive = num_workers
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(num_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, text: str) -> Future:
+        """
+        submits text for normalization
+
+        Parameters
+        ----------
+        text: str
+            utterance to normalize
+
+        Returns
+        -------
+        future: Future
+            resolves to normalized utterance
+        """
+        with self._lock:
+            if self._num_alive == 0:
+                future = Future()
+                future.set_exception(RuntimeError("No normalization workers: {}".format(self.error)))
+                return future
+            future = self._pending.get(text)
+            deduplicated = future is not None
+            if not deduplicated:
+                future = Future()
+                self._pending[text] = future
+                self._queue.put((text, time.perf_counter()))
+        self.metrics.observe_text(deduplicated)
+        return future
+
+    @property
+    def healthy(self) -> bool:
+        """
+        getter for whether all workers created their normalization pipelines
+        """
+        return self.error is None
+
+    def normalize_batch(self, texts: List[str], timeout: float = None) -> List[str]:
+        """
+        normalizes utterances, waiting for their micro-batches to be processed
+
+        Parameters
+        ----------
+        texts: List[str]
+            utterances to normalize
+        timeout: float
+            maximum number of seconds to wait for each of the utterances
+
+        Returns
+        -------
+        normalized: List[str]
+            normalized utterances
+        """
+        futures = [self.submit(x) for x in texts]
+        return [x.result(timeout) for x in futures]
+
+    def _collect_batch(self, first: Tuple[str, float]) -> List[Tuple[str, float]]:
+        """
+        helper function that waits for more texts to normalize along with the first one
+        """
+        batch = [first]
+        deadline = time.perf_counter() + self._max_wait
+        while len(batch) < self._max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # let the worker stop after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _work(self):
+        """
+        loop of the worker thread
+        """
+        try:
+            normalizer = self._create_normalizer()
+            normalizer.normalize_batch(WARMUP_TEXTS)
+        except Exception as e:  # pylint: disable=broad-except
+            self._on_load_failure(e)
+            return
+        if normalizer.instrumentation is None:
+            normalizer.instrumentation = self.metrics
+        while True:
+            first = self._queue.get()
+            if first is None:
+                # let other workers stop as well
+                self._queue.put(None)
+                break
+            batch = self._collect_batch(first)
+            if isinstance(normalizer, TieredNormalizer):
+                normalizer.observe_queue_depth(self._queue.qsize())
+            start = time.perf_counter()
+            self.metrics.observe_batch([start - enqueued for _, enqueued in batch])
+            texts = [text for text, _ in batch]
+            try:
+                normalized = normalizer.normalize_batch(texts)
+                errors = [None] * len(texts)
+            except Exception as e:  # pylint: disable=broad-except
+                logging.exception("Failed to normalize batch of {} texts".format(len(texts)))
+                if len(texts) > 1:
+                    normalized, errors = self._normalize_each(normalizer, texts)
+                else:
+                    normalized, errors = [None], [e]
+            self.metrics.on_stage("batch", time.perf_counter() - start)
+            with self._lock:
+                futures = [self._pending.pop(text) for text in texts]
+            for future, spoken, error in zip(futures, normalized, errors):
+                if error is None:
+                    future.set_result(spoken)
+                else:
+                    future.set_exception(error)
+
+    def _on_load_failure(self, error: Exception):
+        """
+        helper function that records failure of a worker to create its pipeline.
+        When the last worker fails, pending texts fail as well, since nobody is left to normalize them.
+        """
+        logging.exception("Failed to create normalization pipeline")
+        with self._lock:
+            self.error = error
+            self._num_alive -= 1
+            futures = []
+            if self._num_alive == 0:
+                futures = list(self._pending.values())
+                self._pending.clear()
+        for future in futures:
+            future.set_exception(RuntimeError("No normalization workers: {}".format(error)))
+
+    @staticmethod
+    def _normalize_each(
+        normalizer: Union[Normalizer, TieredNormalizer], texts: List[str]
+    ) -> Tuple[List[Optional[str]], List[Optional[Exception]]]:
+        """
+        helper function that normalizes texts of a failed batch one by one, so that texts
+        coalesced with a bad one don't fail along with it
+        """
+        normalized, errors = [], []
+        for text in texts:
+            try:
+                normalized.append(normalizer.normalize(text))
+                errors.append(None)
+            except Exception as e:  # pylint: disable=broad-except
+                logging.exception("Failed to normalize [{}]".format(text))
+                normalized.append(None)
+                errors.append(e)
+        return normalized, errors
+
+    def close(self):
+        """
+        stops workers once texts that are already submitted are normalized
+        """
+        self._queue.put(None)
+        for worker in self._workers:
+            worker.join()
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    HTTP server on Unix socket, handling each connection in a separate thread
+    """
+
+    daemon_threads = True
+
+
+def _make_handler(batcher: MicroBatcher, timeout: float):
+    """
+    helper function that creates request handler, serving with given micro-batcher
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def address_string(self) -> str:
+            # client address of Unix socket connections is empty
+            return str(self.client_address[0]) if self.client_address else "unix"
+
+        def _reply(self, code: int, body: bytes, content_type: str):
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _reply_json(self, code: int, data: Dict):
+            self._reply(code, json.dumps(data).encode("utf-8"), "application/json")
+
+        def do_GET(self):  # pylint: disable=invalid-name
+            if self.path == "/metrics":
+                self._reply(200, batcher.metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+            elif self.path == "/health":
+                if batcher.healthy:
+                    self._reply_json(200, {"status": "ok"})
+                else:
+                    self._reply_json(503, {"status": "unhealthy", "error": str(batcher.error)})
+            else:
+                self._reply_json(404, {"error": "Unknown path {}".format(self.path)})
+
+        def do_POST(self):  # pylint: disable=invalid-name
+            if self.path != "/normalize":
+                self._reply_json(404, {"error": "Unknown path {}".format(self.path)})
+                return
+            try:
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                single = "text" in request
+                texts = [request["text"]] if single else request["texts"]
+                if not isinstance(texts, list) or not all(isinstance(x, str) for x in texts):
+                    raise ValueError("Expected list of strings")
+            except (ValueError, KeyError, TypeError) as e:
+                self._reply_json(400, {"error": "Expected {{'text': str}} or {{'texts': [str]}}: {}".format(e)})
+                return
+            try:
+                normalized = batcher.normalize_batch(texts, timeout)
+            except Exception as e:  # pylint: disable=broad-except
+                self._reply_json(500, {"error": str(e)})
+                return
+            self._reply_json(200, {"text": normalized[0]} if single else {"texts": normalized})
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            logging.debug(format, *args)
+
+    return Handler
+
+
+def create_server(
+    batcher: MicroBatcher, host: str = "127.0.0.1", port: int = 8080, unix_socket: str = None, timeout: float = 10.0
+) -> socketserver.BaseServer:
+    """
+    creates HTTP server on top of micro-batcher. Endpoints:
+
+    - POST /normalize: `{"text": str}` or `{"texts": [str]}`, replies with the same structure
+    - GET /metrics: metrics in Prometheus text format
+    - GET /health: liveness check, 503 if workers failed to create normalization pipelines
+
+    Parameters
+    ----------
+    batcher: MicroBatcher
+        micro-batcher that normalizes texts
+    host: str
+        address to listen on
+    port: int
+        TCP port to listen on. 0 picks a free one.
+    unix_socket: str
+        path to Unix socket to listen on instead of TCP port
+    timeout: float
+        maximum number of seconds to wait for normalization of each text in a request
+
+    Returns
+    -------
+    server: socketserver.BaseServer
+        server, that handles each connection in a separate thread. Call `serve_forever` to start serving.
+    """
+    handler = _make_handler(batcher, timeout)
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        return _ThreadingUnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Serves normalization over HTTP, coalescing requests into micro-batches")
+    ap.add_argument("--far-dir", help="Directory with exported grammars. If not set, compile cache is used")
+    ap.add_argument("--cache-dir", help="Directory of compile cache")
+    ap.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    ap.add_argument("--port", type=int, default=8080, help="TCP port to listen on")
+    ap.add_argument("--unix-socket", help="Unix socket to listen on instead of TCP port")
+    ap.add_argument("--workers", type=int, default=1, help="Number of worker threads, each one loads grammars")
+    ap.add_argument("--max-batch-size", type=int, default=32, help="Maximum number of texts in a micro-batch")
+    ap.add_argument("--max-wait-ms", type=float, default=5.0, help="Maximum time to wait for micro-batch to fill")
+    ap.add_argument("--segment", action="store_true", help="Split input into chunks before classification")
+    ap.add_argument(
+        "--class-dispatch",
+        action="store_true",
+        help="Verbalize tokens only with verbalizers of their classes, exported to --far-dir",
+    )
+    ap.add_argument(
+        "--degrade-latency-ms",
+        type=float,
+        help="Latency per text that switches to degraded tier on toy grammar. If not set, latency doesn't switch tiers",
+    )
+    ap.add_argument(
+        "--degrade-queue-depth",
+        type=int,
+        help="Queue depth that switches to degraded tier on toy grammar. If not set, queue doesn't switch tiers",
+    )
+    args = ap.parse_args()
+    return args
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    # grammars are loaded once and shared by all worker threads, each worker creates its own pipeline
+    grammars = load_grammars(args.far_dir, args.cache_dir, args.class_dispatch)
+    tiered = args.degrade_latency_ms is not None or args.degrade_queue_depth is not None
+    toy_classify = PreparedGrammar("toy", ToyClassifyFst().fst) if tiered else None
+
+    def create_worker_normalizer() -> Union[Normalizer, TieredNormalizer]:
+        if not tiered:
+            return create_normalizer(grammars, args.segment)
+        return create_tiered_normalizer(
+            grammars,
+            args.segment,
+            toy_classify=toy_classify,
+            high_latency=args.degrade_latency_ms / 1000 if args.degrade_latency_ms is not None else None,
+            high_queue_depth=args.degrade_queue_depth,
+        )
+
+    batcher = MicroBatcher(
+        create_worker_normalizer,
+        num_workers=args.workers,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+    )
+    server = create_server(batcher, args.host, args.port, args.unix_socket)
+    logging.info("Serving normalization on {}".format(args.unix_socket or "{}:{}".format(args.host, args.port)))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Copyright 2022 Balacoon
+
+Normalization of text that arrives incrementally
+"""
+
+import re
+from typing import List
+
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.segment import Segmenter
+
+_WORD_RE = re.compile(r"\S+")
+
+
+class StreamingNormalizer:
+    """
+    Normalizes text that comes in pieces, for ex. from a token stream of a language model
+    or subtitles feed. Instead of waiting for the whole sentence, normalized spans are emitted
+    as soon as they can't be changed by the text that follows.
+
+    Text is split at safe boundaries as defined by `Segmenter`. A boundary is stable,
+    if it is safe and is followed by enough complete words, so that no word that arrives later
+    can be part of the same token with words before the boundary. Text before the last stable boundary
+    is normalized and emitted, the rest is held back. Held back text (lookahead) is bounded by
+    the segmenter windows rather than by sentence length, unless it contains words that keep
+    their neighbours together (numbers, symbols, etc), which is exactly when multi-token match
+    is still possible.
+
+    Examples of streaming normalization, with lookbehind of 1 word:
+
+    - "hello wor" -> nothing emitted, lookahead: "hello wor"
+    - "ld and " -> "hello", "world" emitted, lookahead: "and "
+    """
+
+    def __init__(self, normalizer: Normalizer = None, segmenter: Segmenter = None):
+        """
+        constructor of streaming normalizer
+
+        Parameters
+        ----------
+        normalizer: Normalizer
+            normalization pipeline to apply to stable spans. If not provided, default one is created.
+        segmenter: Segmenter
+            defines at which boundaries text can be split. If not provided, segmenter
+            of the normalizer is used or a default one is created.
+        """
+        if normalizer is None:
+            normalizer = Normalizer()
+        if segmenter is None:
+            segmenter = normalizer.segmenter if normalizer.segmenter is not None else Segmenter()
+        self._normalizer = normalizer
+        self._segmenter = segmenter
+        self._buffer = ""
+
+    @property
+    def lookahead(self) -> str:
+        """
+        getter for the text that is held back, because it can still be a part of multi-token match
+        """
+        return self._buffer
+
+    @property
+    def lookahead_words(self) -> int:
+        """
+        getter for number of words (including incomplete last word) that are held back
+        """
+        return len(_WORD_RE.findall(self._buffer))
+
+    def _get_stable_boundary(self) -> int:
+        """
+        helper function that finds last stable boundary in the buffer.
+        Returns index of the last word before the boundary or -1 if there is none.
+        """
+        words = _WORD_RE.findall(self._buffer)
+        if words and not self._buffer[-1].isspace():
+            # last word can be continued by the next piece of text
+            words = words[:-1]
+        # words that may follow complete words can make boundaries in lookbehind window unsafe
+        last_stable = len(words) - 1 - max(self._segmenter.lookbehind, 1)
+        safe = self._segmenter.get_safe_boundaries(words)
+        for idx in range(min(last_stable, len(safe) - 1), -1, -1):
+            if safe[idx]:
+                return idx
+        return -1
+
+    def _normalize(self, text: str) -> List[str]:
+        """
+        helper function that normalizes text chunk by chunk
+        """
+        chunks = self._segmenter.split(text)
+        return [x for x in self._normalizer.normalize_batch(chunks) if x]
+
+    def feed(self, text: str) -> List[str]:
+        """
+        adds a piece of text to the stream
+
+        Parameters
+        ----------
+        text: str
+            next piece of the input text. It can end in the middle of a word.
+
+        Returns
+        -------
+        normalized: List[str]
+            normalized spans, that became stable after this piece of text was added.
+            Spans are separated by whitespace in the input.
+        """
+        self._buffer += text
+        boundary = self._get_stable_boundary()
+        if boundary < 0:
+            return []
+        matches = list(_WORD_RE.finditer(self._buffer))
+        stable = self._buffer[: matches[boundary].end()]
+        self._buffer = self._buffer[matches[boundary + 1].start():]
+        return self._normalize(stable)
+
+    def flush(self) -> List[str]:
+        """
+        normalizes all the text that is held back, for ex. at the end of the stream
+
+        Returns
+        -------
+        normalized: List[str]
+            normalized spans of the remaining text
+        """
+        text = self._buffer
+        self._buffer = ""
+        return self._normalize(text)
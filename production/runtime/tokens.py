@@ -0,0 +1,254 @@
+"""
+Copyright 2022 Balacoon
+
+Parsing of classification output and serialization of tokens for verbalization
+"""
+
+import os
+from typing import Dict, List, Tuple
+
+from en_us_normalization.production.english_utils import get_data_dir
+from en_us_normalization.production.text_proto import TextProto, parse_text_proto
+
+# fields of semiotic classes that are boolean in protobuf definition,
+# those are serialized as "1"
+BOOL_FIELDS = ("negative",)
+
+
+class Token:
+    """
+    Single token produced by classification. Token is either a regular word,
+    which is already normalized, or a semiotic class, that needs verbalization.
+    Fields of semiotic class are flattened, i.e. field path in nested messages
+    is joined with dots, same as in verbalizer serialization spec.
+
+    Examples of tagged tokens and their parsing:
+
+    - tokens { name: "hello" right_punct: "!" } ->
+      name="hello", right_punct="!"
+    - tokens { money { currency: "$" decimal { integer_part: "12" } } } ->
+      semiotic_class="money", fields={"currency": "$", "decimal.integer_part": "12"}
+    """
+
+    def __init__(
+        self,
+        name: str = None,
+        semiotic_class: str = None,
+        fields: List[Tuple[str, str]] = None,
+        style: str = None,
+        left_punct: str = "",
+        right_punct: str = "",
+    ):
+        """
+        constructor of the token
+
+        Parameters
+        ----------
+        name: str
+            normalized word, if token is not a semiotic class
+        semiotic_class: str
+            name of semiotic class, for ex. "cardinal"
+        fields: List[Tuple[str, str]]
+            flattened fields of semiotic class
+        style: str
+            name of style to use for serialization, if provided by classification
+        left_punct: str
+            punctuation marks attached to the token on the left
+        right_punct: str
+            punctuation marks attached to the token on the right
+        """
+        self.name = name
+        self.semiotic_class = semiotic_class
+        self.fields = fields if fields is not None else []
+        self.style = style
+        self.left_punct = left_punct
+        self.right_punct = right_punct
+
+    def is_semiotic(self) -> bool:
+        """
+        checks if token needs verbalization
+        """
+        return self.semiotic_class is not None
+
+    def get_fields_dict(self) -> Dict[str, str]:
+        """
+        getter for fields of semiotic class as a dictionary
+        """
+        return dict(self.fields)
+
+    def __eq__(self, other):
+        return isinstance(other, Token) and self.__dict__ == other.__dict__
+
+    def __repr__(self):
+        return "Token({})".format(", ".join("{}={!r}".format(k, v) for k, v in self.__dict__.items() if v))
+
+
+def _flatten_fields(message: TextProto, prefix: str = "") -> Tuple[List[Tuple[str, str]], str]:
+    """
+    helper function that flattens fields of semiotic class, extracting style name
+    """
+    fields = []
+    style = None
+    for key, value in message:
+        if key == "style_spec_name":
+            style = value
+        elif isinstance(value, list):
+            nested_fields, nested_style = _flatten_fields(value, prefix + key + ".")
+            fields.extend(nested_fields)
+            style = style or nested_style
+        else:
+            fields.append((prefix + key, value))
+    return fields, style
+
+
+def parse_tokens(tagged_text: str) -> List[Token]:
+    """
+    parses output of classification grammar into tokens
+
+    Parameters
+    ----------
+    tagged_text: str
+        output of ClassifyFst, for ex. `tokens { name: "hello" } tokens { name: "world" right_punct: "!" }`
+
+    Returns
+    -------
+    tokens: List[Token]
+        parsed tokens
+    """
+    tokens = []
+    for key, message in parse_text_proto(tagged_text):
+        if key != "tokens" or not isinstance(message, list):
+            raise ValueError("Expected tokens, got [{}] in [{}]".format(key, tagged_text))
+        token = Token()
+        for field, value in message:
+            if field == "left_punct":
+                token.left_punct = value
+            elif field == "right_punct":
+                token.right_punct = value
+            elif field == "name":
+                token.name = value
+            elif isinstance(value, list):
+                token.semiotic_class = field
+                token.fields, token.style = _flatten_fields(value)
+            else:
+                raise ValueError("Unexpected field [{}] in [{}]".format(field, tagged_text))
+        tokens.append(token)
+    return tokens
+
+
+class SerializationSpec:
+    """
+    Serialization of semiotic classes for verbalization, as defined in
+    configs/verbalizer_serialization_spec.ascii_proto. For each semiotic class,
+    specification lists styles. Style defines which fields and in which order are
+    passed to verbalization. Style is picked by `style_spec_name` produced
+    by classification, otherwise the default (unnamed) style is used.
+
+    Examples of serialization:
+
+    - date { day: "5" month: "january" year: "2012" style_spec_name: "dmy" } ->
+      date|day:5|month:january|year:2012|
+    - money { currency: "$" decimal { integer_part: "12" fractional_part: "05" } } ->
+      money|integer_part:12|currency:$|fractional_part:05|currency:$|
+    """
+
+    def __init__(self, spec_path: str = None):
+        """
+        constructor of serialization specification
+
+        Parameters
+        ----------
+        spec_path: str
+            path to serialization spec. If not provided, spec from production configs is used.
+        """
+        if spec_path is None:
+            spec_path = os.path.join(os.path.dirname(get_data_dir()), "configs", "verbalizer_serialization_spec.ascii_proto")
+        with open(spec_path, "r", encoding="utf-8") as fp:
+            spec = parse_text_proto(fp.read())
+
+        # semiotic class -> style name -> list of (field path, suffix field path)
+        self._styles = {}
+        self._default_styles = {}
+        for key, class_spec in spec:
+            if key != "class_spec":
+                continue
+            semiotic_class = dict(class_spec)["semiotic_class"]
+            styles = {}
+            for class_key, style_spec in class_spec:
+                if class_key != "style_spec":
+                    continue
+                name = None
+                records = []
+                for style_key, value in style_spec:
+                    if style_key == "name":
+                        name = value
+                    elif style_key == "record_spec":
+                        records.append(self._parse_record(semiotic_class, value))
+                styles[name] = records
+            self._styles[semiotic_class] = styles
+            # unnamed style is the default one. if all styles are named - the first one
+            self._default_styles[semiotic_class] = styles[None] if None in styles else next(iter(styles.values()))
+
+    @staticmethod
+    def _parse_record(semiotic_class: str, record_spec: TextProto) -> Tuple[str, str]:
+        """
+        helper function that parses single record in style spec,
+        stripping name of semiotic class from field paths
+        """
+        field_path = None
+        suffix_path = None
+        for key, value in record_spec:
+            if key == "field_path":
+                field_path = value
+            elif key == "suffix_spec":
+                suffix_path = dict(value)["field_path"]
+        prefix = semiotic_class + "."
+        field_path = field_path[len(prefix):]
+        if suffix_path is not None:
+            suffix_path = suffix_path[len(prefix):]
+        return field_path, suffix_path
+
+    def has_class(self, semiotic_class: str) -> bool:
+        """
+        checks if semiotic class is known to serialization spec
+        """
+        return semiotic_class in self._styles
+
+    def serialize(self, token: Token) -> str:
+        """
+        serializes semiotic class for verbalization
+
+        Parameters
+        ----------
+        token: Token
+            token with semiotic class to serialize
+
+        Returns
+        -------
+        serialized: str
+            serialized token, for ex. `cardinal|count:23|`
+        """
+        if not self.has_class(token.semiotic_class):
+            raise ValueError("Unknown semiotic class [{}]".format(token.semiotic_class))
+        styles = self._styles[token.semiotic_class]
+        records = styles.get(token.style, self._default_styles[token.semiotic_class])
+        fields = token.get_fields_dict()
+        parts = [token.semiotic_class]
+        for field_path, suffix_path in records:
+            if field_path not in fields:
+                continue
+            parts.append(self._serialize_field(field_path, fields[field_path]))
+            if suffix_path is not None and suffix_path in fields:
+                parts.append(self._serialize_field(suffix_path, fields[suffix_path]))
+        return "|".join(parts) + "|"
+
+    @staticmethod
+    def _serialize_field(field_path: str, value: str) -> str:
+        """
+        helper function that serializes single field, using only
+        last element of the field path as a name
+        """
+        name = field_path.split(".")[-1]
+        if name in BOOL_FIELDS:
+            value = "1" if value == "true" else "0"
+        return "{}:{}".format(name, value)
@@ -0,0 +1,301 @@
+"""
+Copyright 2022 Balacoon
+
+Whitelist of tokens with fixed spoken form, which are tagged before classification grammar
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+from en_us_normalization.production.english_utils import get_data_file_path
+from en_us_normalization.production.runtime.segment import Segmenter
+
+# punctuation marks that can be attached to whitelisted token
+_LEFT_PUNCT = "([{'‘“"
+_RIGHT_PUNCT = ")]}'’”,.!?;:"
+_WORD_RE = re.compile(r"\S+")
+
+
+def load_whitelist_entries(path: str = None, alternatives_path: str = None) -> Dict[str, str]:
+    """
+    loads whitelisted tokens and their spoken form from tab-separated file.
+    Tokens, which have several alternative spoken forms, are excluded from the whitelist,
+    because they need context to be disambiguated (for ex. "St." -> "street" / "saint").
+
+    Parameters
+    ----------
+    path: str
+        tab-separated file with whitelisted tokens and their spoken form.
+        If not provided, data/whitelist.tsv is used.
+    alternatives_path: str
+        tab-separated file with alternative spoken forms of whitelisted tokens.
+        If not provided, data/whitelist_alternatives.tsv is used.
+
+    Returns
+    -------
+    entries: Dict[str, str]
+        mapping from whitelisted token (words are separated with single space) to its spoken form
+    """
+    if path is None:
+        path = get_data_file_path("whitelist.tsv")
+    if alternatives_path is None:
+        alternatives_path = get_data_file_path("whitelist_alternatives.tsv")
+    ambiguous = set(key for key, _ in _read_tsv(alternatives_path))
+    return {key: value for key, value in _read_tsv(path) if key not in ambiguous}
+
+
+def _read_tsv(path: str) -> List[Tuple[str, str]]:
+    """
+    helper function that reads key-value pairs from tab-separated file
+    """
+    pairs = []
+    with open(path, "r", encoding="utf-8") as fp:
+        for line in fp:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            key, value = line.split("\t")
+            pairs.append((" ".join(key.split()), value.strip()))
+    return pairs
+
+
+class Whitelist:
+    """
+    Tokens with fixed spoken form, which take priority over classification grammar,
+    for ex. "Ph.D." -> "p h d". Instead of compiling thousands of entries into
+    ClassifyFst, whitelist is kept in a prefix trie over words. Each node of the trie is a pair
+    of spoken form (if path to the node is a whitelisted token) and children, keyed by the next word.
+    This way multi-word entries ("A. B.") are matched by walking the trie word by word
+    and lookup of a word costs a single hash lookup per node.
+
+    Text is scanned left to right, at each word the longest whitelisted token is matched.
+    Matched tokens are tagged as regular words with their spoken form, the rest of the text
+    goes to classification grammar. Punctuation attached to the first or the last word of a token
+    is kept, if token is not whitelisted along with the punctuation.
+    Whitelisted tokens can be a part of multi-word semiotic classes: "PM" in "1.30 PM", "km" in "5 km"
+    or "CA" in an address. So a token is matched only if text can be split around it, i.e. boundaries
+    before and after the token are safe for the segmenter (see `Segmenter.get_safe_boundaries`).
+    Otherwise the token is left to the classification grammar along with its neighbours.
+
+    Examples of tagging:
+
+    - Ph.D. -> tokens { name: "p h d" }
+    - (A. B.) -> tokens { left_punct: "(" name: "a b" right_punct: ")" }
+    """
+
+    def __init__(self, entries: Dict[str, str] = None, segmenter: Segmenter = None):
+        """
+        constructor of the whitelist
+
+        Parameters
+        ----------
+        entries: Dict[str, str]
+            mapping from whitelisted token to its spoken form. Words of the token are separated
+            by whitespace. If not provided, entries are loaded with `load_whitelist_entries`.
+        segmenter: Segmenter
+            segmenter that defines context of multi-word semiotic classes, in which whitelisted tokens
+            are not matched. If not provided, segmenter with default context is used.
+        """
+        if entries is None:
+            entries = load_whitelist_entries()
+        self._segmenter = segmenter if segmenter is not None else Segmenter()
+        self._root: Dict[str, list] = {}
+        self._size = 0
+        self._nodes = 0
+        for key, value in entries.items():
+            self.add(key, value)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def num_nodes(self) -> int:
+        """
+        getter for number of nodes in the trie
+        """
+        return self._nodes
+
+    def add(self, key: str, value: str):
+        """
+        adds token to the whitelist
+
+        Parameters
+        ----------
+        key: str
+            whitelisted token, may consist of several words
+        value: str
+            spoken form of the token
+        """
+        words = key.split()
+        if not words:
+            raise ValueError("Can't whitelist empty token")
+        children = self._root
+        node = None
+        for word in words:
+            if children is None:
+                children = node[1] = {}
+            node = children.get(word)
+            if node is None:
+                node = children[word] = [None, None]
+                self._nodes += 1
+            children = node[1]
+        if node[0] is None:
+            self._size += 1
+        node[0] = value
+
+    def get(self, token: str) -> Optional[str]:
+        """
+        looks up spoken form of the token
+
+        Parameters
+        ----------
+        token: str
+            token to look up, may consist of several words
+
+        Returns
+        -------
+        value: Optional[str]
+            spoken form of the token or None if token is not whitelisted
+        """
+        words = token.split()
+        match = self.match(words) if words else None
+        if match is None or match[0] != len(words):
+            return None
+        return match[1]
+
+    def match(self, words: List[str], start: int = 0) -> Optional[Tuple[int, str]]:
+        """
+        finds the longest whitelisted token that starts at given word
+
+        Parameters
+        ----------
+        words: List[str]
+            words of the text
+        start: int
+            index of the word to start matching from
+
+        Returns
+        -------
+        match: Optional[Tuple[int, str]]
+            number of words in matched token and its spoken form, or None if there is no match
+        """
+        children = self._root
+        match = None
+        for idx in range(start, len(words)):
+            node = children.get(words[idx])
+            if node is None:
+                break
+            if node[0] is not None:
+                match = (idx - start + 1, node[0])
+            children = node[1]
+            if children is None:
+                break
+        return match
+
+    def _match_with_punct(self, words: List[str], start: int) -> Optional[Tuple[int, str, str, str]]:
+        """
+        helper function that finds the longest whitelisted token that starts at given word,
+        letting punctuation be attached to its first and last word.
+        Returns number of words, spoken form, left and right punctuation.
+        """
+        first = words[start]
+        core = first.lstrip(_LEFT_PUNCT)
+        if core and core != first:
+            match = self._walk(words, start, core, first[: len(first) - len(core)])
+            if match is not None:
+                return match
+        return self._walk(words, start, first, "")
+
+    def _walk(self, words: List[str], start: int, first: str, left: str) -> Optional[Tuple[int, str, str, str]]:
+        """
+        helper function that walks the trie along the words, trying the last word
+        both with and without punctuation on the right
+        """
+        children = self._root
+        match = None
+        for idx in range(start, len(words)):
+            word = first if idx == start else words[idx]
+            # strip punctuation mark by mark, whitelisted token itself may end with one, for ex. "Ph.D."
+            end = len(word)
+            while end > 1 and word[end - 1] in _RIGHT_PUNCT:
+                end -= 1
+                node = children.get(word[:end])
+                if node is not None and node[0] is not None:
+                    match = (idx - start + 1, node[0], left, word[end:])
+                    break
+            node = children.get(word)
+            if node is None:
+                break
+            if node[0] is not None:
+                match = (idx - start + 1, node[0], left, "")
+            children = node[1]
+            if children is None:
+                break
+        return match
+
+    def tag(self, text: str) -> List[Tuple[str, Optional[str]]]:
+        """
+        tags whitelisted tokens in the text
+
+        Parameters
+        ----------
+        text: str
+            input text
+
+        Returns
+        -------
+        pieces: List[Tuple[str, Optional[str]]]
+            text split into pieces. Whitelisted tokens are paired with their tagged form
+            (`tokens { name: "..." }`), the rest of the text between them is paired with None,
+            i.e. it should be tagged with classification grammar.
+        """
+        words = _WORD_RE.findall(text)
+        pieces = []
+        rest = []
+        idx = 0
+        while idx < len(words):
+            match = self._match_with_punct(words, idx)
+            if match is not None and not self._is_separable(words, idx, match[0]):
+                match = None
+            if match is None:
+                rest.append(words[idx])
+                idx += 1
+                continue
+            num_words, value, left, right = match
+            if rest:
+                pieces.append((" ".join(rest), None))
+                rest = []
+            pieces.append((" ".join(words[idx: idx + num_words]), self._get_tagged(value, left, right)))
+            idx += num_words
+        if rest:
+            pieces.append((" ".join(rest), None))
+        return pieces
+
+    def _is_separable(self, words: List[str], start: int, num_words: int) -> bool:
+        """
+        helper function that checks if whitelisted token can be split off the text, i.e. none of
+        the neighbouring words can be classified together with it. Words of the token itself are not anchors,
+        since whitelist takes priority over classification grammar. Only words that can affect boundaries
+        around the token are checked.
+        """
+        margin = max(self._segmenter.lookbehind, self._segmenter.lookahead) + 1
+        offset = max(start - margin, 0)
+        window = words[offset: start + num_words + margin]
+        first = start - offset
+        safe = self._segmenter.get_safe_boundaries(window, plain=set(range(first, first + num_words)))
+        before, after = first - 1, first + num_words - 1
+        return (before < 0 or safe[before]) and (after >= len(safe) or safe[after])
+
+    @staticmethod
+    def _get_tagged(value: str, left: str, right: str) -> str:
+        """
+        helper function that formats whitelisted token same as ClassifyFst formats regular words
+        """
+        fields = []
+        if left:
+            fields.append('left_punct: "{}"'.format(left))
+        fields.append('name: "{}"'.format(value))
+        if right:
+            fields.append('right_punct: "{}"'.format(right))
+        return "tokens {{ {} }}".format(" ".join(fields))
+
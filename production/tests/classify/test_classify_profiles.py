@@ -0,0 +1,68 @@
+# Copyright 2022 Balacoon
+
+import os
+
+import pytest
+from en_us_normalization.production.classify.classify import CLASSIFY_UNION, ClassifyFst, get_profile_classes
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+# inputs from tests of semiotic classes. Each of those classes is tagged with its own name
+CLASS_INPUTS = {
+    "address": ["1599 Curabitur Rd. Bandera South Dakota 45149"],
+    "cardinal": ["1231", "No 1"],
+    "date": ["jan. 5, 2012", "5 january 2012"],
+    "decimal": ["-23.45", "13.5k"],
+    "electronic": ["balacoon@gmail.com", "https://google.ua"],
+    "fraction": ["25 1/2", "3/4"],
+    "measure": ["-12kg", "1.5kg"],
+    "money": ["$12.05", "£100,000"],
+    "ordinal": ["13th", "23rd"],
+    "roman": ["CHAPTER XI", "George II"],
+    "telephone": ["+1 123-123-5678-1"],
+    "time": ["12:30 a.m. est", "1.30 PM"],
+}
+
+
+def _get_full_grammar():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    return loader.get_grammar("classify.classify", "ClassifyFst")
+
+
+@pytest.mark.parametrize("profile", ["chat", "audiobook"])
+def test_profile(profile):
+    full = _get_full_grammar()
+    grammar = ClassifyFst(profile=profile)
+    enabled = get_profile_classes(profile)
+    assert grammar.enabled_classes == enabled
+    disabled = [x for x in CLASS_INPUTS if x not in enabled]
+    assert disabled, "profile is expected to disable some of the classes"
+    for semiotic_class, inputs in CLASS_INPUTS.items():
+        for text in inputs:
+            expected = full.apply(text)
+            if any("{} {{".format(x) in expected for x in disabled):
+                # input is handled by disabled class in full grammar, it should be handled differently
+                result = grammar.apply(text)
+                assert not any("{} {{".format(x) in result for x in disabled)
+            else:
+                # classes that stay enabled behave exactly as in full grammar
+                assert grammar.apply(text) == expected
+    assert grammar.apply("hello world!") == full.apply("hello world!")
+
+
+def test_classes():
+    grammar = ClassifyFst(classes=["cardinal", "word", "verbatim"])
+    assert grammar.enabled_classes == ["cardinal", "word", "verbatim"]
+    assert grammar.apply("1231") == 'tokens { cardinal { count: "1231" } }'
+    assert "date {" not in grammar.apply("jan. 5, 2012")
+    with pytest.raises(ValueError):
+        ClassifyFst(classes=["cardinal"])
+    with pytest.raises(ValueError):
+        ClassifyFst(classes=["cardinal", "word", "verbatim", "unknown"])
+    with pytest.raises(ValueError):
+        get_profile_classes("unknown")
+
+
+def test_full_profile():
+    assert get_profile_classes("full") == [name for name, _ in CLASSIFY_UNION]
@@ -0,0 +1,58 @@
+# Copyright 2022 Balacoon
+
+import asyncio
+import os
+
+import pytest
+from en_us_normalization.production.grammar_export import export_grammars
+from en_us_normalization.production.runtime.async_normalizer import AsyncNormalizer, OverloadedError
+from en_us_normalization.production.runtime.normalizer import Normalizer
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+TEXTS = ["hello world!", "1.30 PM", "jan. 5, 2012", "it costs $12.05"]
+
+
+def _export_grammars(far_dir: str) -> Normalizer:
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    export_grammars(far_dir, classify=classify, verbalize=verbalize)
+    return Normalizer(classify, verbalize)
+
+
+def test_async_normalizer(tmp_path):
+    far_dir = str(tmp_path)
+    expected = _export_grammars(far_dir).normalize_batch(TEXTS)
+
+    async def run():
+        async with AsyncNormalizer(far_dir=far_dir, num_workers=2) as normalizer:
+            normalized = await asyncio.gather(*[normalizer.normalize(x) for x in TEXTS])
+            assert list(normalized) == expected
+            assert await normalizer.normalize_batch(TEXTS) == expected
+            assert normalizer.in_flight == 0 and normalizer.queue_depth == 0
+
+    asyncio.run(run())
+
+
+def test_backpressure(tmp_path):
+    far_dir = str(tmp_path)
+    _export_grammars(far_dir)
+
+    async def run():
+        async with AsyncNormalizer(far_dir=far_dir, num_workers=1, max_queue=1) as normalizer:
+            # one request is processed, one waits and the last one is rejected
+            results = await asyncio.gather(*[normalizer.normalize(x) for x in TEXTS[:3]], return_exceptions=True)
+            assert isinstance(results[2], OverloadedError)
+            assert normalizer.num_rejected == 1
+
+            # cancelled request frees its slot
+            task = asyncio.ensure_future(normalizer.normalize(TEXTS[0]))
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            assert await normalizer.normalize(TEXTS[1]) == results[1]
+
+    asyncio.run(run())
@@ -0,0 +1,45 @@
+# Copyright 2022 Balacoon
+
+import os
+
+from en_us_normalization.production.runtime.cache import LRUCache
+from en_us_normalization.production.runtime.normalizer import Normalizer
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+
+def test_lru_cache():
+    cache = LRUCache(max_entries=2)
+    cache.put("cardinal|count:1|", "one")
+    cache.put("cardinal|count:2|", "two")
+    assert cache.get("cardinal|count:1|") == "one"
+    # least recently used entry is evicted
+    cache.put("cardinal|count:3|", "three")
+    assert cache.get("cardinal|count:2|") is None
+    assert cache.get("cardinal|count:3|") == "three"
+    assert cache.get_stats() == {"hits": 2, "misses": 1, "evictions": 1, "entries": 2, "bytes": 42}
+
+
+def test_lru_cache_bytes():
+    cache = LRUCache(max_entries=100, max_bytes=25)
+    cache.put("cardinal|count:1|", "one")
+    cache.put("cardinal|count:2|", "two")
+    assert len(cache) == 1
+    assert cache.get("cardinal|count:2|") == "two"
+    # entry that doesn't fit on its own is not stored
+    cache.put("cardinal|count:1000000|", "one million")
+    assert cache.get("cardinal|count:1000000|") is None
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_normalizer_cache():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    normalizer = Normalizer(classify, verbalize, verbalize_cache=LRUCache(max_entries=10))
+    assert normalizer.normalize("1.30 PM") == "one thirty PM"
+    assert normalizer.normalize("1.30 PM") == "one thirty PM"
+    stats = normalizer.verbalize_cache.get_stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
@@ -0,0 +1,63 @@
+# Copyright 2022 Balacoon
+
+import os
+
+import pytest
+from en_us_normalization.production.grammar_export import export_class_verbalizers, export_grammars
+from en_us_normalization.production.runtime.corpus import get_resume_offset, load_grammars, normalize_corpus
+from en_us_normalization.production.runtime.normalizer import Normalizer
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+CORPUS = ["hello world!", "1.30 PM", "", "jan. 5, 2012", "1.30", "hello world!", "it costs $12.05"] * 3
+
+
+def _export_grammars(far_dir: str) -> Normalizer:
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    export_grammars(far_dir, classify=classify, verbalize=verbalize)
+    return Normalizer(classify, verbalize)
+
+
+def test_normalize_corpus(tmp_path):
+    far_dir = str(tmp_path / "far")
+    normalizer = _export_grammars(far_dir)
+    expected = normalizer.normalize_batch(CORPUS)
+    input_path = str(tmp_path / "input.txt")
+    with open(input_path, "w", encoding="utf-8") as fp:
+        fp.write("".join(x + "\n" for x in CORPUS))
+
+    output_path = str(tmp_path / "output.txt")
+    stats = normalize_corpus(input_path, output_path, far_dir=far_dir, num_workers=2, shard_size=4)
+    with open(output_path, "r", encoding="utf-8") as fp:
+        assert fp.read().splitlines() == expected
+    assert [x.first_line for x in stats] == list(range(0, len(CORPUS), 4))
+    assert sum(x.num_lines for x in stats) == len(CORPUS)
+
+    # interrupted normalization, last line is written partially
+    with open(output_path, "w", encoding="utf-8") as fp:
+        fp.write("".join(x + "\n" for x in expected[:8]) + expected[8][:3])
+    assert get_resume_offset(output_path) == 8
+    stats = normalize_corpus(input_path, output_path, far_dir=far_dir, num_workers=2, shard_size=4)
+    with open(output_path, "r", encoding="utf-8") as fp:
+        assert fp.read().splitlines() == expected
+    assert stats[0].first_line == 8
+
+
+def test_class_dispatch(tmp_path):
+    far_dir = str(tmp_path / "far")
+    normalizer = _export_grammars(far_dir)
+    export_class_verbalizers(far_dir)
+    input_path = str(tmp_path / "input.txt")
+    with open(input_path, "w", encoding="utf-8") as fp:
+        fp.write("".join(x + "\n" for x in CORPUS))
+
+    output_path = str(tmp_path / "output.txt")
+    normalize_corpus(input_path, output_path, far_dir=far_dir, num_workers=2, shard_size=4, class_dispatch=True)
+    with open(output_path, "r", encoding="utf-8") as fp:
+        assert fp.read().splitlines() == normalizer.normalize_batch(CORPUS)
+    # verbalizers of semiotic classes are not compiled on demand
+    with pytest.raises(ValueError):
+        load_grammars(class_dispatch=True)
@@ -0,0 +1,95 @@
+# Copyright 2022 Balacoon
+
+import os
+import time
+
+from en_us_normalization.production.runtime.degraded import (
+    TIER_DEGRADED,
+    TIER_FULL,
+    Hysteresis,
+    TieredNormalizer,
+    create_degraded_normalizer,
+)
+from en_us_normalization.production.runtime.instrumentation import Instrumentation
+from en_us_normalization.production.runtime.normalizer import Normalizer
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+
+class TierRecorder(Instrumentation):
+    def __init__(self):
+        self.tiers = []
+
+    def on_tier_switch(self, tier):
+        self.tiers.append(tier)
+
+
+def test_hysteresis():
+    trigger = Hysteresis(high=10, low=5)
+    assert [trigger.update(x) for x in [7, 10, 7, 5, 7]] == [False, True, True, False, False]
+
+
+def test_tiered_normalizer():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    full = Normalizer(classify, verbalize)
+    degraded = create_degraded_normalizer(verbalize)
+
+    # degraded tier still verbalizes words and digits with production verbalizer
+    assert degraded.normalize("hello 123") == full.normalize("hello 123")
+
+    recorder = TierRecorder()
+    normalizer = TieredNormalizer(
+        full, degraded, high_queue_depth=10, low_queue_depth=2, min_degraded_seconds=0.0
+    )
+    normalizer.instrumentation = recorder
+    assert normalizer.tier == TIER_FULL
+    normalizer.observe_queue_depth(20)
+    assert normalizer.tier == TIER_DEGRADED
+    assert normalizer.normalize("hello 123") == full.normalize("hello 123")
+    # queue shrinks, but not enough to switch back
+    normalizer.observe_queue_depth(5)
+    assert normalizer.tier == TIER_DEGRADED
+    normalizer.observe_queue_depth(1)
+    assert normalizer.tier == TIER_FULL
+    assert recorder.tiers == [TIER_DEGRADED, TIER_FULL]
+    assert normalizer.num_switches == 2
+
+    # tier can be chosen per request
+    assert normalizer.normalize("1.30 PM", tier=TIER_FULL) == full.normalize("1.30 PM")
+    assert normalizer.normalize("1.30 PM", tier=TIER_DEGRADED) == degraded.normalize("1.30 PM")
+    assert normalizer.tier == TIER_FULL
+
+
+class SleepingNormalizer:
+    """
+    pipeline that takes given time per utterance
+    """
+
+    instrumentation = None
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def normalize_batch(self, texts):
+        time.sleep(self.seconds * len(texts))
+        return texts
+
+
+def test_latency_of_full_tier():
+    full = SleepingNormalizer(0.02)
+    normalizer = TieredNormalizer(
+        full, SleepingNormalizer(0.0), high_latency=0.01, min_degraded_seconds=0.2, smoothing=1.0
+    )
+    normalizer.normalize("hello")
+    assert normalizer.tier == TIER_DEGRADED
+    # fast degraded tier doesn't switch normalizer back
+    normalizer.normalize("hello")
+    assert normalizer.tier == TIER_DEGRADED
+    # once full tier is fast again, probe switches normalizer back
+    full.seconds = 0.0
+    time.sleep(0.2)
+    normalizer.normalize("hello")
+    assert normalizer.tier == TIER_FULL
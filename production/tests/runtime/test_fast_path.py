@@ -0,0 +1,46 @@
+# Copyright 2022 Balacoon
+
+import os
+
+from en_us_normalization.production.runtime.fast_path import PlainWordFastPath, verify_fast_path
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.segment import Segmenter
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+CORPUS = [
+    "hello world, how are you doing today?",
+    "mrs smith and dr watson met at st peter church",
+    "the fbi and nasa have ii offices in chapter iv of the book",
+    "it costs $12.05 and weighs 1.5kg, which is ok for etc",
+]
+
+
+def _get_grammars():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    conflicts = loader.get_grammar("classify.plain_word", "PlainWordConflictsFst")
+    return classify, verbalize, conflicts
+
+
+def test_fast_path():
+    classify, verbalize, conflicts = _get_grammars()
+    fast_path = PlainWordFastPath(conflicts)
+    assert fast_path.classify("hello") == 'tokens { name: "hello" }'
+    assert fast_path.classify("hello") == classify.apply("hello")
+    # words that other classifiers accept, go to the grammar
+    assert fast_path.classify("mrs") is None
+    # not plain words
+    assert fast_path.classify("Hello") is None
+    assert fast_path.classify("hello,") is None
+    assert fast_path.classify("1.30") is None
+    assert fast_path.classify("hello world") is None
+
+    # both paths tag words of the corpus identically
+    assert verify_fast_path(fast_path, classify, CORPUS) == []
+
+    normalizer = Normalizer(classify, verbalize)
+    fast_normalizer = Normalizer(classify, verbalize, segmenter=Segmenter(), fast_path=fast_path)
+    assert fast_normalizer.normalize_batch(CORPUS) == normalizer.normalize_batch(CORPUS)
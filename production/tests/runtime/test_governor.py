@@ -0,0 +1,61 @@
+# Copyright 2022 Balacoon
+
+import os
+
+from en_us_normalization.production.runtime.governor import ResourceGovernor
+from en_us_normalization.production.runtime.instrumentation import Instrumentation
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.tokens import Token, parse_tokens
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+
+class FallbackRecorder(Instrumentation):
+    def __init__(self):
+        self.fallbacks = []
+
+    def on_fallback(self, fallback):
+        self.fallbacks.append(fallback)
+
+
+def _get_grammars():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    return classify, verbalize
+
+
+def test_governor():
+    classify, verbalize = _get_grammars()
+    expected = Normalizer(classify, verbalize).normalize_batch(["hello world", "1.30 PM"])
+
+    # inputs within budgets are classified as usual
+    governor = ResourceGovernor(max_seconds=10.0, max_chars=100)
+    normalizer = Normalizer(classify, verbalize, governor=governor)
+    assert normalizer.normalize_batch(["hello world", "1.30 PM"]) == expected
+    assert not governor.fallback_counts
+
+    # long input is classified chunk by chunk, too long chunk is classified with toy grammar or kept as is
+    recorder = FallbackRecorder()
+    governor = ResourceGovernor(max_chars=20)
+    normalizer = Normalizer(classify, verbalize, governor=governor, instrumentation=recorder)
+    long_token = "x" * 50
+    normalized = normalizer.normalize("hello world and some more words " + long_token)
+    assert normalized.startswith("hello world and some more words")
+    assert recorder.fallbacks[0] == "chunks"
+    assert recorder.fallbacks[1] in ("toy", "verbatim")
+    assert governor.fallback_counts["chunks"] == 1
+
+    # request out of time is not classified with the grammar
+    governor = ResourceGovernor(max_seconds=0.0, fallbacks=["chunks"])
+    normalizer = Normalizer(classify, verbalize, governor=governor)
+    assert normalizer.normalize("hello 1.30 PM") == "hello 1.30 PM"
+    assert governor.fallback_counts["verbatim"] == 3
+
+
+def test_tag_verbatim():
+    assert ResourceGovernor.tag_verbatim('say "hi"') == 'tokens { name: "say" } tokens { name: "\\"hi\\"" }'
+    # escaped the same way as by grammars, so that tagged text is parsed back
+    tagged = ResourceGovernor.tag_verbatim('c:\\windows a\\ "b"}')
+    assert parse_tokens(tagged) == [Token(name="c:\\windows"), Token(name="a\\"), Token(name='"b"}')]
@@ -0,0 +1,43 @@
+# Copyright 2022 Balacoon
+
+import os
+
+from en_us_normalization.production.runtime.instrumentation import Instrumentation
+from en_us_normalization.production.runtime.normalizer import Normalizer
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+
+class RecordingInstrumentation(Instrumentation):
+    def __init__(self):
+        self.stages = []
+        self.requests = []
+
+    def on_stage(self, stage, seconds, semiotic_class=None):
+        assert seconds >= 0
+        self.stages.append((stage, semiotic_class))
+
+    def on_request(self, num_texts, num_chars, num_tokens, seconds):
+        self.requests.append((num_texts, num_chars, num_tokens))
+
+
+def test_instrumentation():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    texts = ["hello world!", "1.30 PM", "hello world!"]
+    expected = Normalizer(classify, verbalize).normalize_batch(texts)
+
+    instrumentation = RecordingInstrumentation()
+    normalizer = Normalizer(classify, verbalize, instrumentation=instrumentation)
+    assert normalizer.normalize_batch(texts) == expected
+    # each distinct text is classified, parsed and serialized once
+    for stage in ["classify", "parse", "serialize"]:
+        assert instrumentation.stages.count((stage, None)) == 2
+    assert ("verbalize", "time") in instrumentation.stages
+    assert len(instrumentation.requests) == 1
+    num_texts, num_chars, num_tokens = instrumentation.requests[0]
+    assert (num_texts, num_chars) == (3, sum(len(x) for x in texts))
+    # "hello world!" is split into two tokens
+    assert num_tokens >= 2 + 1 + 2
@@ -0,0 +1,55 @@
+# Copyright 2022 Balacoon
+
+import os
+
+import pytest
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.runtime.lookup import VocabularyLookup, verify_lookup
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.segment import Segmenter
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+CORPUS = [
+    "Mrs. Smith and Dr. Watson met the FBI agents",
+    "NASA's rocket is ready, isn't it",
+    "hello world how are you doing today",
+    # vocabulary tokens with punctuation attached
+    "I work for the FBI, and you?",
+    "it was built by NASA.",
+    "pens, pencils (and so on etc.)",
+    "(FBI) agents and “NASA” said: Mrs., 'em",
+]
+
+
+def _get_grammars():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    vocabulary = loader.get_grammar("classify.vocabulary", "VocabularyFst")
+    return classify, vocabulary
+
+
+def test_lookup():
+    classify, vocabulary = _get_grammars()
+    lookup = VocabularyLookup(classify, vocabulary)
+    assert len(lookup) > 0
+    assert "Mrs." in lookup
+    assert "NASA's" in lookup
+    for token in ["Mrs.", "FBI", "NASA's"]:
+        assert lookup.classify(token) == classify.apply(token)
+    # tokens that are not in vocabularies go to the grammar
+    assert lookup.classify("hello") is None
+    assert lookup.classify("Mrs. Smith") is None
+    # punctuation is stripped and attached to the tagged token
+    for token in ["FBI,", "NASA.", "etc.)", "(Mrs.", '"FBI"']:
+        assert lookup.classify(token) == classify.apply(token)
+    assert lookup.classify("hello,") is None
+
+    # reduced grammar relies on lookup for vocabulary tokens
+    reduced = ClassifyFst(vocabulary=False)
+    normalizer = Normalizer(classify=reduced, segmenter=Segmenter(), vocabulary_lookup=lookup)
+    assert verify_lookup(normalizer, classify, CORPUS) == []
+    # lookup tags whole chunks, so it is not applied to unsegmented text
+    with pytest.raises(ValueError):
+        Normalizer(classify=reduced, vocabulary_lookup=lookup)
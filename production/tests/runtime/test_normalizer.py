@@ -0,0 +1,73 @@
+# Copyright 2022 Balacoon
+
+import os
+
+from en_us_normalization.production.grammar_export import ClassVerbalizers
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.segment import Segmenter
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+
+def _get_normalizer() -> Normalizer:
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    return Normalizer(classify, verbalize)
+
+
+def test_normalize():
+    normalizer = _get_normalizer()
+    assert normalizer.normalize("hello world!") == "hello world!"
+    assert normalizer.normalize("1.30") == "one point three o"
+    assert normalizer.normalize("1.30 PM") == "one thirty PM"
+    assert normalizer.normalize("   ") == ""
+
+
+def test_normalize_batch():
+    normalizer = _get_normalizer()
+    texts = ["hello world!", "1.30 PM", "hello world!", "1.30", "1.30 PM"]
+    assert normalizer.normalize_batch(texts) == [normalizer.normalize(x) for x in texts]
+    assert normalizer.normalize_batch([]) == []
+    # backslashes are escaped by grammars, except for paths of urls, where they are kept as is
+    assert normalizer.normalize_batch(["hello world!", "\\", "http://a.com/x\\y", "http://a.com/x\\"]) == [
+        "hello world!",
+        "backslash",
+        "HTTP a dot com slash X backslash Y",
+        "HTTP a dot com slash X backslash",
+    ]
+
+
+class BrokenChunkNormalizer(Normalizer):
+    """
+    normalizer, which classification of chunks with digits can't be parsed
+    """
+
+    def _classify_chunk(self, chunk, budget=None):
+        if any(x.isdigit() for x in chunk):
+            return 'tokens { name: "' + chunk
+        return super()._classify_chunk(chunk, budget)
+
+
+def test_parse_failure():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    normalizer = BrokenChunkNormalizer(classify, verbalize, segmenter=Segmenter())
+    # only the chunk that fails to parse is kept as is
+    texts = ["Dr. Smith came home late and it was 5 now", "hello world!"]
+    assert normalizer.normalize_batch(texts) == ["doctor smith came home late and it was 5 now", "hello world!"]
+
+
+def test_class_dispatch():
+    normalizer = _get_normalizer()
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    classify = GrammarLoader(grammars_dir).get_grammar("classify.classify", "ClassifyFst")
+    verbalizers = ClassVerbalizers()
+    dispatched = Normalizer(classify, class_verbalizers=verbalizers)
+    texts = ["hello world!", "1.30 PM", "1.30", "it costs $12.05"]
+    assert dispatched.normalize_batch(texts) == normalizer.normalize_batch(texts)
+    # only verbalizers of the classes that occurred are built
+    assert "telephone" not in verbalizers.loaded
@@ -0,0 +1,63 @@
+# Copyright 2022 Balacoon
+
+import os
+
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.numeric import NumericVerbalizer
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+TOKENS = [
+    "cardinal|count:0|",
+    "cardinal|count:23|",
+    "cardinal|negative:1|count:1000001|",
+    "cardinal|prefix:number|count:21|",
+    "cardinal|count:999999999999999|",
+    "ordinal|order:1|",
+    "ordinal|order:12|",
+    "ordinal|order:13|",
+    "ordinal|order:20|",
+    "ordinal|order:100|",
+    "ordinal|order:1000000|",
+    "decimal|negative:1|integer_part:12|fractional_part:5006|",
+    "decimal|fractional_part:0|",
+    "decimal|integer_part:0|fractional_part:05|",
+    "decimal|integer_part:13|fractional_part:5|quantity:million|",
+]
+
+
+def _get_grammars():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    return classify, verbalize
+
+
+def test_numeric_cardinals():
+    numeric = NumericVerbalizer()
+    assert numeric.verbalize_cardinals(["0", "7", "110", "12345"]) == [
+        "zero",
+        "seven",
+        "one hundred ten",
+        "twelve thousand three hundred forty five",
+    ]
+    # numbers that grammar doesn't expand
+    assert numeric.verbalize_cardinals(["007", "1" * 16, "12a"]) == [None, None, None]
+
+
+def test_numeric_matches_grammar():
+    _, verbalize = _get_grammars()
+    numeric = NumericVerbalizer()
+    spoken = numeric.verbalize_batch(TOKENS)
+    assert spoken == [verbalize.apply(x) for x in TOKENS]
+    # tokens that are not supported go to the grammar
+    assert numeric.verbalize_batch(["money|currency:$|", "cardinal|count:007|"]) == [None, None]
+
+
+def test_numeric_normalizer():
+    classify, verbalize = _get_grammars()
+    texts = ["it costs 1234 and weighs 1.5kg", "the 21st of 300 runners"]
+    normalizer = Normalizer(classify, verbalize)
+    numeric_normalizer = Normalizer(classify, verbalize, numeric_verbalizer=NumericVerbalizer())
+    assert numeric_normalizer.normalize_batch(texts) == normalizer.normalize_batch(texts)
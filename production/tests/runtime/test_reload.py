@@ -0,0 +1,43 @@
+# Copyright 2022 Balacoon
+
+import os
+
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.grammar_export import export_grammars
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.reload import ReloadableNormalizer, get_exported_version
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+TEXTS = ["hello world!", "1.30 PM", "it costs $12.05"]
+
+
+def test_reload(tmp_path):
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    reduced = ClassifyFst(classes=["cardinal", "word", "verbatim"])
+    old_dir, new_dir = str(tmp_path / "old"), str(tmp_path / "new")
+    export_grammars(old_dir, classify=classify, verbalize=verbalize)
+    export_grammars(new_dir, classify=reduced, verbalize=verbalize)
+
+    normalizer = ReloadableNormalizer(far_dir=old_dir)
+    assert normalizer.version == get_exported_version(old_dir)
+    old_expected = Normalizer(classify, verbalize).normalize_batch(TEXTS)
+    assert normalizer.normalize_batch(TEXTS) == old_expected
+
+    # request that started before the swap keeps the old version
+    in_flight = normalizer.normalizer
+    new_version = normalizer.reload(new_dir).result()
+    assert new_version == get_exported_version(new_dir) != get_exported_version(old_dir)
+    assert normalizer.version == new_version
+    assert normalizer.normalizer is not in_flight
+    assert in_flight.normalize_batch(TEXTS) == old_expected
+    assert normalizer.normalize_batch(TEXTS) == Normalizer(reduced, verbalize).normalize_batch(TEXTS)
+
+    # reloading the same archives keeps active pipeline
+    active = normalizer.normalizer
+    assert normalizer.reload().result() == new_version
+    assert normalizer.normalizer is active
+    normalizer.close()
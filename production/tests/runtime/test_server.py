@@ -0,0 +1,116 @@
+# Copyright 2022 Balacoon
+
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from en_us_normalization.production.grammar_export import export_grammars
+from en_us_normalization.production.runtime.corpus import load_normalizer
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.server import MicroBatcher, create_server
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+TEXTS = ["hello world!", "1.30 PM", "jan. 5, 2012", "1.30 PM", "it costs $12.05"]
+
+
+def test_server(tmp_path):
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    far_dir = str(tmp_path)
+    export_grammars(far_dir, classify=classify, verbalize=verbalize)
+    expected = Normalizer(classify, verbalize).normalize_batch(TEXTS)
+
+    batcher = MicroBatcher(lambda: load_normalizer(far_dir), num_workers=2, max_wait=0.05)
+    assert batcher.normalize_batch(TEXTS) == expected
+    # identical texts submitted together are normalized once
+    assert batcher.metrics.num_texts == len(TEXTS)
+    assert batcher.metrics.num_deduplicated >= 1
+
+    server = create_server(batcher, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    url = "http://127.0.0.1:{}".format(server.server_address[1])
+
+    def post(data):
+        request = urllib.request.Request(url + "/normalize", data=json.dumps(data).encode("utf-8"))
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    results = [None] * len(TEXTS)
+
+    def normalize(idx):
+        results[idx] = post({"text": TEXTS[idx]})["text"]
+
+    threads = [threading.Thread(target=normalize, args=(idx,)) for idx in range(len(TEXTS))]
+    for request_thread in threads:
+        request_thread.start()
+    for request_thread in threads:
+        request_thread.join()
+    assert results == expected
+    assert post({"texts": TEXTS}) == {"texts": expected}
+
+    with urllib.request.urlopen(url + "/metrics") as response:
+        metrics = response.read().decode("utf-8")
+    assert "normalization_batch_size_count" in metrics
+    assert 'normalization_stage_seconds_count{stage="batch"}' in metrics
+    assert 'normalization_stage_seconds_count{stage="classify"}' in metrics
+    assert 'stage="verbalize",semiotic_class="time"' in metrics
+    server.shutdown()
+    server.server_close()
+    batcher.close()
+
+
+class FailingNormalizer:
+    """
+    pipeline that fails on texts containing "bad"
+    """
+
+    instrumentation = None
+
+    def normalize(self, text):
+        if "bad" in text:
+            raise ValueError("bad text")
+        return text.upper()
+
+    def normalize_batch(self, texts):
+        return [self.normalize(x) for x in texts]
+
+
+def test_batch_failure():
+    batcher = MicroBatcher(FailingNormalizer, max_wait=0.05)
+    futures = [batcher.submit(x) for x in ["good", "bad", "fine"]]
+    # texts coalesced with the bad one are still normalized
+    assert futures[0].result(1) == "GOOD"
+    assert futures[2].result(1) == "FINE"
+    with pytest.raises(ValueError):
+        futures[1].result(1)
+    batcher.close()
+
+
+def test_load_failure():
+    def create_normalizer():
+        raise RuntimeError("missing archive")
+
+    batcher = MicroBatcher(create_normalizer, num_workers=2)
+    server = create_server(batcher, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    # texts don't wait for workers that are gone
+    with pytest.raises(RuntimeError, match="missing archive"):
+        batcher.submit("hello").result(1)
+    assert not batcher.healthy
+
+    url = "http://127.0.0.1:{}/health".format(server.server_address[1])
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(url)
+    assert e.value.code == 503
+    assert json.loads(e.value.read())["status"] == "unhealthy"
+    server.shutdown()
+    server.server_close()
+    batcher.close()
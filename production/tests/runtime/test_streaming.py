@@ -0,0 +1,50 @@
+# Copyright 2022 Balacoon
+
+import os
+
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.segment import Segmenter
+from en_us_normalization.production.runtime.streaming import StreamingNormalizer
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+
+def _get_normalizer() -> Normalizer:
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    return Normalizer(classify, verbalize)
+
+
+def _stream(streaming: StreamingNormalizer, text: str, piece_size: int):
+    normalized = []
+    for idx in range(0, len(text), piece_size):
+        normalized.extend(streaming.feed(text[idx: idx + piece_size]))
+    normalized.extend(streaming.flush())
+    return normalized
+
+
+def test_streaming():
+    normalizer = _get_normalizer()
+    streaming = StreamingNormalizer(normalizer, Segmenter(lookbehind=1))
+    assert streaming.feed("hello wor") == []
+    assert streaming.lookahead == "hello wor"
+    assert streaming.feed("ld and ") == ["hello", "world"]
+    assert streaming.lookahead == "and "
+    assert streaming.lookahead_words == 1
+    assert streaming.feed("1.30 PM") == []
+    assert streaming.flush() == ["and one thirty PM"]
+    assert streaming.lookahead == ""
+
+
+def test_streaming_parity():
+    normalizer = _get_normalizer()
+    text = (
+        "we talked for a long time about all the things that happened to us last year "
+        "and then met again on jan. 5, 2012 at 1.30 PM near the old house on the hill!"
+    )
+    expected = normalizer.normalize(text)
+    for piece_size in [1, 3, 7, len(text)]:
+        streaming = StreamingNormalizer(normalizer)
+        assert " ".join(_stream(streaming, text, piece_size)) == expected
@@ -0,0 +1,54 @@
+# Copyright 2022 Balacoon
+
+from en_us_normalization.production.runtime.tokens import SerializationSpec, Token, parse_tokens
+
+
+def test_parse_tokens():
+    tokens = parse_tokens('tokens { name: "hello" } tokens { name: "world" right_punct: "!" }')
+    assert tokens == [Token(name="hello"), Token(name="world", right_punct="!")]
+
+    tokens = parse_tokens('tokens { left_punct: "\\"" verbatim { name: "123hell\\"$" } }')
+    assert tokens == [Token(semiotic_class="verbatim", fields=[("name", '123hell"$')], left_punct='"')]
+
+    # grammars escape backslashes, except for paths of urls, where backslashes are kept as is
+    tokens = parse_tokens('tokens { verbatim { name: "\\\\" } }')
+    assert tokens == [Token(semiotic_class="verbatim", fields=[("name", "\\")])]
+    tokens = parse_tokens('tokens { electronic { path: "/x\\y" } } tokens { electronic { path: "/x\\" } }')
+    assert tokens == [
+        Token(semiotic_class="electronic", fields=[("path", "/x\\y")]),
+        Token(semiotic_class="electronic", fields=[("path", "/x\\")]),
+    ]
+
+    tokens = parse_tokens(
+        'tokens { measure { fraction { numerator: "1" denominator: "2" } units: "kilograms" '
+        'style_spec_name: "with_explicit_fraction" } }'
+    )
+    assert tokens == [
+        Token(
+            semiotic_class="measure",
+            fields=[("fraction.numerator", "1"), ("fraction.denominator", "2"), ("units", "kilograms")],
+            style="with_explicit_fraction",
+        )
+    ]
+
+
+def test_serialize():
+    spec = SerializationSpec()
+
+    def serialize(tagged_text: str) -> str:
+        return spec.serialize(parse_tokens(tagged_text)[0])
+
+    assert serialize('tokens { cardinal { negative: "true" count: "23" } }') == "cardinal|negative:1|count:23|"
+    assert (
+        serialize('tokens { date { day: "5" month: "january" year: "2012" style_spec_name: "dmy" } }')
+        == "date|day:5|month:january|year:2012|"
+    )
+    assert (
+        serialize('tokens { money { currency: "$" decimal { integer_part: "12" fractional_part: "05" } } }')
+        == "money|integer_part:12|currency:$|fractional_part:05|currency:$|"
+    )
+    assert (
+        serialize('tokens { measure { decimal { negative: "true" integer_part: "12" } units: "kilograms" } }')
+        == "measure|negative:1|integer_part:12|units:kilograms|"
+    )
+    assert serialize('tokens { roman { prefix: "chapter" cardinal { count: "11" } } }') == "roman|prefix:chapter|count:11|"
@@ -0,0 +1,86 @@
+# Copyright 2022 Balacoon
+
+import os
+
+from en_us_normalization.production.runtime.normalizer import Normalizer
+from en_us_normalization.production.runtime.segment import Segmenter
+from en_us_normalization.production.runtime.whitelist import Whitelist, load_whitelist_entries
+
+from learn_to_normalize.grammar_utils.grammar_loader import GrammarLoader
+
+
+def test_whitelist_entries():
+    entries = load_whitelist_entries()
+    assert entries["Ph.D."] == "p h d"
+    assert entries["A. B."] == "a b"
+    # tokens with alternative spoken forms need context
+    assert "St." not in entries
+    assert "Dr." not in entries
+
+
+def test_whitelist_tag():
+    whitelist = Whitelist({"Ph.D.": "p h d", "A. B.": "a b", "A. B. G.": "a b g", "A.": "a"})
+    assert len(whitelist) == 4
+    assert whitelist.get("A. B.") == "a b"
+    assert whitelist.get("A. B. C.") is None
+    assert whitelist.tag("hello world") == [("hello world", None)]
+    assert whitelist.tag("a Ph.D. from MIT") == [
+        ("a", None),
+        ("Ph.D.", 'tokens { name: "p h d" }'),
+        ("from MIT", None),
+    ]
+    # longest match wins
+    assert whitelist.tag("A. B. G.") == [("A. B. G.", 'tokens { name: "a b g" }')]
+    # punctuation attached to the token
+    assert whitelist.tag("(A. B.), and") == [
+        ("(A. B.),", 'tokens { left_punct: "(" name: "a b" right_punct: ")," }'),
+        ("and", None),
+    ]
+    assert whitelist.tag("Ph.D.!") == [("Ph.D.!", 'tokens { name: "p h d" right_punct: "!" }')]
+
+
+def test_whitelist_context():
+    whitelist = Whitelist({"PM": "p m", "km": "k m", "CA": "c a", "No.": "number", "A&E": "a and e"})
+    # tokens that are part of multi-word semiotic classes are left to classification grammar
+    assert whitelist.tag("at 1.30 PM") == [("at 1.30 PM", None)]
+    assert whitelist.tag("it is 5 km long") == [("it is 5 km long", None)]
+    assert whitelist.tag("San Francisco CA 94103") == [("San Francisco CA 94103", None)]
+    assert whitelist.tag("No. 5") == [("No. 5", None)]
+    assert whitelist.tag("CA is big") == [("CA", 'tokens { name: "c a" }'), ("is big", None)]
+    # whitelisted token itself is not an anchor
+    assert whitelist.tag("watch A&E now") == [("watch", None), ("A&E", 'tokens { name: "a and e" }'), ("now", None)]
+
+
+def test_whitelist_normalizer():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    whitelist = Whitelist({"Ph.D.": "p h d", "A. B.": "a b"})
+    normalizer = Normalizer(classify, verbalize, segmenter=Segmenter(), whitelist=whitelist)
+    plain_normalizer = Normalizer(classify, verbalize, segmenter=Segmenter())
+    # text around whitelisted token is normalized as usual
+    assert normalizer.normalize(
+        "she has a Ph.D. from the university since 1999"
+    ) == "she has a p h d " + plain_normalizer.normalize("from the university since 1999")
+    assert normalizer.normalize("hello (A. B.)!") == "hello (a b)!"
+
+
+def test_whitelist_parity():
+    grammars_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+    loader = GrammarLoader(grammars_dir)
+    classify = loader.get_grammar("classify.classify", "ClassifyFst")
+    verbalize = loader.get_grammar("verbalize.verbalize", "VerbalizeFst")
+    normalizer = Normalizer(classify, verbalize, segmenter=Segmenter(), whitelist=Whitelist())
+    plain_normalizer = Normalizer(classify, verbalize, segmenter=Segmenter())
+    # whitelisted "PM", "km", "CA" and "No." don't break time, measure, address and cardinal with prefix
+    for text in [
+        "1.30 PM",
+        "we met at 1.30 PM and talked until 3:45 pm",
+        "5 km",
+        "the road is 5 km long",
+        "please send it to 123 Main St. San Francisco CA 94103",
+        "the office at 1599 Curabitur Rd. Bandera South Dakota 45149",
+        "he is No. 5 on the list",
+    ]:
+        assert normalizer.normalize(text) == plain_normalizer.normalize(text), text
@@ -0,0 +1,46 @@
+# Copyright 2022 Balacoon
+
+import json
+
+import pywrapfst
+from en_us_normalization.production.benchmarks.benchmark_grammars import (
+    compare_results,
+    get_percentile,
+    measure_latency,
+    run_benchmarks,
+)
+
+
+def test_percentile():
+    values = [float(x) for x in range(100, 0, -1)]
+    assert get_percentile(values, 50) == 50.0
+    assert get_percentile(values, 99) == 99.0
+    assert get_percentile([3.0], 99) == 3.0
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(["ordinal", "cardinal", "verbalize_ordinal"], repeats=2)
+    # results are serializable, so they can be stored and compared between revisions
+    results = json.loads(json.dumps(results))
+    assert set(results["grammars"].keys()) == {"ordinal", "cardinal", "verbalize_ordinal"}
+    for metrics in results["grammars"].values():
+        assert metrics["states"] > 0
+        assert metrics["arcs"] > 0
+        assert metrics["serialized_bytes"] > 0
+        assert metrics["p50_ms"] <= metrics["p99_ms"]
+        assert metrics["failed"] == 0
+    ratios = compare_results(results, results)
+    assert all(x == 1.0 for metrics in ratios.values() for x in metrics.values())
+
+
+def test_failed_latency():
+    def apply(text):
+        if text == "bad":
+            raise pywrapfst.FstOpError("no path")
+        return text
+
+    latency = measure_latency(apply, ["good", "bad"], repeats=3)
+    assert latency["failed"] == 3 and latency["p50_ms"] is not None
+    # grammar that fails on all the inputs has no latency, it is skipped in comparison
+    latency = measure_latency(apply, ["bad"], repeats=3)
+    assert latency["failed"] == 3 and latency["p50_ms"] is None
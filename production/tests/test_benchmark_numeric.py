@@ -0,0 +1,13 @@
+# Copyright 2022 Balacoon
+
+from en_us_normalization.production.benchmarks.benchmark_numeric import benchmark_numeric, get_numeric_tokens
+
+
+def test_numeric_tokens():
+    assert get_numeric_tokens(20, seed=1) == get_numeric_tokens(20, seed=1)
+
+
+def test_benchmark_numeric():
+    results = benchmark_numeric(batch_size=50)
+    assert results["mismatches"] == 0
+    assert results["numeric_seconds"] > 0
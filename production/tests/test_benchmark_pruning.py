@@ -0,0 +1,26 @@
+# Copyright 2022 Balacoon
+
+from en_us_normalization.production.benchmarks.benchmark_pruning import (
+    AMBIGUOUS_INPUTS,
+    apply_fst_pruned,
+    benchmark_pruning,
+)
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.grammar_export import apply_fst, prepare_fst
+
+
+def test_benchmark_pruning():
+    results = benchmark_pruning([10.0], max_states=50, repeats=1)
+    assert results["beams"]["10.0"]["agreement"] > 0.8
+    assert len(results["lattice_states"]) == len(AMBIGUOUS_INPUTS)
+
+
+def test_apply_fst_pruned():
+    fst = prepare_fst(ClassifyFst().fst)
+    text = "12/04/15 at 3:30pm"
+    expected = apply_fst(fst, text)
+    tagged, num_states, max_states = apply_fst_pruned(fst, text, beam=10.0)
+    assert tagged == expected and num_states > 0 and max_states is None
+    # state cap shorter than the best path is not applied
+    tagged, _, max_states = apply_fst_pruned(fst, text, beam=10.0, max_states=2)
+    assert tagged == expected and max_states is None
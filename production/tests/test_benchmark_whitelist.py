@@ -0,0 +1,12 @@
+# Copyright 2022 Balacoon
+
+from en_us_normalization.production.benchmarks.benchmark_whitelist import WHITELIST_INPUTS, measure_lookup
+from en_us_normalization.production.runtime.whitelist import Whitelist
+
+
+def test_measure_lookup():
+    whitelist = Whitelist()
+    # most of the benchmark inputs are whitelisted
+    assert sum(whitelist.match(x.split()) is not None for x in WHITELIST_INPUTS) >= 3
+    latency = measure_lookup(whitelist, WHITELIST_INPUTS, repeats=10)
+    assert 0 < latency["lookup_p50_ns"] <= latency["lookup_p99_ns"]
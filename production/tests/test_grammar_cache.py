@@ -0,0 +1,44 @@
+# Copyright 2022 Balacoon
+
+import os
+
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.grammar_cache import CachedFst, get_grammars_hash, load_or_build
+from en_us_normalization.production.verbalize.verbalize import VerbalizeFst
+
+
+def test_grammars_hash(tmp_path):
+    data_file = tmp_path / "data.tsv"
+    data_file.write_text("mr\tmister\n")
+    original_hash = get_grammars_hash([str(data_file)])
+    assert get_grammars_hash([str(data_file)]) == original_hash
+    data_file.write_text("mr\tmister\ndr\tdoctor\n")
+    assert get_grammars_hash([str(data_file)]) != original_hash
+
+
+def test_classify_cache(tmp_path):
+    cache_dir = str(tmp_path)
+    fresh = ClassifyFst()
+
+    # first call is a cache miss, grammar is compiled and stored
+    built = load_or_build(ClassifyFst, cache_dir=cache_dir)
+    assert isinstance(built, ClassifyFst)
+    assert len(os.listdir(cache_dir)) == 1
+
+    # second call is a cache hit
+    cached = load_or_build(ClassifyFst, cache_dir=cache_dir)
+    assert isinstance(cached, CachedFst)
+    assert cached.fst.write_to_string() == fresh.fst.write_to_string()
+    for text in ["hello world!", "1.30 PM", "jan. 5, 2012", "look33", "https://google.ua"]:
+        assert cached.apply(text) == fresh.apply(text)
+
+
+def test_verbalize_cache(tmp_path):
+    cache_dir = str(tmp_path)
+    fresh = VerbalizeFst()
+    load_or_build(VerbalizeFst, cache_dir=cache_dir)
+    cached = load_or_build(VerbalizeFst, cache_dir=cache_dir)
+    assert isinstance(cached, CachedFst)
+    assert cached.fst.write_to_string() == fresh.fst.write_to_string()
+    for text in ["cardinal|count:23|", "money|integer_part:12|currency:$|", "time|hours:12|"]:
+        assert cached.apply(text) == fresh.apply(text)
@@ -0,0 +1,65 @@
+# Copyright 2022 Balacoon
+
+import pytest
+from en_us_normalization.production.classify.classify import ClassifyFst
+from en_us_normalization.production.grammar_export import (
+    export_class_verbalizers,
+    export_grammars,
+    load_class_verbalizers,
+    load_exported_grammars,
+)
+from en_us_normalization.production.runtime.corpus import get_fork_context
+from en_us_normalization.production.verbalize.verbalize import VerbalizeFst
+
+# class verbalizers inherited by forked worker
+_worker_verbalizers = None
+
+
+def _init_worker(verbalizers):
+    global _worker_verbalizers
+    _worker_verbalizers = verbalizers
+
+
+def _verbalize(serialized):
+    return _worker_verbalizers.apply(serialized)
+
+
+def test_export_grammars(tmp_path):
+    classify = ClassifyFst()
+    verbalize = VerbalizeFst()
+    export_grammars(str(tmp_path), classify=classify, verbalize=verbalize)
+    exported_classify, exported_verbalize = load_exported_grammars(str(tmp_path))
+
+    assert exported_classify.fst.fst_type() == "const"
+    assert exported_verbalize.fst.fst_type() == "const"
+    for text in ["hello world!", "1.30 PM", "jan. 5, 2012", "look33", "https://google.ua"]:
+        assert exported_classify.apply(text) == classify.apply(text)
+    for text in ["cardinal|count:23|", "money|integer_part:12|currency:$|", "time|hours:12|"]:
+        assert exported_verbalize.apply(text) == verbalize.apply(text)
+
+
+def test_export_class_verbalizers(tmp_path):
+    verbalize = VerbalizeFst()
+    export_class_verbalizers(str(tmp_path))
+    verbalizers = load_class_verbalizers(str(tmp_path))
+    # nothing is read from archive until first use
+    assert verbalizers.loaded == []
+    for text in ["cardinal|count:23|", "money|integer_part:12|currency:$|", "time|hours:12|"]:
+        assert verbalizers.apply(text) == verbalize.apply(text)
+    assert verbalizers.loaded == ["cardinal", "money", "time"]
+    assert verbalizers.get("cardinal").fst_type() == "const"
+
+
+def test_class_verbalizers_fork(tmp_path):
+    context = get_fork_context()
+    if context is None:
+        pytest.skip("platform doesn't support fork")
+    verbalize = VerbalizeFst()
+    export_class_verbalizers(str(tmp_path))
+    verbalizers = load_class_verbalizers(str(tmp_path))
+    verbalizers.apply("cardinal|count:23|")
+    # workers inherit loaded cardinal verbalizer and load the rest from their own archive readers
+    texts = ["cardinal|count:23|", "money|integer_part:12|currency:$|", "time|hours:12|", "ordinal|order:3|"] * 8
+    with context.Pool(2, initializer=_init_worker, initargs=(verbalizers,)) as pool:
+        assert pool.map(_verbalize, texts, chunksize=1) == [verbalize.apply(x) for x in texts]
+    assert verbalizers.loaded == ["cardinal"]
@@ -0,0 +1,38 @@
+# Copyright 2022 Balacoon
+
+from en_us_normalization.production.classify.classify import CLASSIFIERS, ClassifyFst
+from en_us_normalization.production.incremental_build import BuildGraph, IncrementalBuilder
+from en_us_normalization.production.verbalize.verbalize import VERBALIZERS, VerbalizeFst
+
+
+def test_build_graph():
+    graph = BuildGraph(CLASSIFIERS)
+    assert set(graph.get_dependents("cardinal")) >= {"ordinal", "decimal", "money", "measure"}
+    affected = graph.get_affected(["data/measurements.tsv"])
+    assert "measure" in affected
+    assert "cardinal" not in affected
+    assert "money" in graph.get_affected(["data/currency/major.tsv"])
+    assert graph.get_affected(["configs/verbalizer_serialization_spec.ascii_proto"]) == []
+    # editing a grammar of reused component affects components that reuse it
+    affected = BuildGraph(VERBALIZERS).get_affected(["verbalize/ordinal.py"])
+    assert {"ordinal", "fraction", "date", "measure"}.issubset(affected)
+    assert "cardinal" not in affected
+
+
+def test_incremental_build(tmp_path):
+    builder = IncrementalBuilder(str(tmp_path))
+    classes = ["cardinal", "ordinal", "word", "verbatim"]
+    classify = builder.build_classify(classes=classes)
+    assert set(builder.rebuilt) == {"classify." + x for x in classes}
+    fresh = ClassifyFst(classes=classes)
+    assert classify.fst.write_to_string() == fresh.fst.write_to_string()
+
+    # nothing changed, all branches are loaded from the cache
+    cached = builder.build_classify(classes=classes)
+    assert builder.rebuilt == []
+    assert cached.fst.write_to_string() == fresh.fst.write_to_string()
+
+    verbalize = builder.build_verbalize()
+    fresh = VerbalizeFst()
+    for text in ["cardinal|count:1231|", "ordinal|order:13|", "time|hours:12|minutes:30|suffix:AM|zone:EST|"]:
+        assert verbalize.apply(text) == fresh.apply(text)
@@ -0,0 +1,20 @@
+# Copyright 2022 Balacoon
+
+from en_us_normalization.production.benchmarks.profile_classify import profile_classify
+
+
+def test_profile_classify():
+    report = profile_classify(["ordinal", "money"])
+    branches = [x for x in report if not x.get("dependency_only")]
+    dependencies = [x for x in report if x.get("dependency_only")]
+    assert sorted(x["name"] for x in branches) == ["money", "ordinal"]
+    # cardinal and decimal are built only because branches reuse them
+    assert sorted(x["name"] for x in dependencies) == ["cardinal", "decimal"]
+    # report is ranked by marginal number of arcs
+    assert branches[0]["marginal_arcs"] >= branches[1]["marginal_arcs"]
+    for entry in branches:
+        assert entry["standalone"]["arcs"] > 0
+        assert entry["cumulative"]["arcs"] > 0
+    # money is the last branch added to the union, so marginal costs sum up to its cumulative size
+    money = [x for x in branches if x["name"] == "money"][0]
+    assert sum(x["marginal_arcs"] for x in branches) == money["cumulative"]["arcs"]
@@ -0,0 +1,89 @@
+"""
+Copyright 2022 Balacoon
+
+Parsing of protobuf text format, which is used for tagged tokens and configs
+"""
+
+import re
+from typing import List, Tuple, Union
+
+# characters of quoted strings. Grammars escape quotes and backslashes, but some of them (for ex. paths of urls)
+# keep backslashes as is, so backslash that doesn't escape quote or backslash is a literal one. Same is true
+# for backslash before the quote that closes the string, i.e. the quote followed by whitespace or end of text.
+# Grammars don't produce values with quote followed by whitespace, which would be ambiguous otherwise.
+_STRING_CHAR = r'[^"\\]|\\\\|\\"(?!\s|$)|\\(?![\\"])|\\(?="(?:\s|$))'
+# lexemes of protobuf text format: identifiers, braces, colons and quoted strings
+_LEXEME_RE = re.compile(r'(?:([A-Za-z_][A-Za-z0-9_]*)|([{}:])|"((?:' + _STRING_CHAR + r')*)")')
+_UNESCAPE_RE = re.compile(r'\\([\\"])')
+# whitespace and comments between lexemes
+_SKIP_RE = re.compile(r"(?:\s|#[^\n]*)*")
+
+TextProto = List[Tuple[str, Union[str, "TextProto"]]]
+
+
+def escape_string(value: str) -> str:
+    """
+    escapes string value the same way classification grammars do,
+    so that it can be put in quotes in tagged text, for ex. `name: "{}"`
+    """
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def parse_text_proto(text: str) -> TextProto:
+    """
+    minimalistic parser of protobuf text format, which is used both for tagged tokens
+    produced by classification grammars and configs. Supports only subset of the format
+    that is needed: nested messages, string values and comments.
+
+    Parameters
+    ----------
+    text: str
+        text to parse, for ex. `tokens { name: "hello" }`
+
+    Returns
+    -------
+    message: TextProto
+        list of (field name, value) pairs, where value is either a string
+        or nested message. Order of fields is preserved.
+    """
+    lexemes = []
+    pos = _SKIP_RE.match(text).end()
+    while pos < len(text):
+        match = _LEXEME_RE.match(text, pos)
+        if match is None or match.end() == pos:
+            raise ValueError("Can't parse [{}] at position {}".format(text, pos))
+        ident, symbol, string = match.groups()
+        if ident is not None:
+            lexemes.append(("ident", ident))
+        elif symbol is not None:
+            lexemes.append((symbol, symbol))
+        else:
+            lexemes.append(("str", _UNESCAPE_RE.sub(r"\1", string)))
+        pos = _SKIP_RE.match(text, match.end()).end()
+
+    stack = [[]]
+    idx = 0
+    while idx < len(lexemes):
+        kind, value = lexemes[idx]
+        if kind == "}":
+            if len(stack) == 1:
+                raise ValueError("Unbalanced braces in [{}]".format(text))
+            stack.pop()
+            idx += 1
+            continue
+        if kind != "ident" or idx + 1 >= len(lexemes):
+            raise ValueError("Expected field name in [{}]".format(text))
+        next_kind, next_value = lexemes[idx + 1]
+        if next_kind == ":" and idx + 2 < len(lexemes) and lexemes[idx + 2][0] == "str":
+            stack[-1].append((value, lexemes[idx + 2][1]))
+            idx += 3
+        elif next_kind == "{":
+            message = []
+            stack[-1].append((value, message))
+            stack.append(message)
+            idx += 2
+        else:
+            raise ValueError("Unexpected [{}] after [{}] in [{}]".format(next_value, value, text))
+    if len(stack) != 1:
+        raise ValueError("Unbalanced braces in [{}]".format(text))
+    return stack[0]
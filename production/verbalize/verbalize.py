@@ -6,6 +6,10 @@ Copyright 2015 and onwards Google, Inc.
 Entry point to verbalize
 """
 
+import time
+from typing import List
+
+import pynini
 from en_us_normalization.production.verbalize.address import AddressFst
 from en_us_normalization.production.verbalize.cardinal import CardinalFst
 from en_us_normalization.production.verbalize.date import DateFst
@@ -22,45 +26,108 @@ from en_us_normalization.production.verbalize.verbatim import VerbatimFst
 
 from learn_to_normalize.grammar_utils.base_fst import BaseFst
 
+# name of verbalizer -> (grammar class, names of verbalizers that are passed to its constructor)
+VERBALIZERS = {
+    "cardinal": (CardinalFst, ()),
+    "decimal": (DecimalFst, ("cardinal",)),
+    "ordinal": (OrdinalFst, ("cardinal",)),
+    "fraction": (FractionFst, ("cardinal", "ordinal")),
+    "roman": (RomanFst, ("cardinal", "ordinal")),
+    "address": (AddressFst, ("cardinal",)),
+    "date": (DateFst, ("cardinal", "ordinal")),
+    "verbatim": (VerbatimFst, ("cardinal",)),
+    "electronic": (ElectronicFst, ("verbatim", "cardinal")),
+    "measure": (MeasureFst, ("decimal", "fraction")),
+    "money": (MoneyFst, ("cardinal", "decimal")),
+    "telephone": (TelephoneFst, ("cardinal",)),
+    "time": (TimeFst, ("cardinal",)),
+}
+
+# branches of the union of verbalizers, in the order of union
+VERBALIZE_UNION = (
+    "time",
+    "address",
+    "date",
+    "money",
+    "measure",
+    "ordinal",
+    "decimal",
+    "cardinal",
+    "telephone",
+    "electronic",
+    "fraction",
+    "roman",
+    "verbatim",
+)
+
+
+class VerbalizerBuilder:
+    """
+    Builds verbalizers of semiotic classes on demand. Verbalizers that are reused
+    by other verbalizers (for ex. cardinal by ordinal) are built once and shared.
+    Time spent on building each verbalizer, excluding its dependencies, is recorded.
+    """
+
+    def __init__(self):
+        self._verbalizers = {}
+        self.build_seconds = {}
+
+    def get(self, name: str) -> BaseFst:
+        """
+        getter for verbalizer, building it and its dependencies if needed
+
+        Parameters
+        ----------
+        name: str
+            name of verbalizer, one of VERBALIZERS
+
+        Returns
+        -------
+        verbalizer: BaseFst
+            built verbalizer
+        """
+        if name not in self._verbalizers:
+            if name not in VERBALIZERS:
+                raise ValueError("Unknown verbalizer [{}], expected one of {}".format(name, list(VERBALIZERS.keys())))
+            grammar_cls, dependencies = VERBALIZERS[name]
+            kwargs = {x: self.get(x) for x in dependencies}
+            start = time.time()
+            self._verbalizers[name] = grammar_cls(**kwargs)
+            self.build_seconds[name] = time.time() - start
+        return self._verbalizers[name]
+
 
 class VerbalizeFst(BaseFst):
     """
     Final class that composes all other verbalization grammars.
     Combined rule can process any semiotic class.
     For deployment, this grammar will be compiled and exported to OpenFst Finite State Archive (FAR) File.
+    Verbalizers of semiotic classes are put in a union (see VERBALIZE_UNION).
     """
 
     def __init__(self):
         super().__init__(name="verbalize")
-        cardinal = CardinalFst()
-        decimal = DecimalFst(cardinal=cardinal)
-        ordinal = OrdinalFst(cardinal=cardinal)
-        fraction = FractionFst(cardinal=cardinal, ordinal=ordinal)
-        roman = RomanFst(cardinal=cardinal, ordinal=ordinal)
-        address = AddressFst(cardinal=cardinal)
-        date = DateFst(cardinal=cardinal, ordinal=ordinal)
-        verbatim = VerbatimFst(cardinal=cardinal)
-        electronic = ElectronicFst(verbatim=verbatim, cardinal=cardinal)
-        measure = MeasureFst(decimal=decimal, fraction=fraction)
-        money = MoneyFst(cardinal=cardinal, decimal=decimal)
-        telephone = TelephoneFst(cardinal=cardinal)
-        time = TimeFst(cardinal=cardinal)
+        builder = VerbalizerBuilder()
+        self._single_fst = self.get_union([builder.get(name).fst for name in VERBALIZE_UNION])
+
+    @staticmethod
+    def get_union(verbalizers: List[pynini.FstLike]) -> pynini.FstLike:
+        """
+        puts verbalizers of semiotic classes together
+
+        Parameters
+        ----------
+        verbalizers: List[pynini.FstLike]
+            fsts of verbalizers in the order of VERBALIZE_UNION
 
+        Returns
+        -------
+        graph: pynini.FstLike
+            union of verbalizers
+        """
         # no need for weighting, classification introduces tags,
         # that define semiotic class without ambiguity
-        graph = (
-            time.fst
-            | address.fst
-            | date.fst
-            | money.fst
-            | measure.fst
-            | ordinal.fst
-            | decimal.fst
-            | cardinal.fst
-            | telephone.fst
-            | electronic.fst
-            | fraction.fst
-            | roman.fst
-            | verbatim.fst
-        )
-        self._single_fst = graph
+        graph = verbalizers[0]
+        for fst in verbalizers[1:]:
+            graph = graph | fst
+        return graph